@@ -15,6 +15,7 @@
 
 # --- Modules/packages in this plugin ---
 import resources.main
+import resources.utils
 
 # --- Python standard library ---
 import sys
@@ -31,4 +32,8 @@ import sys
 # loading time is faster compared to PY files.
 # See http://www.network-theory.co.uk/docs/pytut/CompiledPythonfiles.html
 #
-resources.main.run_plugin(sys.argv)
+# A database that cannot be read raises KodiAddonError.
+try:
+    resources.main.run_plugin(sys.argv)
+except resources.utils.KodiAddonError as ex:
+    resources.utils.kodi_display_exception(ex)
@@ -0,0 +1,89 @@
+#!/usr/bin/python3
+# -*- coding: utf-8 -*-
+
+# Copyright (c) 2021 Wintermute0110 <wintermute0110@gmail.com>
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; version 2 of the License.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.
+# See the GNU General Public License for more details.
+
+# Compares the loading time and size of the database serialization formats.
+# See OPTION_DB_FORMAT in resources/constants.py.
+# Use a real AML database, for example MAME_renderdb.json in the addon data directory.
+# If no file is given a synthetic render database is used.
+# $ ./benchmark_DB_formats.py [database.json]
+
+# --- Python standard library ---
+import json
+import marshal
+import pickle
+import random
+import sys
+import time
+import zlib
+
+NUM_REPEATS = 5
+NUM_SYNTHETIC_MACHINES = 40000
+
+def build_synthetic_DB():
+    random.seed(0)
+    db_dic = {}
+    for i in range(NUM_SYNTHETIC_MACHINES):
+        db_dic['m{:05d}'.format(i)] = {
+            'cloneof' : '',
+            'description' : 'Machine number {} (World)'.format(i),
+            'driver_status' : random.choice(['good', 'imperfect', 'preliminary']),
+            'genre' : random.choice(['Shooter / Vertical', 'Platform / Run Jump', 'Sports / Golf']),
+            'isBIOS' : False,
+            'isDevice' : False,
+            'isMature' : random.random() < 0.05,
+            'manufacturer' : random.choice(['Capcom', 'Konami', 'Namco', 'Sega']),
+            'nplayers' : random.choice(['1P', '2P alt', '2P sim']),
+            'year' : '19{}'.format(random.randint(70, 99)),
+        }
+    return db_dic
+
+# Returns the best time of NUM_REPEATS calls.
+def time_function(function):
+    best_time = None
+    for i in range(NUM_REPEATS):
+        t_start = time.time()
+        function()
+        t_elapsed = time.time() - t_start
+        if best_time is None or t_elapsed < best_time: best_time = t_elapsed
+    return best_time
+
+# --- Main ----------------------------------------------------------------------------------------
+if len(sys.argv) > 1:
+    print('Loading "{}"'.format(sys.argv[1]))
+    with open(sys.argv[1], 'rb') as file:
+        db_dic = json.loads(file.read().decode('utf-8'))
+else:
+    print('Building synthetic database with {} machines'.format(NUM_SYNTHETIC_MACHINES))
+    db_dic = build_synthetic_DB()
+
+json_bytes = json.dumps(db_dic, ensure_ascii = False, sort_keys = True).encode('utf-8')
+marshal_bytes = marshal.dumps(db_dic)
+pickle_bytes = pickle.dumps(db_dic, 2)
+marshal_zlib_bytes = zlib.compress(marshal_bytes, 1)
+pickle_zlib_bytes = zlib.compress(pickle_bytes, 1)
+
+format_list = [
+    ['JSON', json_bytes, lambda: json.loads(json_bytes.decode('utf-8'))],
+    ['marshal', marshal_bytes, lambda: marshal.loads(marshal_bytes)],
+    ['pickle', pickle_bytes, lambda: pickle.loads(pickle_bytes)],
+    ['marshal + zlib', marshal_zlib_bytes, lambda: marshal.loads(zlib.decompress(marshal_zlib_bytes))],
+    ['pickle + zlib', pickle_zlib_bytes, lambda: pickle.loads(zlib.decompress(pickle_zlib_bytes))],
+]
+json_time = None
+print('{:<16} {:>12} {:>10} {:>8}'.format('Format', 'Size', 'Load (s)', 'Speedup'))
+for format_name, data_bytes, load_function in format_list:
+    load_time = time_function(load_function)
+    if json_time is None: json_time = load_time
+    print('{:<16} {:>12,} {:>10.4f} {:>7.2f}x'.format(
+        format_name, len(data_bytes), load_time, json_time / load_time))
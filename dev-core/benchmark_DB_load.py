@@ -0,0 +1,84 @@
+#!/usr/bin/python3
+# -*- coding: utf-8 -*-
+
+# Copyright (c) 2021 Wintermute0110 <wintermute0110@gmail.com>
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; version 2 of the License.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.
+# See the GNU General Public License for more details.
+
+# Compares loading a set of databases serially and with threads, like db_load_files() does,
+# with the garbage collector enabled and disabled. See DB_LOAD_NUM_THREADS in resources/constants.py.
+# Use the databases in the addon data directory, JSON files and pickle .bin files are loaded.
+# $ ./benchmark_DB_load.py MAME_DB_main.json MAME_renderdb.json MAME_assetdb.bin ...
+
+# --- Python standard library ---
+import gc
+import json
+import pickle
+import sys
+import threading
+import time
+
+NUM_REPEATS = 3
+NUM_THREADS_LIST = [1, 2, 4, 8]
+# Size of the header of the AML binary databases. See DB_BINARY_HEADER_STRUCT in utils.py.
+DB_BINARY_HEADER_SIZE = 10
+
+def load_file(filename):
+    with open(filename, 'rb') as file:
+        data_bytes = file.read()
+    if filename.endswith('.bin'):
+        return pickle.loads(data_bytes[DB_BINARY_HEADER_SIZE:])
+    return json.loads(data_bytes.decode('utf-8'))
+
+class Threaded_Load(threading.Thread):
+    def __init__(self, filename):
+        threading.Thread.__init__(self)
+        self.filename = filename
+
+    def run(self):
+        self.output_dic = load_file(self.filename)
+
+# Same algorithm as db_load_files().
+def load_files(file_list, num_threads):
+    pending_list = list(file_list)
+    running_list = []
+    while pending_list or running_list:
+        while pending_list and len(running_list) < num_threads:
+            load_thread = Threaded_Load(pending_list.pop(0))
+            load_thread.start()
+            running_list.append(load_thread)
+        running_list.pop(0).join()
+
+# Returns the best time of NUM_REPEATS calls.
+def time_load(file_list, num_threads):
+    best_time = None
+    for i in range(NUM_REPEATS):
+        t_start = time.time()
+        load_files(file_list, num_threads)
+        t_elapsed = time.time() - t_start
+        if best_time is None or t_elapsed < best_time: best_time = t_elapsed
+    return best_time
+
+# --- Main ----------------------------------------------------------------------------------------
+if len(sys.argv) < 2:
+    print('Usage: benchmark_DB_load.py file1 file2 ...')
+    sys.exit(1)
+file_list = sys.argv[1:]
+serial_time = None
+print('{:<8} {:<8} {:>10} {:>8}'.format('GC', 'Threads', 'Load (s)', 'Speedup'))
+for gc_enabled in [True, False]:
+    if gc_enabled: gc.enable()
+    else:          gc.disable()
+    for num_threads in NUM_THREADS_LIST:
+        load_time = time_load(file_list, num_threads)
+        if serial_time is None: serial_time = load_time
+        print('{:<8} {:<8} {:>10.4f} {:>7.2f}x'.format(
+            'on' if gc_enabled else 'off', num_threads, load_time, serial_time / load_time))
+gc.enable()
@@ -0,0 +1,182 @@
+#!/usr/bin/python3
+# -*- coding: utf-8 -*-
+
+# Copyright (c) 2021 Wintermute0110 <wintermute0110@gmail.com>
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; version 2 of the License.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.
+# See the GNU General Public License for more details.
+
+# Compares the ways render_catalog_parent_list() gets the machines of a category:
+#   1) Payload cache file, CACHE_DIR/'hash'_'settings hash'_payload.json.
+#   2) View cache file, CACHE_DIR/'hash'_view.json. The payload must be built after loading.
+#   3) GET_VIEW request to the AML service. The payload must be built after loading.
+#   4) Render and asset databases, when the render and asset caches are disabled.
+# The service uses the same protocol as resources/service.py. Databases are synthetic.
+# $ ./benchmark_service.py [number of machines in the category]
+
+# --- Python standard library ---
+import json
+import os
+import random
+import socket
+import socketserver
+import sys
+import tempfile
+import threading
+import time
+
+NUM_REPEATS = 5
+NUM_DB_MACHINES = 40000
+NUM_CATEGORY_MACHINES = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+SERVICE_HOST = '127.0.0.1'
+
+def build_render_row(i):
+    return {
+        'cloneof' : '', 'description' : 'Machine number {} (World)'.format(i),
+        'driver_status' : random.choice(['good', 'imperfect', 'preliminary']),
+        'genre' : random.choice(['Shooter / Vertical', 'Platform / Run Jump', 'Sports / Golf']),
+        'isBIOS' : False, 'isDevice' : False, 'isMature' : False,
+        'manufacturer' : random.choice(['Capcom', 'Konami', 'Namco', 'Sega']),
+        'nplayers' : '2P alt', 'year' : '19{}'.format(random.randint(70, 99)),
+    }
+
+def build_asset_row(i):
+    asset_dic = {}
+    for asset_key in ['3dbox', 'artpreview', 'artwork', 'cabinet', 'clearlogo', 'cpanel',
+        'fanart', 'flags', 'flyer', 'icon', 'manual', 'marquee', 'PCB', 'snap', 'title', 'trailer']:
+        asset_dic[asset_key] = '/home/kodi/AML-assets/{}/m{:05d}.png'.format(asset_key, i)
+    asset_dic['plot'] = 'Controls: 8-way joystick, 3 buttons. Machine number {}.'.format(i)
+    return asset_dic
+
+# Similar to render_process_machine_static() in resources/main.py.
+def build_payload(m_name, row_dic):
+    return {
+        'm_name' : m_name,
+        'filter' : {'isMature' : False, 'isBIOS' : False, 'driver_status' : row_dic['driver_status']},
+        'name_pre' : row_dic['description'], 'name_post' : '',
+        'info' : {'title' : row_dic['description'], 'year' : row_dic['year'],
+            'genre' : row_dic['genre'], 'studio' : row_dic['manufacturer'],
+            'plot' : row_dic['plot'], 'overlay' : 4},
+        'art' : {'title' : row_dic['title'], 'snap' : row_dic['snap'], 'boxfront' : row_dic['cabinet'],
+            'icon' : row_dic['icon'], 'fanart' : row_dic['fanart'], 'clearlogo' : row_dic['clearlogo'],
+            'poster' : row_dic['flyer'], '3dbox' : row_dic['3dbox']},
+        'props' : {'nplayers' : row_dic['nplayers'], 'platform' : 'MAME'},
+        'context' : [['View', 'RunPlugin(plugin://plugin.program.AML/?command=VIEW&machine={})'.format(m_name)]],
+        'URL' : 'plugin://plugin.program.AML/?command=LAUNCH&machine={}'.format(m_name),
+    }
+
+def build_view_and_payload(render_db, asset_db, machine_list):
+    view_dic = {'all' : {}, 'parents' : [], 'pclone' : {}, 'rows' : {}}
+    for m_name in machine_list:
+        view_dic['all'][m_name] = render_db[m_name]['description']
+        view_dic['parents'].append(m_name)
+        row_dic = render_db[m_name].copy()
+        row_dic.update(asset_db[m_name])
+        view_dic['rows'][m_name] = row_dic
+    return view_dic
+
+def build_payload_dic(view_dic):
+    payload_dic = {'all' : list(view_dic['all']), 'parents' : view_dic['parents'], 'payload' : {}}
+    for m_name in view_dic['all']:
+        payload_dic['payload'][m_name] = build_payload(m_name, view_dic['rows'][m_name])
+    return payload_dic
+
+def load_JSON(filename):
+    with open(filename, 'rb') as file:
+        return json.loads(file.read().decode('utf-8'))
+
+def write_JSON(filename, data):
+    with open(filename, 'wb') as file:
+        file.write(json.dumps(data, ensure_ascii = False).encode('utf-8'))
+
+# Same protocol as Service_Request_Handler. The response is encoded once, like the view
+# response cache of the AML service.
+class Request_Handler(socketserver.StreamRequestHandler):
+    def handle(self):
+        self.rfile.readline()
+        self.wfile.write(self.server.response_bytes)
+
+class TCP_Server(socketserver.ThreadingMixIn, socketserver.TCPServer):
+    allow_reuse_address = True
+    daemon_threads = True
+
+def service_get_view(port):
+    sock = socket.create_connection((SERVICE_HOST, port), 5.0)
+    sock.sendall((json.dumps({'command' : 'GET_VIEW'}) + '\n').encode('utf-8'))
+    chunk_list = []
+    while True:
+        chunk = sock.recv(65536)
+        if not chunk: break
+        chunk_list.append(chunk)
+    sock.close()
+    return json.loads(b''.join(chunk_list).decode('utf-8'))['view']
+
+# Returns the best time of NUM_REPEATS calls.
+def time_function(function):
+    best_time = None
+    for i in range(NUM_REPEATS):
+        t_start = time.time()
+        function()
+        t_elapsed = time.time() - t_start
+        if best_time is None or t_elapsed < best_time: best_time = t_elapsed
+    return best_time
+
+# --- Main ----------------------------------------------------------------------------------------
+print('Building synthetic databases, {} machines, {} in the category'.format(
+    NUM_DB_MACHINES, NUM_CATEGORY_MACHINES))
+random.seed(0)
+render_db = {}
+asset_db = {}
+for i in range(NUM_DB_MACHINES):
+    render_db['m{:05d}'.format(i)] = build_render_row(i)
+    asset_db['m{:05d}'.format(i)] = build_asset_row(i)
+machine_list = sorted(random.sample(sorted(render_db), NUM_CATEGORY_MACHINES))
+view_dic = build_view_and_payload(render_db, asset_db, machine_list)
+payload_dic = build_payload_dic(view_dic)
+
+temp_dir = tempfile.mkdtemp()
+payload_filename = os.path.join(temp_dir, 'payload.json')
+view_filename = os.path.join(temp_dir, 'view.json')
+render_filename = os.path.join(temp_dir, 'MAME_renderdb.json')
+asset_filename = os.path.join(temp_dir, 'MAME_assetdb.json')
+write_JSON(payload_filename, payload_dic)
+write_JSON(view_filename, view_dic)
+write_JSON(render_filename, render_db)
+write_JSON(asset_filename, asset_db)
+
+server = TCP_Server((SERVICE_HOST, 0), Request_Handler)
+server.response_bytes = json.dumps({'status' : 'OK', 'view' : view_dic}, ensure_ascii = False).encode('utf-8')
+server_thread = threading.Thread(target = server.serve_forever)
+server_thread.daemon = True
+server_thread.start()
+port = server.server_address[1]
+
+def databases_path():
+    r_db = load_JSON(render_filename)
+    a_db = load_JSON(asset_filename)
+    build_payload_dic(build_view_and_payload(r_db, a_db, machine_list))
+
+test_list = [
+    ['Payload cache file', os.path.getsize(payload_filename), lambda: load_JSON(payload_filename)],
+    ['View cache file', os.path.getsize(view_filename),
+        lambda: build_payload_dic(load_JSON(view_filename))],
+    ['Service GET_VIEW', len(server.response_bytes),
+        lambda: build_payload_dic(service_get_view(port))],
+    ['Databases', os.path.getsize(render_filename) + os.path.getsize(asset_filename), databases_path],
+]
+payload_time = None
+print('{:<20} {:>12} {:>10} {:>10}'.format('Source', 'Bytes', 'Time (s)', 'Relative'))
+for test_name, num_bytes, test_function in test_list:
+    test_time = time_function(test_function)
+    if payload_time is None: payload_time = test_time
+    print('{:<20} {:>12,} {:>10.4f} {:>9.2f}x'.format(test_name, num_bytes, test_time, test_time / payload_time))
+server.shutdown()
+server.server_close()
+for filename in [payload_filename, view_filename, render_filename, asset_filename]: os.remove(filename)
+os.rmdir(temp_dir)
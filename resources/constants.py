@@ -35,7 +35,8 @@ else:
 # In AML this must be True when releasing.
 OPTION_COMPACT_JSON = True
 
-# Use less memory when writing big JSON files, but writing is slower.
+# Use less memory when writing big JSON files. The top level items are encoded in chunks,
+# so writing is almost as fast as json.dumps().
 # In AEL this can be False when releasing.
 # In AML it must be True when releasing.
 OPTION_LOWMEM_WRITE_JSON = True
@@ -51,6 +52,85 @@ ADDON_SHORT_NAME = 'AML'
 JSON_INDENT = 1
 JSON_SEP = (', ', ': ')
 
+# Number of top level items encoded at once by the low memory JSON writer.
+JSON_WRITE_CHUNK_ITEMS = 2000
+
+# Serialization format of the big databases. With DB_FORMAT_MARSHAL or DB_FORMAT_PICKLE the files
+# matching DB_BINARY_FILE_PATTERNS are stored in a binary file with extension .bin instead of
+# the JSON file. The rest of the files are always JSON.
+# marshal and pickle load 2 to 3 times faster than JSON. Pickle files are smaller and the format
+# does not change between Python versions. Use dev-core/benchmark_DB_formats.py to compare.
+DB_FORMAT_JSON    = 0
+DB_FORMAT_MARSHAL = 1
+DB_FORMAT_PICKLE  = 2
+OPTION_DB_FORMAT = DB_FORMAT_PICKLE
+
+# Compress binary databases with zlib. Files are much smaller but loading is a bit slower.
+OPTION_DB_COMPRESSION = False
+
+# Write the JSON file of the big databases in addition to the binary file. Useful for
+# development and to use the databases with other tools.
+OPTION_DB_EXPORT_JSON = False
+
+# Binary databases with a different header version, or marshal databases written by a different
+# Python version, cannot be read and must be rebuilt. Increment DB_BINARY_VERSION if the header
+# format changes.
+DB_BINARY_MAGIC = b'AMLDB'
+DB_BINARY_VERSION = 1
+DB_BINARY_FILE_PATTERNS = [
+    'MAME_DB_main.json',
+    'MAME_DB_roms.json',
+    'MAME_DB_devices.json',
+    'MAME_DB_SHA1_hashes.json',
+    'MAME_renderdb.json',
+    'MAME_assetdb.json',
+    'ROM_Audit_DB.json',
+    'ROM_Set_machine_files.json',
+    # Software Lists databases. Only the files in the SoftwareLists directory match, so user
+    # files like Favourite_SL_ROMs.json are always JSON. User data cannot be rebuilt.
+    'SoftwareLists/*_items.json',
+    'SoftwareLists/*_ROMs.json',
+    'SoftwareLists/*_ROM_audit.json',
+]
+
+# Number of threads used by db_load_files() to load several databases at the same time.
+# Reading and decompressing files release the GIL but parsing does not, so threads only help
+# when the files are read from slow storage and the parsing of a file can overlap with reading
+# the next ones. With the files in the disk cache 4 threads are not faster than 1, the speedup
+# of db_load_files() comes from disabling the garbage collector. Processes cannot be used
+# because multiprocessing does not work inside Kodi.
+# Use dev-core/benchmark_DB_load.py to compare on your system.
+DB_LOAD_NUM_THREADS = 1
+
+# Number of machines written at once into a table of the indexed machine store by
+# db_index_write_table(). Bigger batches are a bit faster but use more memory.
+DB_INDEX_BATCH_SIZE = 1000
+
+# Number of machine names in each query of db_index_get_rows(). SQLite limits the number of
+# parameters of a query to 999 in old versions.
+DB_INDEX_QUERY_SIZE = 500
+
+# Number of threads used to build Fanarts and 3D Boxes. Pillow releases the GIL when decoding,
+# resizing, transforming and encoding images, so the images are built in parallel on
+# multicore CPUs. Set to 1 to build the images one by one.
+GRAPHS_BUILD_NUM_THREADS = 4
+
+# Number of resized asset images kept in memory when building Fanarts. Clones usually use the
+# assets of the parent, so the same image is decoded and resized once for all the clones.
+# A 450x450 tile uses about 600 KB.
+GRAPHS_TILE_CACHE_SIZE = 128
+
+# PDF manuals are extracted on demand. Manuals with more pages than MANUALS_PAGES_PER_RANGE
+# are split into page ranges and only the range selected by the user is extracted before
+# the slideshow starts. While the manual is being viewed the next MANUALS_PREFETCH_PAGES
+# pages are extracted in the background.
+MANUALS_PAGES_PER_RANGE = 20
+MANUALS_PREFETCH_PAGES = 5
+
+# Maximum size in bytes of the images extracted from the PDF manuals. When exceeded, the
+# images of the least recently viewed manuals are deleted.
+MANUALS_CACHE_MAX_SIZE = 512 * 1024 * 1024
+
 # -------------------------------------------------------------------------------------------------
 # CUSTOM/DEBUG/TEST settings
 # -------------------------------------------------------------------------------------------------
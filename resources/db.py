@@ -22,9 +22,12 @@ from .utils import *
 
 # --- Python standard library ---
 import copy
+import gc
 import hashlib
 import io
+import json
 import re
+import sqlite3
 import subprocess
 import threading
 import time
@@ -190,6 +193,24 @@ def db_new_audit_dic():
         'machine_CHDs_are_OK'      : True,
     }
 
+# SL audit statistics. Keys are the same as in control_dic.
+def db_new_SL_audit_stats_dic():
+    return {
+        'audit_SL_items_runnable'          : 0,
+        'audit_SL_items_with_arch'         : 0,
+        'audit_SL_items_with_arch_OK'      : 0,
+        'audit_SL_items_with_arch_BAD'     : 0,
+        'audit_SL_items_without_arch'      : 0,
+        'audit_SL_items_with_arch_ROM'     : 0,
+        'audit_SL_items_with_arch_ROM_OK'  : 0,
+        'audit_SL_items_with_arch_ROM_BAD' : 0,
+        'audit_SL_items_without_arch_ROM'  : 0,
+        'audit_SL_items_with_CHD'          : 0,
+        'audit_SL_items_with_CHD_OK'       : 0,
+        'audit_SL_items_with_CHD_BAD'      : 0,
+        'audit_SL_items_without_CHD'       : 0,
+    }
+
 #
 # First element is the database dictionary key of the asset, second element is the subdirectory name.
 # List used in mame_scan_MAME_assets()
@@ -816,6 +837,19 @@ def db_get_cataloged_dic_all(cfg, catalog_name):
 
     return catalog_dic
 
+# Catalog count files have the categories of a catalog and the number of machines.
+# See mame_cache_index_count_list().
+def db_get_catalog_count_FN(cfg, catalog_name):
+    return cfg.CATALOG_DIR.pjoin('catalog_{}_count.json'.format(catalog_name.lower()))
+
+# Returns None if the count file does not exist (databases built with an older version
+# of the addon do not have it).
+def db_get_catalog_count_list(cfg, catalog_name):
+    count_FN = db_get_catalog_count_FN(cfg, catalog_name)
+    if not count_FN.exists(): return None
+
+    return utils_load_JSON_file(count_FN.getPath())
+
 #
 # Locates object index in a list of dictionaries by 'name' field.
 # Returns -1 if object cannot be found. Uses a linear search (slow!).
@@ -916,47 +950,83 @@ def db_set_Sample_flag(m_dic, new_Sample_flag):
     m_dic['flags'] = '{}{}{}{}{}'.format(flag_ROM, flag_CHD, flag_Samples, flag_SL, flag_Devices)
 
 # -------------------------------------------------------------------------------------------------
-# MAME hashed databases. Useful when only one item in a big dictionary is required.
+# MAME indexed databases. Useful when only one item in a big dictionary is required.
 # -------------------------------------------------------------------------------------------------
-# Hash database with 256 elements (2 hex digits)
-def db_build_main_hashed_db(cfg, control_dic, machines, machines_render):
-    log_info('db_build_main_hashed_db() Building main hashed database...')
+# The main+render data and the assets of every machine are stored in a single SQLite file,
+# one row per machine with the machine name as primary key. Each row stores the JSON of a
+# single machine, so retrieving a machine is one index lookup and one small JSON decode.
+#
+# Tables:
+#   machines (name TEXT PRIMARY KEY, data TEXT)   Main database merged with render database.
+#   assets   (name TEXT PRIMARY KEY, data TEXT)   Asset database.
+#
+# This replaces the old distributed database of 256 JSON files (hash/XX_machines.json and
+# hash/XX_assets.json), where a whole JSON file had to be parsed to get a single machine.
+def db_index_open(cfg):
+    return sqlite3.connect(cfg.MAIN_DB_INDEX_PATH.getPath())
+
+# Drops table_name if it exists and creates it again empty.
+def db_index_create_table(conn, table_name):
+    conn.execute('DROP TABLE IF EXISTS {}'.format(table_name))
+    conn.execute('CREATE TABLE {} (name TEXT PRIMARY KEY, data TEXT)'.format(table_name))
+
+# row_list is a list of tuples (machine_name, machine_dic).
+def db_index_insert_rows(conn, table_name, row_list):
+    conn.executemany('INSERT INTO {} (name, data) VALUES (?, ?)'.format(table_name),
+        [(m_name, json.dumps(m_dic, ensure_ascii = False)) for (m_name, m_dic) in row_list])
+
+# Writes the machines in data_dic into table_name in a single pass, in batches of
+# DB_INDEX_BATCH_SIZE rows. If merge_dic is not None the row of each machine is data_dic
+# merged with merge_dic. Merged dictionaries are created only for the current batch so
+# memory stays bounded.
+# The progress dialog shows the real throughput in machines per second.
+def db_index_write_table(cfg, pDialog, d_text, table_name, data_dic, merge_dic = None):
+    conn = db_index_open(cfg)
+    db_index_create_table(conn, table_name)
+    machine_name_list = list(data_dic)
+    num_machines = len(machine_name_list)
+    t_start = time.time()
+    for i in range(0, num_machines, DB_INDEX_BATCH_SIZE):
+        batch_names = machine_name_list[i:i + DB_INDEX_BATCH_SIZE]
+        row_list = []
+        for m_name in batch_names:
+            if merge_dic is None:
+                row_list.append((m_name, data_dic[m_name]))
+            else:
+                machine_dic = data_dic[m_name].copy()
+                machine_dic.update(merge_dic[m_name])
+                row_list.append((m_name, machine_dic))
+        db_index_insert_rows(conn, table_name, row_list)
+        processed = i + len(batch_names)
+        elapsed = time.time() - t_start
+        rate = int(processed / elapsed) if elapsed > 0 else 0
+        pDialog.updateProgress(processed, '{}\n{:,} of {:,} machines ({:,} machines/s)'.format(
+            d_text, processed, num_machines, rate))
+    conn.commit()
+    conn.close()
+    elapsed = time.time() - t_start
+    log_info('db_index_write_table() Table "{}" {:,} machines in {:.2f} s'.format(
+        table_name, num_machines, elapsed))
+
+# Returns the machine dictionary or raises KeyError if the machine is not in the table, in
+# the same way the old hashed database did.
+def db_index_get_row(cfg, table_name, machine_name):
+    conn = db_index_open(cfg)
+    try:
+        cursor = conn.execute('SELECT data FROM {} WHERE name = ?'.format(table_name), (machine_name,))
+        row = cursor.fetchone()
+    finally:
+        conn.close()
+    if row is None: raise KeyError(machine_name)
+
+    return json.loads(row[0])
 
-    # machine_name -> MD5 -> take two letters -> aa.json, ab.json, ...
-    # A) First create an index
-    #    db_main_hash_idx = { 'machine_name' : 'aa', ... }
-    # B) Then traverse a list [0, 1, ..., f] and write the machines in that sub database section.
+def db_build_main_hashed_db(cfg, control_dic, machines, machines_render):
+    log_info('db_build_main_hashed_db() Building main indexed database...')
+    d_text = 'Building main indexed database...'
     pDialog = KodiProgressDialog()
-    pDialog.startProgress('Building main hashed database...', len(machines))
-    db_main_hash_idx = {}
-    for key in machines:
-        pDialog.updateProgressInc()
-        md5_str = hashlib.md5(key.encode('utf-8')).hexdigest()
-        db_name = md5_str[0:2] # WARNING Python slicing does not work like in C/C++!
-        db_main_hash_idx[key] = db_name
-        # log_debug('Machine {:20s} / hash {} / db file {}'.format(key, md5_str, db_name))
-    pDialog.endProgress()
-
-    hex_digits = ['0', '1', '2', '3', '4', '5', '6', '7', '8', '9', 'a', 'b', 'c', 'd', 'e', 'f']
-    distributed_db_files = []
-    for u in range(len(hex_digits)):
-        for v in range(len(hex_digits)):
-            distributed_db_files.append('{}{}'.format(hex_digits[u], hex_digits[v]))
-    pDialog.startProgress('Building main hashed database JSON files...', len(distributed_db_files))
-    for db_prefix in distributed_db_files:
-        pDialog.updateProgressInc()
-        # log_debug('db prefix {}'.format(db_prefix))
-        # --- Generate dictionary in this JSON file ---
-        hashed_db_dic = {}
-        for key in db_main_hash_idx:
-            if db_main_hash_idx[key] == db_prefix:
-                machine_dic = machines[key].copy()
-                # >> returns None because it mutates machine_dic
-                machine_dic.update(machines_render[key])
-                hashed_db_dic[key] = machine_dic
-        # --- Save JSON file ---
-        hash_DB_FN = cfg.MAIN_DB_HASH_DIR.pjoin(db_prefix + '_machines.json')
-        utils_write_JSON_file(hash_DB_FN.getPath(), hashed_db_dic, verbose = False)
+    pDialog.startProgress(d_text, len(machines))
+    db_index_write_table(cfg, pDialog, d_text, 'machines', machines, machines_render)
     pDialog.endProgress()
 
     # Update timestamp in control_dic.
@@ -964,48 +1034,20 @@ def db_build_main_hashed_db(cfg, control_dic, machines, machines_render):
     utils_write_JSON_file(cfg.MAIN_CONTROL_PATH.getPath(), control_dic)
 
 #
-# Retrieves machine from distributed database.
+# Retrieves machine from the indexed database.
 # This is very quick for retrieving individual machines, very slow for multiple machines.
 #
 def db_get_machine_main_hashed_db(cfg, machine_name):
     log_debug('db_get_machine_main_hashed_db() machine {}'.format(machine_name))
-    md5_str = hashlib.md5(machine_name.encode('utf-8')).hexdigest()
-    # WARNING Python slicing does not work like in C/C++!
-    hash_DB_FN = cfg.MAIN_DB_HASH_DIR.pjoin(md5_str[0:2] + '_machines.json')
-    hashed_db_dic = utils_load_JSON_file(hash_DB_FN.getPath())
 
-    return hashed_db_dic[machine_name]
+    return db_index_get_row(cfg, 'machines', machine_name)
 
-# MAME hash database with 256 elements (2 hex digits)
 def db_build_asset_hashed_db(cfg, control_dic, assets_dic):
-    log_info('db_build_asset_hashed_db() Building assets hashed database ...')
-
-    # machine_name -> MD5 -> take two letters -> aa.json, ab.json, ...
+    log_info('db_build_asset_hashed_db() Building assets indexed database...')
+    d_text = 'Building asset indexed database...'
     pDialog = KodiProgressDialog()
-    pDialog.startProgress('Building asset hashed database...', len(assets_dic))
-    db_main_hash_idx = {}
-    for key in assets_dic:
-        pDialog.updateProgressInc()
-        md5_str = hashlib.md5(key.encode('utf-8')).hexdigest()
-        db_name = md5_str[0:2] # WARNING Python slicing does not work like in C/C++!
-        db_main_hash_idx[key] = db_name
-        # log_debug('Machine {:20s} / hash {} / db file {}'.format(key, md5_str, db_name))
-    pDialog.endProgress()
-
-    hex_digits = ['0', '1', '2', '3', '4', '5', '6', '7', '8', '9', 'a', 'b', 'c', 'd', 'e', 'f']
-    distributed_db_files = []
-    for u in range(len(hex_digits)):
-        for v in range(len(hex_digits)):
-            distributed_db_files.append('{}{}'.format(hex_digits[u], hex_digits[v]))
-    pDialog.startProgress('Building asset hashed database JSON files...', len(distributed_db_files))
-    for db_prefix in distributed_db_files:
-        pDialog.updateProgressInc()
-        hashed_db_dic = {}
-        for key in db_main_hash_idx:
-            if db_main_hash_idx[key] == db_prefix:
-                hashed_db_dic[key] = assets_dic[key]
-        hash_DB_FN = cfg.MAIN_DB_HASH_DIR.pjoin(db_prefix + '_assets.json')
-        utils_write_JSON_file(hash_DB_FN.getPath(), hashed_db_dic, verbose = False)
+    pDialog.startProgress(d_text, len(assets_dic))
+    db_index_write_table(cfg, pDialog, d_text, 'assets', assets_dic)
     pDialog.endProgress()
 
     # --- Timestamp ---
@@ -1013,16 +1055,116 @@ def db_build_asset_hashed_db(cfg, control_dic, assets_dic):
     utils_write_JSON_file(cfg.MAIN_CONTROL_PATH.getPath(), control_dic)
 
 #
-# Retrieves machine from distributed hashed database.
+# Retrieves machine assets from the indexed database.
 # This is very quick for retrieving individual machines, slow for multiple machines.
 #
 def db_get_machine_assets_hashed_db(cfg, machine_name):
     log_debug('db_get_machine_assets_hashed_db() machine {}'.format(machine_name))
-    md5_str = hashlib.md5(machine_name.encode('utf-8')).hexdigest()
-    hash_DB_FN = cfg.MAIN_DB_HASH_DIR.pjoin(md5_str[0:2] + '_assets.json')
-    hashed_db_dic = utils_load_JSON_file(hash_DB_FN.getPath())
 
-    return hashed_db_dic[machine_name]
+    return db_index_get_row(cfg, 'assets', machine_name)
+
+# Returns a dictionary with the rows of the machines in machine_name_list. Machines not in the
+# table are not in the returned dictionary. Queries are done in batches of DB_INDEX_QUERY_SIZE
+# names because SQLite limits the number of parameters of a query.
+def db_index_get_rows(cfg, table_name, machine_name_list):
+    data_dic = {}
+    conn = db_index_open(cfg)
+    try:
+        for i in range(0, len(machine_name_list), DB_INDEX_QUERY_SIZE):
+            batch_names = machine_name_list[i:i + DB_INDEX_QUERY_SIZE]
+            sql_str = 'SELECT name, data FROM {} WHERE name IN ({})'.format(
+                table_name, ', '.join(['?'] * len(batch_names)))
+            for (m_name, data_str) in conn.execute(sql_str, batch_names):
+                data_dic[m_name] = json.loads(data_str)
+    finally:
+        conn.close()
+
+    return data_dic
+
+# -------------------------------------------------------------------------------------------------
+# MAME catalog page index. Used to render huge machine lists one page at a time.
+# -------------------------------------------------------------------------------------------------
+# Every category of every catalog, in both view modes, is stored in the indexed database
+# sorted by display name. A page of a category is then a range query on the primary key and
+# the main/render/asset data of the machines of the page is read from the indexed tables.
+#
+# Table:
+#   catalog (hash TEXT, view INTEGER, position INTEGER, name TEXT, render_name TEXT, clones TEXT)
+#   hash is db_cache_get_key(catalog_name, category_name), view is VIEW_MODE_FLAT or
+#   VIEW_MODE_PCLONE and clones is the JSON list of clones of the machine (empty for clones).
+def db_catalog_sort_key(catalog_dic, m_name):
+    return (catalog_dic[m_name].lower(), m_name)
+
+def db_build_catalog_index(cfg, cache_index_dic, main_pclone_dic):
+    log_info('db_build_catalog_index() Building catalog page index...')
+    conn = db_index_open(cfg)
+    conn.execute('DROP TABLE IF EXISTS catalog')
+    conn.execute('CREATE TABLE catalog (hash TEXT, view INTEGER, position INTEGER, '
+        'name TEXT, render_name TEXT, clones TEXT, PRIMARY KEY (hash, view, position))')
+    num_catalogs = len(cache_index_dic)
+    catalog_count = 1
+    num_rows = 0
+    pDialog = KodiProgressDialog()
+    pDialog.startProgress('Building catalog page index')
+    for catalog_name in sorted(cache_index_dic):
+        diag_t = 'Building MAME [COLOR orange]{}[/COLOR] page index ({} of {})...'.format(
+            catalog_name, catalog_count, num_catalogs)
+        pDialog.resetProgress(diag_t, len(cache_index_dic[catalog_name]))
+        view_list = [
+            (VIEW_MODE_FLAT, db_get_cataloged_dic_all(cfg, catalog_name)),
+            (VIEW_MODE_PCLONE, db_get_cataloged_dic_parents(cfg, catalog_name)),
+        ]
+        for catalog_key in cache_index_dic[catalog_name]:
+            pDialog.updateProgressInc()
+            hash_str = db_cache_get_key(catalog_name, catalog_key)
+            for (view_mode, catalog_dic) in view_list:
+                category_dic = catalog_dic[catalog_key]
+                row_list = []
+                for position, m_name in enumerate(sorted(category_dic,
+                    key = lambda x : db_catalog_sort_key(category_dic, x))):
+                    clone_list = main_pclone_dic[m_name] if m_name in main_pclone_dic else []
+                    row_list.append((hash_str, view_mode, position, m_name,
+                        category_dic[m_name], json.dumps(clone_list)))
+                conn.executemany('INSERT INTO catalog VALUES (?, ?, ?, ?, ?, ?)', row_list)
+                num_rows += len(row_list)
+        catalog_count += 1
+    conn.commit()
+    conn.close()
+    pDialog.endProgress()
+    log_info('db_build_catalog_index() Catalog page index has {:,} rows'.format(num_rows))
+
+# Returns True if the catalog page index exists (databases built with an older version
+# of the addon do not have it).
+def db_catalog_index_exists(cfg):
+    if not cfg.MAIN_DB_INDEX_PATH.exists(): return False
+    conn = db_index_open(cfg)
+    try:
+        cursor = conn.execute(
+            "SELECT name FROM sqlite_master WHERE type = 'table' AND name = 'catalog'")
+        row = cursor.fetchone()
+    finally:
+        conn.close()
+
+    return row is not None
+
+# Returns a tuple (page_list, num_items). page_list is a list of tuples
+# (machine_name, render_name, clone_list) with the machines of the page sorted by display
+# name. Page numbers start at 0. num_items is the total number of machines in the category.
+def db_get_catalog_page(cfg, catalog_name, category_name, view_mode, page, page_size):
+    hash_str = db_cache_get_key(catalog_name, category_name)
+    conn = db_index_open(cfg)
+    try:
+        cursor = conn.execute('SELECT COUNT(*) FROM catalog WHERE hash = ? AND view = ?',
+            (hash_str, view_mode))
+        num_items = cursor.fetchone()[0]
+        cursor = conn.execute('SELECT name, render_name, clones FROM catalog '
+            'WHERE hash = ? AND view = ? AND position >= ? AND position < ? ORDER BY position',
+            (hash_str, view_mode, page * page_size, (page + 1) * page_size))
+        page_list = [(m_name, r_name, json.loads(c_str)) for (m_name, r_name, c_str) in cursor]
+    finally:
+        conn.close()
+
+    return (page_list, num_items)
 
 # -------------------------------------------------------------------------------------------------
 # MAME machine render cache
@@ -1055,7 +1197,8 @@ def db_build_render_cache(cfg, control_dic, cache_index_dic, machines_render, fo
     pDialog.resetProgress('Cleaning render cache JSON files...', len(file_list))
     for file in file_list:
         pDialog.updateProgressInc()
-        if not file.endswith('_render.json'): continue
+        if not file.endswith('_render.json') and not file.endswith('_view.json') \
+            and not file.endswith('_payload.json'): continue
         full_path = os.path.join(cfg.CACHE_DIR.getPath(), file)
         # log_debug('UNLINK "{}"'.format(full_path))
         os.unlink(full_path)
@@ -1064,6 +1207,8 @@ def db_build_render_cache(cfg, control_dic, cache_index_dic, machines_render, fo
     log_info('Deleted {} files'.format(deleted_items))
 
     # --- Build ROM cache ---
+    # The view cache is built later by db_build_asset_cache(), which is always called after
+    # this function. The asset cache files on disk may be from the previous build.
     num_catalogs = len(cache_index_dic)
     catalog_count = 1
     pDialog.startProgress('Building MAME render cache')
@@ -1124,7 +1269,8 @@ def db_build_asset_cache(cfg, control_dic, cache_index_dic, assets_dic, force_bu
     pDialog.resetProgress('Cleaning asset cache JSON files...', len(file_list))
     for file in file_list:
         pDialog.updateProgressInc()
-        if not file.endswith('_assets.json'): continue
+        if not file.endswith('_assets.json') and not file.endswith('_view.json') \
+            and not file.endswith('_payload.json'): continue
         full_path = os.path.join(cfg.CACHE_DIR.getPath(), file)
         # log_debug('UNLINK "{}"'.format(full_path))
         os.unlink(full_path)
@@ -1133,12 +1279,15 @@ def db_build_asset_cache(cfg, control_dic, cache_index_dic, assets_dic, force_bu
     log_info('Deleted {} files'.format(deleted_items))
 
     # --- Build MAME asset cache ---
+    build_view_cache = db_view_cache_enabled(cfg)
+    if build_view_cache: main_pclone_dic = utils_load_JSON_file(cfg.MAIN_PCLONE_DB_PATH.getPath())
     num_catalogs = len(cache_index_dic)
     catalog_count = 1
     pDialog.startProgress('Building MAME asset cache')
     for catalog_name in sorted(cache_index_dic):
         catalog_index_dic = cache_index_dic[catalog_name]
         catalog_all = db_get_cataloged_dic_all(cfg, catalog_name)
+        if build_view_cache: catalog_parents = db_get_cataloged_dic_parents(cfg, catalog_name)
         diag_t = 'Building MAME [COLOR orange]{}[/COLOR] asset cache ({} of {})...'.format(
             catalog_name, catalog_count, num_catalogs)
         pDialog.resetProgress(diag_t, len(catalog_index_dic))
@@ -1154,6 +1303,14 @@ def db_build_asset_cache(cfg, control_dic, cache_index_dic, assets_dic, force_bu
                 m_assets_all_dic[machine_name] = assets_dic[machine_name]
             ROMs_all_FN = cfg.CACHE_DIR.pjoin(hash_str + '_assets.json')
             utils_write_JSON_file(ROMs_all_FN.getPath(), m_assets_all_dic, verbose = False)
+
+            # Build the view cache if the render cache of this category exists.
+            if not build_view_cache: continue
+            render_FN = cfg.CACHE_DIR.pjoin(hash_str + '_render.json')
+            if not render_FN.exists(): continue
+            m_render_all_dic = utils_load_JSON_file(render_FN.getPath(), verbose = False)
+            db_build_view_cache_row(cfg, hash_str, catalog_all[catalog_key],
+                catalog_parents[catalog_key], main_pclone_dic, m_render_all_dic, m_assets_all_dic)
         catalog_count += 1
     pDialog.endProgress()
 
@@ -1167,27 +1324,112 @@ def db_get_asset_cache_row(cfg, cache_index_dic, catalog_name, category_name):
 
     return utils_load_JSON_file(ROMs_all_FN.getPath())
 
+# -------------------------------------------------------------------------------------------------
+# MAME view cache
+# One file per category with everything needed to render the machine list of the category,
+# so rendering a list requires reading a single JSON file. The view cache is built by
+# db_build_asset_cache() from the render cache files when both caches are enabled.
+# db_build_render_cache() is always called before db_build_asset_cache().
+# The payload cache files CACHE_DIR/'hash'_'settings hash'_payload.json are built from the
+# view cache when rendering and are deleted together with the view cache.
+#
+# CACHE_DIR/'hash'_view.json
+# view_dic = {
+#     'all' : { machine_name : render_name, ... }, Machines in flat mode.
+#     'parents' : [ machine_name, ... ],           Machines in parent/clone mode.
+#     'pclone' : { parent_name : [ clone_name, ... ], ... },
+#     'rows' : { machine_name : { render fields + asset fields }, ... },
+# }
+# -------------------------------------------------------------------------------------------------
+def db_view_cache_enabled(cfg):
+    return cfg.settings['debug_enable_MAME_render_cache'] and cfg.settings['debug_enable_MAME_asset_cache']
+
+# If a machine is not in the render or asset cache files (outdated files) the view of the
+# category is not built and the category is rendered without the view cache.
+def db_build_view_cache_row(cfg, hash_str, category_all_dic, category_parents_dic,
+    main_pclone_dic, m_render_all_dic, m_assets_all_dic):
+    view_dic = {
+        'all' : category_all_dic,
+        'parents' : list(category_parents_dic),
+        'pclone' : {},
+        'rows' : {},
+    }
+    for machine_name in category_all_dic:
+        if machine_name not in m_render_all_dic or machine_name not in m_assets_all_dic:
+            log_warning('db_build_view_cache_row() Machine {} not in cache. View {} skipped.'.format(
+                machine_name, hash_str))
+            return
+        if machine_name in main_pclone_dic and main_pclone_dic[machine_name]:
+            view_dic['pclone'][machine_name] = main_pclone_dic[machine_name]
+        row_dic = m_render_all_dic[machine_name].copy()
+        row_dic.update(m_assets_all_dic[machine_name])
+        view_dic['rows'][machine_name] = row_dic
+    view_FN = cfg.CACHE_DIR.pjoin(hash_str + '_view.json')
+    utils_write_JSON_file(view_FN.getPath(), view_dic, verbose = False)
+
+# Returns None if the view cache of the category does not exist.
+def db_get_view_cache_row(cfg, catalog_name, category_name):
+    view_FN = cfg.CACHE_DIR.pjoin(db_cache_get_key(catalog_name, category_name) + '_view.json')
+    if not view_FN.exists(): return None
+
+    return utils_load_JSON_file(view_FN.getPath())
+
 # -------------------------------------------------------------------------------------------------
 # Load and save a bunch of JSON files
 # -------------------------------------------------------------------------------------------------
 # Accepts a list of JSON files to be loaded. Displays a progress dialog.
 # Returns a dictionary with the context of the loaded files.
+# Databases are independent, so up to DB_LOAD_NUM_THREADS files are loaded at the same time.
+# Threads are started in the order of db_files and the progress dialog is updated as each
+# file finishes loading.
+# The garbage collector is disabled while loading. Parsing creates millions of objects that
+# trigger many full collections, which are useless because the databases have no reference
+# cycles. With several threads loading at the same time the collections are even slower.
+# Most of the speedup comes from disabling the garbage collector, see DB_LOAD_NUM_THREADS.
 def db_load_files(db_files):
-    log_debug('db_load_files() Loading {} JSON database files...'.format(len(db_files)))
+    log_debug('db_load_files() Loading {} database files...'.format(len(db_files)))
     db_dic = {}
     d_text = 'Loading databases...'
     pDialog = KodiProgressDialog()
     pDialog.startProgress(d_text, len(db_files))
-    for f_item in db_files:
-        dict_key, db_name, db_path = f_item
-        pDialog.updateProgressInc('{}\nDatabase [COLOR orange]{}[/COLOR]'.format(d_text, db_name))
-        db_dic[dict_key] = utils_load_JSON_file(db_path)
-    pDialog.endProgress()
+    t_start = time.time()
+    gc_enabled = gc.isenabled()
+    gc.disable()
+    serial_time = 0.0
+    pending_list = list(db_files)
+    running_list = []
+    try:
+        while pending_list or running_list:
+            while pending_list and len(running_list) < max(1, DB_LOAD_NUM_THREADS):
+                dict_key, db_name, db_path = pending_list.pop(0)
+                load_thread = Threaded_Load_JSON(db_path)
+                load_thread.dict_key = dict_key
+                load_thread.db_name = db_name
+                load_thread.start()
+                running_list.append(load_thread)
+            load_thread = running_list.pop(0)
+            load_thread.join()
+            if load_thread.exception is not None:
+                log_error('db_load_files() Exception loading "{}"'.format(load_thread.json_filename))
+                # Wait for the other threads before leaving.
+                for running_thread in running_list: running_thread.join()
+                raise load_thread.exception
+            pDialog.updateProgressInc('{}\nDatabase [COLOR orange]{}[/COLOR]'.format(
+                d_text, load_thread.db_name))
+            db_dic[load_thread.dict_key] = load_thread.output_dic
+            serial_time += load_thread.load_time
+    finally:
+        if gc_enabled: gc.enable()
+        pDialog.endProgress()
+    # The load time of each file includes the time waiting for other threads, so the sum is
+    # an upper bound of the serial load time. Use dev-core/benchmark_DB_load.py to compare.
+    log_debug('db_load_files() Sum of file load times {:.3f} s, elapsed {:.3f} s ({} threads)'.format(
+        serial_time, time.time() - t_start, DB_LOAD_NUM_THREADS))
 
     return db_dic
 
 def db_save_files(db_files):
-    log_debug('db_save_files() Saving {} JSON database files...'.format(len(db_files)))
+    log_debug('db_save_files() Saving {} database files...'.format(len(db_files)))
     d_text = 'Saving databases...'
     pDialog = KodiProgressDialog()
     pDialog.startProgress(d_text, len(db_files))
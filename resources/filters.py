@@ -81,6 +81,44 @@ def _get_change_tuple(text_t):
         log_error(m)
         raise Addon_Error(m)
 
+# -------------------------------------------------------------------------------------------------
+# Parser engine shared by the SP, LSP and YP parsers.
+# Parser inspired by http://effbot.org/zone/simple-top-down-parsing.htm
+#
+# The engine object holds the token stream of the program being parsed, so the parsers are
+# reentrant and several programs can be parsed at the same time. The search context (string,
+# list of strings or year) is not stored in the parse tree but passed to exec_token(), so a
+# parse tree can be executed by several threads at the same time.
+# -------------------------------------------------------------------------------------------------
+class Parser_Engine:
+    def __init__(self, token_generator):
+        if ADDON_RUNNING_PYTHON_2:
+            self.next = token_generator.next
+        elif ADDON_RUNNING_PYTHON_3:
+            self.next = token_generator.__next__
+        else:
+            raise TypeError('Undefined Python runtime version.')
+        self.token = self.next()
+
+    def expression(self, rbp = 0):
+        t = self.token
+        self.token = self.next()
+        left = t.nud(self)
+        while rbp < self.token.lbp:
+            t = self.token
+            self.token = self.next()
+            left = t.led(self, left)
+
+        return left
+
+    # id is a type object as return by type()
+    def advance(self, id = None):
+        if id and type(self.token) != id:
+            raise SyntaxError("Expected {}".format(type(self.token)))
+        self.token = self.next()
+
+    def parse(self): return self.expression()
+
 # -------------------------------------------------------------------------------------------------
 # String Parser (SP) engine. Grammar token objects.
 # Parser inspired by http://effbot.org/zone/simple-top-down-parsing.htm
@@ -92,10 +130,10 @@ debug_SP_parse_exec = False
 
 class SP_literal_token:
     def __init__(self, value): self.value = value
-    def nud(self):
+    def nud(self, parser):
         if debug_SP_parser: log_debug('Call LITERAL token nud()')
         return self
-    def exec_token(self):
+    def exec_token(self, search):
         if debug_SP_parser: log_debug('Executing LITERAL token value "{}"'.format(self.value))
         ret = self.value
         if debug_SP_parser: log_debug('Token LITERAL returns {} "{}"'.format(type(ret), text_type(ret)))
@@ -105,16 +143,16 @@ class SP_literal_token:
 class SP_operator_has_token:
     lbp = 50
     def __init__(self): pass
-    def nud(self):
+    def nud(self, parser):
         if debug_SP_parser: log_debug('Call HAS token nud()')
-        self.first = SP_expression(50)
+        self.first = parser.expression(50)
         return self
-    def exec_token(self):
+    def exec_token(self, search):
         if debug_SP_parser: log_debug('Executing HAS token')
-        literal_str = self.first.exec_token()
+        literal_str = self.first.exec_token(search)
         if type(literal_str) is not text_type:
             raise SyntaxError("HAS token exec; expected string, got {}".format(type(literal_str)))
-        ret = True if SP_parser_search_string.find(literal_str) >= 0 else False
+        ret = True if search.find(literal_str) >= 0 else False
         if debug_SP_parser: log_debug('Token HAS returns {} "{}"'.format(type(ret), text_type(ret)))
         return ret
     def __repr__(self): return "<OP has>"
@@ -122,16 +160,16 @@ class SP_operator_has_token:
 class SP_operator_lacks_token:
     lbp = 50
     def __init__(self): pass
-    def nud(self):
+    def nud(self, parser):
         if debug_SP_parser: log_debug('Call LACKS token nud()')
-        self.first = SP_expression(50)
+        self.first = parser.expression(50)
         return self
-    def exec_token(self):
+    def exec_token(self, search):
         if debug_SP_parser: log_debug('Executing LACKS token')
-        literal_str = self.first.exec_token()
+        literal_str = self.first.exec_token(search)
         if type(literal_str) is not text_type:
             raise SyntaxError("LACKS token exec; expected string, got {}".format(type(literal_str)))
-        ret = False if SP_parser_search_string.find(literal_str) >= 0 else True
+        ret = False if search.find(literal_str) >= 0 else True
         if debug_SP_parser: log_debug('Token LACKS returns {} "{}"'.format(type(ret), text_type(ret)))
         return ret
     def __repr__(self): return "<OP lacks>"
@@ -139,13 +177,13 @@ class SP_operator_lacks_token:
 class SP_operator_not_token:
     lbp = 50
     def __init__(self): pass
-    def nud(self):
+    def nud(self, parser):
         if debug_SP_parser: log_debug('Call NOT token nud()')
-        self.first = SP_expression(50)
+        self.first = parser.expression(50)
         return self
-    def exec_token(self):
+    def exec_token(self, search):
         if debug_SP_parser: log_debug('Executing NOT token')
-        exp_bool = self.first.exec_token()
+        exp_bool = self.first.exec_token(search)
         if type(exp_bool) is not bool:
             raise SyntaxError("NOT token exec; expected string, got {}".format(type(exp_bool)))
         ret = not exp_bool
@@ -156,14 +194,14 @@ class SP_operator_not_token:
 class SP_operator_and_token:
     lbp = 10
     def __init__(self): pass
-    def led(self, left):
+    def led(self, parser, left):
         if debug_SP_parser: log_debug('Call AND token led()')
         self.first = left
-        self.second = SP_expression(10)
+        self.second = parser.expression(10)
         return self
-    def exec_token(self):
+    def exec_token(self, search):
         if debug_SP_parser: log_debug('Executing AND token')
-        ret = self.first.exec_token() and self.second.exec_token()
+        ret = self.first.exec_token(search) and self.second.exec_token(search)
         if debug_SP_parser: log_debug('Token AND returns {} "{}"'.format(type(ret), text_type(ret)))
         return ret
     def __repr__(self): return "<OP and>"
@@ -171,14 +209,14 @@ class SP_operator_and_token:
 class SP_operator_or_token:
     lbp = 10
     def __init__(self): pass
-    def led(self, left):
+    def led(self, parser, left):
         if debug_SP_parser: log_debug('Call OR token led()')
         self.first = left
-        self.second = SP_expression(10)
+        self.second = parser.expression(10)
         return self
-    def exec_token(self):
+    def exec_token(self, search):
         if debug_SP_parser: log_debug('Executing OR token')
-        ret = self.first.exec_token() or self.second.exec_token()
+        ret = self.first.exec_token(search) or self.second.exec_token(search)
         if debug_SP_parser: log_debug('Token OR returns {} "{}"'.format(type(ret), text_type(ret)))
         return ret
     def __repr__(self): return "<OP or>"
@@ -222,48 +260,25 @@ def SP_tokenize(program):
 # -------------------------------------------------------------------------------------------------
 # String Parser (SP) inspired by http://effbot.org/zone/simple-top-down-parsing.htm
 # -------------------------------------------------------------------------------------------------
-def SP_expression(rbp = 0):
-    global SP_token
-
-    t = SP_token
-    SP_token = SP_next()
-    left = t.nud()
-    while rbp < SP_token.lbp:
-        t = SP_token
-        SP_token = SP_next()
-        left = t.led(left)
-
-    return left
+# Tokenizes and parses a program and returns the parse tree. The parse tree can be executed
+# many times with SP_exec(), for example once per machine, without parsing the program again.
+def SP_parse(program):
+    if debug_SP_parse_exec:
+        log_debug('SP_parse() Program "{}"'.format(program))
+    parse_tree = Parser_Engine(SP_tokenize(program)).parse()
+    if debug_SP_parse_exec:
+        log_debug('SP_parse() Parse tree root token {}'.format(parse_tree))
 
-def SP_parse_exec(program, search_string):
-    global SP_token, SP_next, SP_parser_search_string
+    return parse_tree
 
+def SP_exec(parse_tree, search_string):
     if debug_SP_parse_exec:
-        log_debug('SP_parse_exec() Initialising program execution')
-        log_debug('SP_parse_exec() Search string "{}"'.format(search_string))
-        log_debug('SP_parse_exec() Program       "{}"'.format(program))
-    SP_parser_search_string = search_string
-    if ADDON_RUNNING_PYTHON_2:
-        SP_next = SP_tokenize(program).next
-    elif ADDON_RUNNING_PYTHON_3:
-        SP_next = SP_tokenize(program).__next__
-    else:
-        raise TypeError('Undefined Python runtime version.')
-    SP_token = SP_next()
-
-    # Old function parse_exec()
-    rbp = 0
-    t = SP_token
-    SP_token = SP_next()
-    left = t.nud()
-    while rbp < SP_token.lbp:
-        t = SP_token
-        SP_token = SP_next()
-        left = t.led(left)
-    if debug_SP_parse_exec:
-        log_debug('SP_parse_exec() Init exec program in token {}'.format(left))
+        log_debug('SP_exec() Search string "{}"'.format(search_string))
 
-    return left.exec_token()
+    return parse_tree.exec_token(search_string)
+
+def SP_parse_exec(program, search_string):
+    return SP_exec(SP_parse(program), search_string)
 
 # -------------------------------------------------------------------------------------------------
 # List of String Parser (LSP) engine. Grammar token objects.
@@ -277,31 +292,23 @@ debug_LSP_parse_exec = False
 
 class LSP_literal_token:
     def __init__(self, value): self.value = value
-    def nud(self):
+    def nud(self, parser):
         if debug_LSP_parser: log_debug('Call LITERAL token nud()')
         return self
-    def exec_token(self):
+    def exec_token(self, search):
         if debug_LSP_parser: log_debug('Executing LITERAL token value "{}"'.format(self.value))
         ret = self.value
         if debug_LSP_parser: log_debug('Token LITERAL returns {} "{}"'.format(type(ret), text_type(ret)))
         return ret
     def __repr__(self): return '<LITERAL "{}">'.format(self.value)
 
-# id is a type object as return by type()
-def LSP_advance(id = None):
-    global LSP_token
-
-    if id and type(LSP_token) != id:
-        raise SyntaxError("Expected {}".format(type(LSP_token)))
-    LSP_token = LSP_next()
-
 class LSP_operator_open_par_token:
     lbp = 0
     def __init__(self): pass
-    def nud(self):
+    def nud(self, parser):
         if debug_LSP_parser: log_debug('Call ( token nud()')
-        expr = LSP_expression()
-        LSP_advance(LSP_operator_close_par_token)
+        expr = parser.expression()
+        parser.advance(LSP_operator_close_par_token)
         return expr
     def __repr__(self): return "<OP (>"
 
@@ -313,16 +320,16 @@ class LSP_operator_close_par_token:
 class LSP_operator_has_token:
     lbp = 50
     def __init__(self): pass
-    def nud(self):
+    def nud(self, parser):
         if debug_LSP_parser: log_debug('Call HAS token nud()')
-        self.first = LSP_expression(50)
+        self.first = parser.expression(50)
         return self
-    def exec_token(self):
+    def exec_token(self, search):
         if debug_LSP_parser: log_debug('Executing HAS token')
-        literal_str = self.first.exec_token()
+        literal_str = self.first.exec_token(search)
         if type(literal_str) is not text_type:
             raise SyntaxError("HAS token exec; expected string, got {}".format(type(literal_str)))
-        ret = literal_str in LSP_parser_search_list
+        ret = literal_str in search
         if debug_LSP_parser: log_debug('Token HAS returns {} "{}"'.format(type(ret), text_type(ret)))
         return ret
     def __repr__(self): return "<OP has>"
@@ -330,16 +337,16 @@ class LSP_operator_has_token:
 class LSP_operator_lacks_token:
     lbp = 50
     def __init__(self): pass
-    def nud(self):
+    def nud(self, parser):
         if debug_LSP_parser: log_debug('Call LACKS token nud()')
-        self.first = LSP_expression(50)
+        self.first = parser.expression(50)
         return self
-    def exec_token(self):
+    def exec_token(self, search):
         if debug_LSP_parser: log_debug('Executing LACKS token')
-        literal_str = self.first.exec_token()
+        literal_str = self.first.exec_token(search)
         if type(literal_str) is not text_type:
             raise SyntaxError("LACKS token exec; expected string, got {}".format(type(literal_str)))
-        ret = literal_str not in LSP_parser_search_list
+        ret = literal_str not in search
         if debug_LSP_parser: log_debug('Token LACKS returns {} "{}"'.format(type(ret), text_type(ret)))
         return ret
     def __repr__(self): return "<OP lacks>"
@@ -347,13 +354,13 @@ class LSP_operator_lacks_token:
 class LSP_operator_not_token:
     lbp = 50
     def __init__(self): pass
-    def nud(self):
+    def nud(self, parser):
         if debug_LSP_parser: log_debug('Call NOT token nud()')
-        self.first = LSP_expression(50)
+        self.first = parser.expression(50)
         return self
-    def exec_token(self):
+    def exec_token(self, search):
         if debug_LSP_parser: log_debug('Executing NOT token')
-        exp_bool = self.first.exec_token()
+        exp_bool = self.first.exec_token(search)
         if type(exp_bool) is not bool:
             raise SyntaxError("NOT token exec; expected string, got {}".format(type(exp_bool)))
         ret = not exp_bool
@@ -364,14 +371,14 @@ class LSP_operator_not_token:
 class LSP_operator_and_token:
     lbp = 10
     def __init__(self): pass
-    def led(self, left):
+    def led(self, parser, left):
         if debug_LSP_parser: log_debug('Call AND token led()')
         self.first = left
-        self.second = LSP_expression(10)
+        self.second = parser.expression(10)
         return self
-    def exec_token(self):
+    def exec_token(self, search):
         if debug_LSP_parser: log_debug('Executing AND token')
-        ret = self.first.exec_token() and self.second.exec_token()
+        ret = self.first.exec_token(search) and self.second.exec_token(search)
         if debug_LSP_parser: log_debug('Token AND returns {} "{}"'.format(type(ret), text_type(ret)))
         return ret
     def __repr__(self): return "<OP and>"
@@ -379,14 +386,14 @@ class LSP_operator_and_token:
 class LSP_operator_or_token:
     lbp = 10
     def __init__(self): pass
-    def led(self, left):
+    def led(self, parser, left):
         if debug_LSP_parser: log_debug('Call OR token led()')
         self.first = left
-        self.second = LSP_expression(10)
+        self.second = parser.expression(10)
         return self
-    def exec_token(self):
+    def exec_token(self, search):
         if debug_LSP_parser: log_debug('Executing OR token')
-        ret = self.first.exec_token() or self.second.exec_token()
+        ret = self.first.exec_token(search) or self.second.exec_token(search)
         if debug_LSP_parser: log_debug('Token OR returns {} "{}"'.format(type(ret), text_type(ret)))
         return ret
     def __repr__(self): return "<OP or>"
@@ -431,47 +438,24 @@ def LSP_tokenize(program):
 # -------------------------------------------------------------------------------------------------
 # List of String Parser (LSP) inspired by http://effbot.org/zone/simple-top-down-parsing.htm
 # -------------------------------------------------------------------------------------------------
-def LSP_expression(rbp = 0):
-    global LSP_token
-
-    t = LSP_token
-    LSP_token = LSP_next()
-    left = t.nud()
-    while rbp < LSP_token.lbp:
-        t = LSP_token
-        LSP_token = LSP_next()
-        left = t.led(left)
-    return left
+# See SP_parse() comments.
+def LSP_parse(program):
+    if debug_LSP_parse_exec:
+        log_debug('LSP_parse() Program "{}"'.format(program))
+    parse_tree = Parser_Engine(LSP_tokenize(program)).parse()
+    if debug_LSP_parse_exec:
+        log_debug('LSP_parse() Parse tree root token {}'.format(parse_tree))
 
-def LSP_parse_exec(program, search_list):
-    global LSP_token, LSP_next, LSP_parser_search_list
+    return parse_tree
 
+def LSP_exec(parse_tree, search_list):
     if debug_LSP_parse_exec:
-        log_debug('LSP_parse_exec() Initialising program execution')
-        log_debug('LSP_parse_exec() Search  "{}"'.format(text_type(search_list)))
-        log_debug('LSP_parse_exec() Program "{}"'.format(program))
-    LSP_parser_search_list = search_list
-    if ADDON_RUNNING_PYTHON_2:
-        LSP_next = LSP_tokenize(program).next
-    elif ADDON_RUNNING_PYTHON_3:
-        LSP_next = LSP_tokenize(program).__next__
-    else:
-        raise TypeError('Undefined Python runtime version.')
-    LSP_token = LSP_next()
-
-    # Old function parse_exec().
-    rbp = 0
-    t = LSP_token
-    LSP_token = LSP_next()
-    left = t.nud()
-    while rbp < LSP_token.lbp:
-        t = LSP_token
-        LSP_token = LSP_next()
-        left = t.led(left)
-    if debug_LSP_parse_exec:
-        log_debug('LSP_parse_exec() Init exec program in token {}'.format(left))
+        log_debug('LSP_exec() Search "{}"'.format(text_type(search_list)))
 
-    return left.exec_token()
+    return parse_tree.exec_token(search_list)
+
+def LSP_parse_exec(program, search_list):
+    return LSP_exec(LSP_parse(program), search_list)
 
 # -------------------------------------------------------------------------------------------------
 # Year Parser (YP) engine. Grammar token objects.
@@ -486,29 +470,22 @@ debug_YP_parse_exec = False
 
 class YP_literal_token:
     def __init__(self, value): self.value = value
-    def nud(self): return self
-    def exec_token(self):
+    def nud(self, parser): return self
+    def exec_token(self, search):
         if self.value == 'year':
-            ret = YP_year
+            ret = search
         else:
             ret = int(self.value)
         if debug_YP_parser: log_debug('Token LITERAL returns {} "{}"'.format(type(ret), text_type(ret)))
         return ret
     def __repr__(self): return '[LITERAL "{}"]'.format(self.value)
 
-def YP_advance(id = None):
-    global YP_token
-
-    if id and type(YP_token) != id:
-        raise SyntaxError("Expected {}".format(type(YP_token)))
-    YP_token = YP_next()
-
 class YP_operator_open_par_token:
     lbp = 0
     def __init__(self): pass
-    def nud(self):
-        expr = YP_expression()
-        YP_advance(YP_operator_close_par_token)
+    def nud(self, parser):
+        expr = parser.expression()
+        parser.advance(YP_operator_close_par_token)
         return expr
     def __repr__(self): return "[OP (]"
 
@@ -520,11 +497,11 @@ class YP_operator_close_par_token:
 class YP_operator_not_token:
     lbp = 60
     def __init__(self): pass
-    def nud(self):
-        self.first = YP_expression(50)
+    def nud(self, parser):
+        self.first = parser.expression(50)
         return self
-    def exec_token(self):
-        ret = not self.first.exec_token()
+    def exec_token(self, search):
+        ret = not self.first.exec_token(search)
         if debug_YP_parser: log_debug('Token NOT returns {} "{}"'.format(type(ret), text_type(ret)))
         return ret
     def __repr__(self): return "[OP not]"
@@ -532,12 +509,12 @@ class YP_operator_not_token:
 class YP_operator_and_token:
     lbp = 10
     def __init__(self): pass
-    def led(self, left):
+    def led(self, parser, left):
         self.first = left
-        self.second = YP_expression(10)
+        self.second = parser.expression(10)
         return self
-    def exec_token(self):
-        ret = self.first.exec_token() and self.second.exec_token()
+    def exec_token(self, search):
+        ret = self.first.exec_token(search) and self.second.exec_token(search)
         if debug_YP_parser: log_debug('Token AND returns {} "{}"'.format(type(ret), text_type(ret)))
         return ret
     def __repr__(self): return "[OP and]"
@@ -545,12 +522,12 @@ class YP_operator_and_token:
 class YP_operator_or_token:
     lbp = 10
     def __init__(self): pass
-    def led(self, left):
+    def led(self, parser, left):
         self.first = left
-        self.second = YP_expression(10)
+        self.second = parser.expression(10)
         return self
-    def exec_token(self):
-        ret = self.first.exec_token() or self.second.exec_token()
+    def exec_token(self, search):
+        ret = self.first.exec_token(search) or self.second.exec_token(search)
         if debug_YP_parser: log_debug('Token OR returns {} "{}"'.format(type(ret), text_type(ret)))
         return ret
     def __repr__(self): return "[OP or]"
@@ -558,12 +535,12 @@ class YP_operator_or_token:
 class YP_operator_equal_token:
     lbp = 50
     def __init__(self): pass
-    def led(self, left):
+    def led(self, parser, left):
         self.first = left
-        self.second = YP_expression(10)
+        self.second = parser.expression(10)
         return self
-    def exec_token(self):
-        ret = self.first.exec_token() == self.second.exec_token()
+    def exec_token(self, search):
+        ret = self.first.exec_token(search) == self.second.exec_token(search)
         if debug_YP_parser: log_debug('Token == returns {} "{}"'.format(type(ret), text_type(ret)))
         return ret
     def __repr__(self): return "[OP ==]"
@@ -571,12 +548,12 @@ class YP_operator_equal_token:
 class YP_operator_not_equal_token:
     lbp = 50
     def __init__(self): pass
-    def led(self, left):
+    def led(self, parser, left):
         self.first = left
-        self.second = YP_expression(10)
+        self.second = parser.expression(10)
         return self
-    def exec_token(self):
-        ret = self.first.exec_token() != self.second.exec_token()
+    def exec_token(self, search):
+        ret = self.first.exec_token(search) != self.second.exec_token(search)
         if debug_YP_parser: log_debug('Token != returns {} "{}"'.format(type(ret), text_type(ret)))
         return ret
     def __repr__(self): return "[OP !=]"
@@ -584,12 +561,12 @@ class YP_operator_not_equal_token:
 class YP_operator_great_than_token:
     lbp = 50
     def __init__(self): pass
-    def led(self, left):
+    def led(self, parser, left):
         self.first = left
-        self.second = YP_expression(10)
+        self.second = parser.expression(10)
         return self
-    def exec_token(self):
-        ret = self.first.exec_token() > self.second.exec_token()
+    def exec_token(self, search):
+        ret = self.first.exec_token(search) > self.second.exec_token(search)
         if debug_YP_parser: log_debug('Token > returns {} "{}"'.format(type(ret), text_type(ret)))
         return ret
     def __repr__(self): return "[OP >]"
@@ -597,12 +574,12 @@ class YP_operator_great_than_token:
 class YP_operator_less_than_token:
     lbp = 50
     def __init__(self): pass
-    def led(self, left):
+    def led(self, parser, left):
         self.first = left
-        self.second = YP_expression(10)
+        self.second = parser.expression(10)
         return self
-    def exec_token(self):
-        ret = self.first.exec_token() < self.second.exec_token()
+    def exec_token(self, search):
+        ret = self.first.exec_token(search) < self.second.exec_token(search)
         if debug_YP_parser: log_debug('Token < returns {} "{}"'.format(type(ret), text_type(ret)))
         return ret
     def __repr__(self): return "[OP <]"
@@ -610,12 +587,12 @@ class YP_operator_less_than_token:
 class YP_operator_great_or_equal_than_token:
     lbp = 50
     def __init__(self): pass
-    def led(self, left):
+    def led(self, parser, left):
         self.first = left
-        self.second = YP_expression(10)
+        self.second = parser.expression(10)
         return self
-    def exec_token(self):
-        ret = self.first.exec_token() >= self.second.exec_token()
+    def exec_token(self, search):
+        ret = self.first.exec_token(search) >= self.second.exec_token(search)
         if debug_YP_parser: log_debug('Token >= returns {} "{}"'.format(type(ret), text_type(ret)))
         return ret
     def __repr__(self): return "[OP >=]"
@@ -623,12 +600,12 @@ class YP_operator_great_or_equal_than_token:
 class YP_operator_less_or_equal_than_token:
     lbp = 50
     def __init__(self): pass
-    def led(self, left):
+    def led(self, parser, left):
         self.first = left
-        self.second = YP_expression(10)
+        self.second = parser.expression(10)
         return self
-    def exec_token(self):
-        ret = self.first.exec_token() <= self.second.exec_token()
+    def exec_token(self, search):
+        ret = self.first.exec_token(search) <= self.second.exec_token(search)
         if debug_YP_parser: log_debug('Token <= returns {} "{}"'.format(type(ret), text_type(ret)))
         return ret
     def __repr__(self): return "[OP <=]"
@@ -664,427 +641,238 @@ def YP_tokenize(program):
 # -------------------------------------------------------------------------------------------------
 # Year Parser (YP) inspired by http://effbot.org/zone/simple-top-down-parsing.htm
 # -------------------------------------------------------------------------------------------------
-def YP_expression(rbp = 0):
-    global YP_token
-
-    t = YP_token
-    YP_token = YP_next()
-    left = t.nud()
-    while rbp < YP_token.lbp:
-        t = YP_token
-        YP_token = YP_next()
-        left = t.led(left)
-    return left
+# See SP_parse() comments.
+def YP_parse(program):
+    if debug_YP_parse_exec:
+        log_debug('YP_parse() Program "{}"'.format(program))
+    parse_tree = Parser_Engine(YP_tokenize(program)).parse()
+    if debug_YP_parse_exec:
+        log_debug('YP_parse() Parse tree root token {}'.format(parse_tree))
 
-def YP_parse_exec(program, year_str):
-    global YP_token, YP_next, YP_year
+    return parse_tree
 
-    # --- Transform year_str to an integer. year_str may be ill formed ---
-    if re.findall(r'^[0-9]{4}$', year_str):
-        year = int(year_str)
-    elif re.findall(r'^[0-9]{4}\?$', year_str):
-        year = int(year_str[0:4])
-    else:
-        year = 0
+# Transform year_str to an integer. year_str may be ill formed.
+YP_year_pat = re.compile(r'^[0-9]{4}\??$')
 
+def YP_exec(parse_tree, year_str):
+    year = int(year_str[0:4]) if YP_year_pat.match(year_str) else 0
     if debug_YP_parse_exec:
-        log_debug('YP_parse_exec() Initialising program execution')
-        log_debug('YP_parse_exec() year     "{}"'.format(year))
-        log_debug('YP_parse_exec() Program  "{}"'.format(program))
-    YP_year = year
-    if ADDON_RUNNING_PYTHON_2:
-        YP_next = YP_tokenize(program).next
-    elif ADDON_RUNNING_PYTHON_3:
-        YP_next = YP_tokenize(program).__next__
-    else:
-        raise TypeError('Undefined Python runtime version.')
-    YP_token = YP_next()
-
-    # Old function parse_exec().
-    rbp = 0
-    t = YP_token
-    YP_token = YP_next()
-    left = t.nud()
-    while rbp < YP_token.lbp:
-        t = YP_token
-        YP_token = YP_next()
-        left = t.led(left)
-    if debug_YP_parse_exec:
-        log_debug('YP_parse_exec() Init exec program in token {}'.format(left))
+        log_debug('YP_exec() year "{}"'.format(year))
 
-    return left.exec_token()
+    return parse_tree.exec_token(year)
+
+def YP_parse_exec(program, year_str):
+    return YP_exec(YP_parse(program), year_str)
 
 # -------------------------------------------------------------------------------------------------
 # MAME machine filters
 # -------------------------------------------------------------------------------------------------
+# Custom filters are evaluated with set operations on an inverted index of the filter database
+# returned by filter_get_filter_DB(). The inverted index is built once and used by all filters.
 #
-# Default filter removes device machines.
+# inv_idx = {
+#     'default' : set(), Non-device machines.
+#     'options' : {
+#         'NoClones' : set(), Machines removed by the option.
+#         ...
+#     },
+#     'driver'           : { ('driver',) : set(), ... },
+#     'manufacturer'     : { 'manufacturer' : set(), ... },
+#     'genre'            : { ('genre',) : set(), ... },
+#     'controls'         : { ('control', 'control', ...) : set(), ... },
+#     'pluggabledevices' : { ('device', 'device', ...) : set(), ... },
+#     'year'             : { 'year' : set(), ... },
+# }
 #
-def filter_mame_Default(mame_xml_dic):
-    log_debug('filter_mame_Default() Starting ...')
-    initial_num_games = len(mame_xml_dic)
-    filtered_out_games = 0
-    machines_filtered_dic = {}
-    for m_name in sorted(mame_xml_dic):
-        if mame_xml_dic[m_name]['isDevice']:
-            filtered_out_games += 1
+# Filter expressions depend only on the value of a field, so each expression is executed only
+# once for every different value of the field and not once per machine. The keys of the
+# LSP indices are tuples with the LSP search list.
+#
+# This must match OPTIONS_KEYWORK_LIST. 'NoCoin' and 'NoCoinLess' are special.
+OPTIONS_FILTER_FIELD_DIC = {
+    'NoClones'         : 'isClone',
+    'NoROMs'           : 'hasROMs',
+    'NoCHDs'           : 'hasCHDs',
+    'NoSamples'        : 'hasSamples',
+    'NoMature'         : 'isMature',
+    'NoBIOS'           : 'isBIOS',
+    'NoMechanical'     : 'isMechanical',
+    'NoImperfect'      : 'isImperfect',
+    'NoNonworking'     : 'isNonWorking',
+    'NoVertical'       : 'isVertical',
+    'NoHorizontal'     : 'isHorizontal',
+    'NoMissingROMs'    : 'missingROMs',
+    'NoMissingCHDs'    : 'missingCHDs',
+    'NoMissingSamples' : 'missingSamples',
+}
+
+def _filter_index_add(index_dic, key, m_name):
+    if key in index_dic:
+        index_dic[key].add(m_name)
+    else:
+        index_dic[key] = set([m_name])
+
+def filter_build_inverted_index(main_filter_dic):
+    log_debug('filter_build_inverted_index() Starting ...')
+    inv_idx = {
+        'default' : set(),
+        'options' : {},
+        'driver' : {},
+        'manufacturer' : {},
+        'genre' : {},
+        'controls' : {},
+        'pluggabledevices' : {},
+        'year' : {},
+    }
+    for option_keyword in OPTIONS_KEYWORK_LIST: inv_idx['options'][option_keyword] = set()
+    for m_name, mdict in main_filter_dic.items():
+        # Default filter removes device machines.
+        if mdict['isDevice']: continue
+        inv_idx['default'].add(m_name)
+        if mdict['coins'] > 0:
+            inv_idx['options']['NoCoin'].add(m_name)
         else:
-            machines_filtered_dic[m_name] = mame_xml_dic[m_name]
-    log_debug('filter_mame_Default() Initial {} | '.format(initial_num_games) + \
-              'Removed {} | '.format(filtered_out_games) + \
-              'Remaining {}'.format(len(machines_filtered_dic)))
-
-    return machines_filtered_dic
-
-def filter_mame_Options_tag(mame_xml_dic, f_definition):
-    # log_debug('filter_mame_Options_tag() Starting ...')
+            inv_idx['options']['NoCoinLess'].add(m_name)
+        for option_keyword, field in OPTIONS_FILTER_FIELD_DIC.items():
+            if mdict[field]: inv_idx['options'][option_keyword].add(m_name)
+        _filter_index_add(inv_idx['driver'], (mdict['driver'],), m_name)
+        _filter_index_add(inv_idx['manufacturer'], mdict['manufacturer'], m_name)
+        _filter_index_add(inv_idx['genre'], (mdict['genre'],), m_name)
+        _filter_index_add(inv_idx['controls'], tuple(mdict['control_list']), m_name)
+        _filter_index_add(inv_idx['pluggabledevices'], tuple(mdict['pluggable_device_list']), m_name)
+        _filter_index_add(inv_idx['year'], mdict['year'], m_name)
+    log_debug('filter_build_inverted_index() {} machines | {} drivers | {} manufacturers'.format(
+        len(inv_idx['default']), len(inv_idx['driver']), len(inv_idx['manufacturer'])))
+    log_debug('filter_build_inverted_index() {} genres | {} control lists | {} device lists | {} years'.format(
+        len(inv_idx['genre']), len(inv_idx['controls']),
+        len(inv_idx['pluggabledevices']), len(inv_idx['year'])))
+
+    return inv_idx
+
+def filter_mame_Options_tag(machine_set, f_definition, inv_idx):
     options_list = f_definition['options']
-
     if not options_list:
         log_debug('filter_mame_Options_tag() Option list is empty.')
-        return mame_xml_dic
+        return machine_set
     log_debug('Option list "{}"'.format(options_list))
-
-    # --- Compute bool variables ---
-    # This must match OPTIONS_KEYWORK_LIST
-    NoClones_bool     = True if 'NoClones' in options_list else False
-    NoCoin_bool       = True if 'NoCoin' in options_list else False
-    NoCoinLess_bool   = True if 'NoCoinLess' in options_list else False
-    NoROMs_bool       = True if 'NoROMs' in options_list else False
-    NoCHDs_bool       = True if 'NoCHDs' in options_list else False
-    NoSamples_bool    = True if 'NoSamples' in options_list else False
-    NoMature_bool     = True if 'NoMature' in options_list else False
-    NoBIOS_bool       = True if 'NoBIOS' in options_list else False
-    NoMechanical_bool = True if 'NoMechanical' in options_list else False
-    NoImperfect_bool  = True if 'NoImperfect' in options_list else False
-    NoNonWorking_bool = True if 'NoNonworking' in options_list else False
-    NoVertical_bool   = True if 'NoVertical' in options_list else False
-    NoHorizontal_bool = True if 'NoHorizontal' in options_list else False
-    # ROM scanner boolean filters.
-    NoMissingROMs_bool    = True if 'NoMissingROMs' in options_list else False
-    NoMissingCHDs_bool    = True if 'NoMissingCHDs' in options_list else False
-    NoMissingSamples_bool = True if 'NoMissingSamples' in options_list else False
-
-    log_debug('NoClones_bool         {}'.format(NoClones_bool))
-    log_debug('NoCoin_bool           {}'.format(NoCoin_bool))
-    log_debug('NoCoinLess_bool       {}'.format(NoCoinLess_bool))
-    log_debug('NoROMs_bool           {}'.format(NoROMs_bool))
-    log_debug('NoCHDs_bool           {}'.format(NoCHDs_bool))
-    log_debug('NoSamples_bool        {}'.format(NoSamples_bool))
-    log_debug('NoMature_bool         {}'.format(NoMature_bool))
-    log_debug('NoBIOS_bool           {}'.format(NoBIOS_bool))
-    log_debug('NoMechanical_bool     {}'.format(NoMechanical_bool))
-    log_debug('NoImperfect_bool      {}'.format(NoImperfect_bool))
-    log_debug('NoNonWorking_bool     {}'.format(NoNonWorking_bool))
-    log_debug('NoVertical_bool       {}'.format(NoVertical_bool))
-    log_debug('NoHorizontal_bool     {}'.format(NoHorizontal_bool))
-    log_debug('NoMissingROMs_bool    {}'.format(NoMissingROMs_bool))
-    log_debug('NoMissingCHDs_bool    {}'.format(NoMissingCHDs_bool))
-    log_debug('NoMissingSamples_bool {}'.format(NoMissingSamples_bool))
-
-    initial_num_games = len(mame_xml_dic)
-    filtered_out_games = 0
-    machines_filtered_dic = {}
-    for m_name in sorted(mame_xml_dic):
-        # Remove Clone machines
-        if NoClones_bool and mame_xml_dic[m_name]['isClone']:
-            filtered_out_games += 1
-            continue
-        # Remove Coin machines
-        if NoCoin_bool and mame_xml_dic[m_name]['coins'] > 0:
-            filtered_out_games += 1
-            continue
-        # Remove CoinLess machines
-        if NoCoinLess_bool and mame_xml_dic[m_name]['coins'] == 0:
-            filtered_out_games += 1
-            continue
-        # Remove ROM machines
-        if NoROMs_bool and mame_xml_dic[m_name]['hasROMs']:
-            filtered_out_games += 1
-            continue
-        # Remove CHD machines
-        if NoCHDs_bool and mame_xml_dic[m_name]['hasCHDs']:
-            filtered_out_games += 1
-            continue
-        # Remove Samples machines
-        if NoSamples_bool and mame_xml_dic[m_name]['hasSamples']:
-            filtered_out_games += 1
-            continue
-        # Remove Mature machines
-        if NoMature_bool and mame_xml_dic[m_name]['isMature']:
-            filtered_out_games += 1
-            continue
-        # Remove BIOS machines
-        if NoBIOS_bool and mame_xml_dic[m_name]['isBIOS']:
-            filtered_out_games += 1
-            continue
-        # Remove Mechanical machines
-        if NoMechanical_bool and mame_xml_dic[m_name]['isMechanical']:
-            filtered_out_games += 1
-            continue
-        # Remove Imperfect machines
-        if NoImperfect_bool and mame_xml_dic[m_name]['isImperfect']:
-            filtered_out_games += 1
-            continue
-        # Remove NonWorking machines
-        if NoNonWorking_bool and mame_xml_dic[m_name]['isNonWorking']:
-            filtered_out_games += 1
-            continue
-        # Remove Vertical machines
-        if NoVertical_bool and mame_xml_dic[m_name]['isVertical']:
-            filtered_out_games += 1
-            continue
-        # Remove Horizontal machines
-        if NoHorizontal_bool and mame_xml_dic[m_name]['isHorizontal']:
-            filtered_out_games += 1
-            continue
-        # Remove machines with Missing ROMs
-        if NoMissingROMs_bool and mame_xml_dic[m_name]['missingROMs']:
-            filtered_out_games += 1
-            continue
-        # Remove machines with Missing CHDs
-        if NoMissingCHDs_bool and mame_xml_dic[m_name]['missingCHDs']:
-            filtered_out_games += 1
-            continue
-        # Remove machines with Missing Samples
-        if NoMissingSamples_bool and mame_xml_dic[m_name]['missingSamples']:
-            filtered_out_games += 1
-            continue
-        # If machine was not removed then add it
-        machines_filtered_dic[m_name] = mame_xml_dic[m_name]
-    log_debug(
-        'filter_mame_Options_tag() Initial {} | '.format(initial_num_games) + \
-        'Removed {} | '.format(filtered_out_games) + \
-        'Remaining {}'.format(len(machines_filtered_dic)))
-
-    return machines_filtered_dic
-
-def filter_mame_Driver_tag(mame_xml_dic, f_definition):
-    # log_debug('filter_mame_Driver_tag() Starting ...')
-    filter_expression = f_definition['driver']
-
+    initial_num_games = len(machine_set)
+    for option_keyword in options_list:
+        # Unknown keywords are reported in filter_custom_filters_load_XML() and ignored here.
+        if option_keyword not in inv_idx['options']: continue
+        machine_set = machine_set - inv_idx['options'][option_keyword]
+    log_debug('filter_mame_Options_tag() Initial {} | '.format(initial_num_games) + \
+        'Removed {} | '.format(initial_num_games - len(machine_set)) + \
+        'Remaining {}'.format(len(machine_set)))
+
+    return machine_set
+
+# tag_name is the key of f_definition and inv_idx.
+# parser_name is 'SP', 'LSP' or 'YP'.
+def filter_mame_Expression_tag(machine_set, f_definition, inv_idx, tag_name, parser_name):
+    filter_expression = f_definition[tag_name]
     if not filter_expression:
-        log_debug('filter_mame_Driver_tag() User wants all drivers')
-        return mame_xml_dic
+        log_debug('filter_mame_Expression_tag() User wants all {}'.format(tag_name))
+        return machine_set
     log_debug('Expression "{}"'.format(filter_expression))
 
-    initial_num_games = len(mame_xml_dic)
-    filtered_out_games = 0
-    machines_filtered_dic = {}
-    for m_name in sorted(mame_xml_dic):
-        search_list = [ mame_xml_dic[m_name]['driver'] ]
-        bool_result = LSP_parse_exec(filter_expression, search_list)
-        if not bool_result:
-            filtered_out_games += 1
-        else:
-            machines_filtered_dic[m_name] = mame_xml_dic[m_name]
-    log_debug('filter_mame_Driver_tag() Initial {} | '.format(initial_num_games) + \
-              'Removed {} | '.format(filtered_out_games) + \
-              'Remaining {}'.format(len(machines_filtered_dic)))
-
-    return machines_filtered_dic
-
-def filter_mame_Manufacturer_tag(mame_xml_dic, f_definition):
-    # log_debug('filter_mame_Manufacturer_tag() Starting ...')
-    filter_expression = f_definition['manufacturer']
-
-    if not filter_expression:
-        log_debug('filter_mame_Manufacturer_tag() User wants all manufacturers')
-        return mame_xml_dic
-    log_debug('Expression "{}"'.format(filter_expression))
-
-    initial_num_games = len(mame_xml_dic)
-    filtered_out_games = 0
-    machines_filtered_dic = {}
-    for m_name in sorted(mame_xml_dic):
-        bool_result = SP_parse_exec(filter_expression, mame_xml_dic[m_name]['manufacturer'])
-        if not bool_result:
-            filtered_out_games += 1
-        else:
-            machines_filtered_dic[m_name] = mame_xml_dic[m_name]
-    log_debug('filter_mame_Manufacturer_tag() Initial {} | '.format(initial_num_games) + \
-              'Removed {} | '.format(filtered_out_games) + \
-              'Remaining {}'.format(len(machines_filtered_dic)))
-
-    return machines_filtered_dic
-
-def filter_mame_Genre_tag(mame_xml_dic, f_definition):
-    # log_debug('filter_mame_Genre_tag() Starting ...')
-    filter_expression = f_definition['genre']
-
-    if not filter_expression:
-        log_debug('filter_mame_Genre_tag() User wants all genres')
-        return mame_xml_dic
-    log_debug('Expression "{}"'.format(filter_expression))
-
-    initial_num_games = len(mame_xml_dic)
-    filtered_out_games = 0
-    machines_filtered_dic = {}
-    for m_name in sorted(mame_xml_dic):
-        search_list = [ mame_xml_dic[m_name]['genre'] ]
-        bool_result = LSP_parse_exec(filter_expression, search_list)
-        if not bool_result:
-            filtered_out_games += 1
-        else:
-            machines_filtered_dic[m_name] = mame_xml_dic[m_name]
-    log_debug('filter_mame_Genre_tag() Initial {} | '.format(initial_num_games) + \
-              'Removed {} | '.format(filtered_out_games) + \
-              'Remaining {}'.format(len(machines_filtered_dic)))
-
-    return machines_filtered_dic
-
-def filter_mame_Controls_tag(mame_xml_dic, f_definition):
-    # log_debug('filter_mame_Controls_tag() Starting ...')
-    filter_expression = f_definition['controls']
-
-    if not filter_expression:
-        log_debug('filter_mame_Controls_tag() User wants all genres')
-        return mame_xml_dic
-    log_debug('Expression "{}"'.format(filter_expression))
-
-    initial_num_games = len(mame_xml_dic)
-    filtered_out_games = 0
-    machines_filtered_dic = {}
-    for m_name in sorted(mame_xml_dic):
-        bool_result = LSP_parse_exec(filter_expression, mame_xml_dic[m_name]['control_list'])
-        if not bool_result:
-            filtered_out_games += 1
-        else:
-            machines_filtered_dic[m_name] = mame_xml_dic[m_name]
-    log_debug('filter_mame_Controls_tag() Initial {} | '.format(initial_num_games) + \
-              'Removed {} | '.format(filtered_out_games) + \
-              'Remaining {}'.format(len(machines_filtered_dic)))
-
-    return machines_filtered_dic
-
-def filter_mame_PluggableDevices_tag(mame_xml_dic, f_definition):
-    # log_debug('filter_mame_PluggableDevices_tag() Starting ...')
-    filter_expression = f_definition['pluggabledevices']
-
-    if not filter_expression:
-        log_debug('filter_mame_PluggableDevices_tag() User wants all genres')
-        return mame_xml_dic
-    log_debug('Expression "{}"'.format(filter_expression))
-
-    initial_num_games = len(mame_xml_dic)
-    filtered_out_games = 0
-    machines_filtered_dic = {}
-    for m_name in sorted(mame_xml_dic):
-        # --- Update search list variable and call parser to evaluate expression ---
-        bool_result = LSP_parse_exec(filter_expression, mame_xml_dic[m_name]['pluggable_device_list'])
-        if not bool_result:
-            filtered_out_games += 1
-        else:
-            machines_filtered_dic[m_name] = mame_xml_dic[m_name]
-    log_debug(
-        'filter_mame_PluggableDevices_tag() Initial {} | '.format(initial_num_games) + \
-        'Removed {} | '.format(filtered_out_games) + \
-        'Remaining {}'.format(len(machines_filtered_dic)))
-
-    return machines_filtered_dic
-
-def filter_mame_Year_tag(mame_xml_dic, f_definition):
-    # log_debug('filter_mame_Year_tag() Starting ...')
-    filter_expression = f_definition['year']
-
-    if not filter_expression:
-        log_debug('filter_mame_Year_tag() User wants all genres')
-        return mame_xml_dic
-    log_debug('Expression "{}"'.format(filter_expression))
-
-    initial_num_games = len(mame_xml_dic)
-    filtered_out_games = 0
-    machines_filtered_dic = {}
-    for m_name in sorted(mame_xml_dic):
-        # --- Update search int variable and call parser to evaluate expression ---
-        bool_result = YP_parse_exec(filter_expression, mame_xml_dic[m_name]['year'])
-        if not bool_result:
-            filtered_out_games += 1
-        else:
-            machines_filtered_dic[m_name] = mame_xml_dic[m_name]
-    log_debug('filter_mame_Year_tag() Initial {} | '.format(initial_num_games) + \
-              'Removed {} | '.format(filtered_out_games) + \
-              'Remaining {}'.format(len(machines_filtered_dic)))
+    # Execute the expression once for every value of the field.
+    matched_set = set()
+    if parser_name == 'SP':
+        parse_tree = SP_parse(filter_expression)
+        for key, key_set in inv_idx[tag_name].items():
+            if SP_exec(parse_tree, key): matched_set.update(key_set)
+    elif parser_name == 'LSP':
+        parse_tree = LSP_parse(filter_expression)
+        for key, key_set in inv_idx[tag_name].items():
+            if LSP_exec(parse_tree, list(key)): matched_set.update(key_set)
+    elif parser_name == 'YP':
+        parse_tree = YP_parse(filter_expression)
+        for key, key_set in inv_idx[tag_name].items():
+            if YP_exec(parse_tree, key): matched_set.update(key_set)
+    else:
+        raise TypeError('Unknown parser_name "{}"'.format(parser_name))
+    initial_num_games = len(machine_set)
+    machine_set = machine_set & matched_set
+    log_debug('filter_mame_Expression_tag() <{}> Initial {} | '.format(tag_name, initial_num_games) + \
+        'Removed {} | '.format(initial_num_games - len(machine_set)) + \
+        'Remaining {}'.format(len(machine_set)))
 
-    return machines_filtered_dic
+    return machine_set
 
-def filter_mame_Include_tag(mame_xml_dic, f_definition, machines_dic):
-    # log_debug('filter_mame_Include_tag() Starting ...')
+def filter_mame_Include_tag(machine_set, f_definition, machines_dic):
     log_debug('filter_mame_Include_tag() Include machines {}'.format(text_type(f_definition['include'])))
-    added_machines = 0
-    machines_filtered_dic = mame_xml_dic.copy()
-    # If no machines to include then skip processing
     if not f_definition['include']:
         log_debug('filter_mame_Include_tag() No machines to include. Exiting.')
-        return machines_filtered_dic
-    # First traverse all MAME machines, then traverse list of strings to include.
-    for m_name in sorted(machines_dic):
-        for f_name in f_definition['include']:
-            if f_name == m_name:
-                log_debug('filter_mame_Include_tag() Matched machine {}'.format(f_name))
-                if f_name in machines_filtered_dic:
-                    log_debug('filter_mame_Include_tag() Machine {} already in filtered list'.format(f_name))
-                else:
-                    log_debug('filter_mame_Include_tag() Adding machine {}'.format(f_name))
-                    machines_filtered_dic[m_name] = machines_dic[m_name]
-                    added_machines += 1
-    log_debug('filter_mame_Include_tag() Initial {} | '.format(len(mame_xml_dic)) + \
-              'Added {} | '.format(added_machines) + \
-              'Remaining {}'.format(len(machines_filtered_dic)))
+        return machine_set
+    initial_num_games = len(machine_set)
+    machine_set = machine_set.copy()
+    for f_name in f_definition['include']:
+        if f_name not in machines_dic: continue
+        if f_name in machine_set:
+            log_debug('filter_mame_Include_tag() Machine {} already in filtered list'.format(f_name))
+        else:
+            log_debug('filter_mame_Include_tag() Adding machine {}'.format(f_name))
+            machine_set.add(f_name)
+    log_debug('filter_mame_Include_tag() Initial {} | '.format(initial_num_games) + \
+        'Added {} | '.format(len(machine_set) - initial_num_games) + \
+        'Remaining {}'.format(len(machine_set)))
 
-    return machines_filtered_dic
+    return machine_set
 
-def filter_mame_Exclude_tag(mame_xml_dic, f_definition):
-    # log_debug('filter_mame_Exclude_tag() Starting ...')
+def filter_mame_Exclude_tag(machine_set, f_definition):
     log_debug('filter_mame_Exclude_tag() Exclude machines {}'.format(text_type(f_definition['exclude'])))
-    initial_num_games = len(mame_xml_dic)
-    filtered_out_games = 0
-    machines_filtered_dic = mame_xml_dic.copy()
-    # If no machines to exclude then skip processing
     if not f_definition['exclude']:
         log_debug('filter_mame_Exclude_tag() No machines to exclude. Exiting.')
-        return machines_filtered_dic
-    # First traverse current set of machines, then traverse list of strings to include.
-    for m_name in sorted(mame_xml_dic):
-        for f_name in f_definition['exclude']:
-            if f_name == m_name:
-                log_debug('filter_mame_Exclude_tag() Matched machine {}'.format(f_name))
-                log_debug('filter_mame_Exclude_tag() Deleting machine {}'.format(f_name))
-                del machines_filtered_dic[f_name]
-                filtered_out_games += 1
+        return machine_set
+    initial_num_games = len(machine_set)
+    machine_set = machine_set - set(f_definition['exclude'])
     log_debug('filter_mame_Exclude_tag() Initial {} | '.format(initial_num_games) + \
-              'Removed {} | '.format(filtered_out_games) + \
-              'Remaining {}'.format(len(machines_filtered_dic)))
+        'Removed {} | '.format(initial_num_games - len(machine_set)) + \
+        'Remaining {}'.format(len(machine_set)))
 
-    return machines_filtered_dic
+    return machine_set
 
-def filter_mame_Change_tag(mame_xml_dic, f_definition, machines_dic):
-    # log_debug('filter_mame_Change_tag() Starting ...')
+def filter_mame_Change_tag(machine_set, f_definition, machines_dic):
     log_debug('filter_mame_Change_tag() Change machines {}'.format(text_type(f_definition['change'])))
-    initial_num_games = len(mame_xml_dic)
-    changed_machines = 0
-    machines_filtered_dic = mame_xml_dic.copy()
-    # If no machines to change then skip processing
     if not f_definition['change']:
         log_debug('filter_mame_Change_tag() No machines to swap. Exiting.')
-        return machines_filtered_dic
-    # First traverse current set of machines, then traverse list of strings to include.
-    for m_name in sorted(mame_xml_dic):
+        return machine_set
+    changed_machines = 0
+    new_machine_set = machine_set.copy()
+    # Changes are applied in machine name order.
+    change_set = set([change_tuple[0] for change_tuple in f_definition['change']])
+    for m_name in sorted(machine_set & change_set):
         for (f_name, new_name) in f_definition['change']:
-            if f_name == m_name:
-                log_debug('filter_mame_Change_tag() Matched machine {}'.format(f_name))
-                if new_name in machines_dic:
-                    log_debug('filter_mame_Change_tag() Changing machine {} with {}'.format(f_name, new_name))
-                    del machines_filtered_dic[f_name]
-                    machines_filtered_dic[new_name] = machines_dic[new_name]
-                    changed_machines += 1
-                else:
-                    log_warning('filter_mame_Change_tag() New machine {} not found on MAME machines.'.format(new_name))
-    log_debug('filter_mame_Change_tag() Initial {} | '.format(initial_num_games) + \
-              'Changed {} | '.format(changed_machines) + \
-              'Remaining {}'.format(len(machines_filtered_dic)))
-
-    return machines_filtered_dic
+            if f_name != m_name: continue
+            log_debug('filter_mame_Change_tag() Matched machine {}'.format(f_name))
+            if new_name in machines_dic:
+                log_debug('filter_mame_Change_tag() Changing machine {} with {}'.format(f_name, new_name))
+                new_machine_set.discard(f_name)
+                new_machine_set.add(new_name)
+                changed_machines += 1
+            else:
+                log_warning('filter_mame_Change_tag() New machine {} not found on MAME machines.'.format(new_name))
+    log_debug('filter_mame_Change_tag() Initial {} | '.format(len(machine_set)) + \
+        'Changed {} | '.format(changed_machines) + \
+        'Remaining {}'.format(len(new_machine_set)))
+
+    return new_machine_set
+
+# Returns the set of machine names of a custom filter.
+def filter_mame_eval_filter(f_definition, inv_idx, machines_dic):
+    machine_set = inv_idx['default']
+    machine_set = filter_mame_Options_tag(machine_set, f_definition, inv_idx)
+    machine_set = filter_mame_Expression_tag(machine_set, f_definition, inv_idx, 'driver', 'LSP')
+    machine_set = filter_mame_Expression_tag(machine_set, f_definition, inv_idx, 'manufacturer', 'SP')
+    machine_set = filter_mame_Expression_tag(machine_set, f_definition, inv_idx, 'genre', 'LSP')
+    machine_set = filter_mame_Expression_tag(machine_set, f_definition, inv_idx, 'controls', 'LSP')
+    machine_set = filter_mame_Expression_tag(machine_set, f_definition, inv_idx, 'pluggabledevices', 'LSP')
+    machine_set = filter_mame_Expression_tag(machine_set, f_definition, inv_idx, 'year', 'YP')
+    machine_set = filter_mame_Include_tag(machine_set, f_definition, machines_dic)
+    machine_set = filter_mame_Exclude_tag(machine_set, f_definition)
+    machine_set = filter_mame_Change_tag(machine_set, f_definition, machines_dic)
+
+    return machine_set
 
 # -------------------------------------------------------------------------------------------------
 # Build MAME custom filters
@@ -1486,6 +1274,7 @@ def filter_custom_filters_load_XML(cfg, db_dic_in, main_filter_dic, sets_dic):
 # filter_index_dic = {
 #     'name' : {
 #         'display_name' : Unicode,
+#         'fingerprint' : Unicode,
 #         'num_machines' : int,
 #         'num_parents' : int,
 #         'order' : int,
@@ -1496,30 +1285,71 @@ def filter_custom_filters_load_XML(cfg, db_dic_in, main_filter_dic, sets_dic):
 # AML_DATA_DIR/filters/'rom_DB_noext'_render.json -> machine_render = {}
 # AML_DATA_DIR/filters/'rom_DB_noext'_assets.json -> asset_dic = {}
 #
+# The output of a filter depends on the filter definition and on the MAME databases.
+# If any of these control_dic timestamps change all the filters are rebuilt. Timestamps missing
+# in control_dic files of old versions of AML are 0.
+# Building the Fanart or 3D Box of a single machine changes the asset DB but not the
+# timestamps, so the modification time and size of the render and asset DBs are also used.
+FILTER_FINGERPRINT_TIMESTAMP_LIST = [
+    't_MAME_DB_build',
+    't_MAME_ROMs_scan',
+    't_MAME_assets_scan',
+    't_MAME_plots_build',
+    't_MAME_fanart_build',
+    't_MAME_3dbox_build',
+]
+
+# Fingerprint of a filter. The filter definition is the parsed one, after resolving
+# the DEFINE tags, so changes in a DEFINE are detected in all the filters that use it.
+def filter_get_fingerprint(f_definition, control_dic, DB_stat_list):
+    fingerprint_dic = {
+        'definition' : f_definition,
+        'timestamps' : [control_dic.get(t_key, 0) for t_key in FILTER_FINGERPRINT_TIMESTAMP_LIST],
+        'databases' : DB_stat_list,
+    }
+    fingerprint_str = json.dumps(fingerprint_dic, sort_keys = True)
+
+    return hashlib.md5(fingerprint_str.encode('utf-8')).hexdigest()
+
+# Returns a list with the modification time and size of the render and asset DBs.
+# The big databases can be stored in the JSON file or in the binary file.
+def filter_get_DB_stat_list(cfg):
+    DB_stat_list = []
+    for json_filename in [cfg.RENDER_DB_PATH.getPath(), cfg.ASSET_DB_PATH.getPath()]:
+        DB_stat = [0, 0]
+        for filename in [json_filename, utils_get_binary_DB_filename(json_filename)]:
+            if not os.path.isfile(filename): continue
+            f_stat = os.stat(filename)
+            DB_stat = [f_stat.st_mtime, f_stat.st_size]
+            break
+        DB_stat_list.append(DB_stat)
+
+    return DB_stat_list
+
+# Returns True if the filter output files of a previous build can be reused.
+def filter_is_filter_unchanged(cfg, old_filter_idx_dic, fingerprint):
+    if not old_filter_idx_dic: return False
+    if 'fingerprint' not in old_filter_idx_dic: return False
+    if old_filter_idx_dic['fingerprint'] != fingerprint: return False
+    rom_DB_noext = old_filter_idx_dic['rom_DB_noext']
+    if not cfg.FILTERS_DB_DIR.pjoin(rom_DB_noext + '_render.json').exists(): return False
+    if not cfg.FILTERS_DB_DIR.pjoin(rom_DB_noext + '_assets.json').exists(): return False
+
+    return True
+
+# Only filters whose definition changed, or all the filters if the MAME databases changed,
+# are computed again. The JSON files of filters no longer defined in the XML are deleted.
 def filter_build_custom_filters(cfg, db_dic_in, filter_list, main_filter_dic):
     control_dic = db_dic_in['control_dic']
     machines_dic = db_dic_in['machines']
     renderdb_dic = db_dic_in['renderdb']
     assetdb_dic = db_dic_in['assetdb']
 
-    # --- Clean 'filters' directory JSON files ---
-    log_info('filter_build_custom_filters() Cleaning dir "{}"'.format(cfg.FILTERS_DB_DIR.getPath()))
-    pDialog = KodiProgressDialog()
-    pDialog.startProgress('Listing filter JSON files...')
-    file_list = os.listdir(cfg.FILTERS_DB_DIR.getPath())
-    num_files = len(file_list)
-    if num_files > 1:
-        log_info('Found {} files'.format(num_files))
-        processed_items = 0
-        pDialog.resetProgress('Cleaning filter JSON files...', num_files)
-        for file in file_list:
-            pDialog.updateProgress(processed_items)
-            if file.endswith('.json'):
-                full_path = os.path.join(cfg.FILTERS_DB_DIR.getPath(), file)
-                # log_debug('UNLINK "{}"'.format(full_path))
-                os.unlink(full_path)
-            processed_items += 1
-    pDialog.endProgress()
+    # --- Load the filter index of the previous build ---
+    if cfg.FILTERS_INDEX_PATH.exists():
+        old_Filters_index_dic = utils_load_JSON_file(cfg.FILTERS_INDEX_PATH.getPath())
+    else:
+        old_Filters_index_dic = {}
 
     # --- Report header ---
     r_full = [
@@ -1529,9 +1359,15 @@ def filter_build_custom_filters(cfg, db_dic_in, filter_list, main_filter_dic):
     ]
 
     # --- Traverse list of filters, build filter index and compute filter list ---
+    # The inverted index used to evaluate the filters is only built if a filter
+    # must be computed.
+    inv_idx = None
     Filters_index_dic = {}
     processed_items = 0
+    num_skipped = 0
     diag_t = 'Building custom MAME filters...'
+    DB_stat_list = filter_get_DB_stat_list(cfg)
+    pDialog = KodiProgressDialog()
     pDialog.startProgress(diag_t, len(filter_list))
     for f_definition in filter_list:
         # --- Initialise ---
@@ -1539,29 +1375,43 @@ def filter_build_custom_filters(cfg, db_dic_in, filter_list, main_filter_dic):
         log_debug('filter_build_custom_filters() Processing filter "{}"'.format(f_name))
         # log_debug('f_definition = {}'.format(text_type(f_definition)))
         pDialog.updateProgressInc('{}\nFilter "{}"'.format(diag_t, f_name))
+        rom_DB_noext = hashlib.md5(f_name.encode('utf-8')).hexdigest()
+        fingerprint = filter_get_fingerprint(f_definition, control_dic, DB_stat_list)
+
+        # --- Skip unchanged filters ---
+        old_filter_idx_dic = old_Filters_index_dic.get(f_name, None)
+        if filter_is_filter_unchanged(cfg, old_filter_idx_dic, fingerprint):
+            log_debug('filter_build_custom_filters() Filter unchanged. Skipping.')
+            this_filter_idx_dic = {
+                'display_name' : f_definition['name'],
+                'fingerprint'  : fingerprint,
+                'num_machines' : old_filter_idx_dic['num_machines'],
+                'order'        : processed_items,
+                'plot'         : f_definition['plot'],
+                'rom_DB_noext' : rom_DB_noext
+            }
+            Filters_index_dic[f_name] = this_filter_idx_dic
+            processed_items += 1
+            num_skipped += 1
+            r_full.append('Filter "{}"'.format(f_name))
+            r_full.append('{} machines (unchanged)'.format(old_filter_idx_dic['num_machines']))
+            r_full.append('')
+            continue
 
         # --- Do filtering ---
-        filtered_machine_dic = filter_mame_Default(main_filter_dic)
-        filtered_machine_dic = filter_mame_Options_tag(filtered_machine_dic, f_definition)
-        filtered_machine_dic = filter_mame_Driver_tag(filtered_machine_dic, f_definition)
-        filtered_machine_dic = filter_mame_Manufacturer_tag(filtered_machine_dic, f_definition)
-        filtered_machine_dic = filter_mame_Genre_tag(filtered_machine_dic, f_definition)
-        filtered_machine_dic = filter_mame_Controls_tag(filtered_machine_dic, f_definition)
-        filtered_machine_dic = filter_mame_PluggableDevices_tag(filtered_machine_dic, f_definition)
-        filtered_machine_dic = filter_mame_Year_tag(filtered_machine_dic, f_definition)
-        filtered_machine_dic = filter_mame_Include_tag(filtered_machine_dic, f_definition, machines_dic)
-        filtered_machine_dic = filter_mame_Exclude_tag(filtered_machine_dic, f_definition)
-        filtered_machine_dic = filter_mame_Change_tag(filtered_machine_dic, f_definition, machines_dic)
+        if inv_idx is None:
+            inv_idx = filter_build_inverted_index(main_filter_dic)
+        filtered_machine_set = filter_mame_eval_filter(f_definition, inv_idx, machines_dic)
 
         # --- Make indexed catalog ---
         filtered_render_dic = {}
         filtered_assets_dic = {}
-        for m_name in filtered_machine_dic:
+        for m_name in sorted(filtered_machine_set):
             filtered_render_dic[m_name] = renderdb_dic[m_name]
             filtered_assets_dic[m_name] = assetdb_dic[m_name]
-        rom_DB_noext = hashlib.md5(f_name.encode('utf-8')).hexdigest()
         this_filter_idx_dic = {
             'display_name' : f_definition['name'],
+            'fingerprint'  : fingerprint,
             'num_machines' : len(filtered_render_dic),
             'order'        : processed_items,
             'plot'         : f_definition['plot'],
@@ -1582,13 +1432,44 @@ def filter_build_custom_filters(cfg, db_dic_in, filter_list, main_filter_dic):
 
         # --- Report ---
         r_full.append('Filter "{}"'.format(f_name))
-        r_full.append('{} machines'.format(len(filtered_machine_dic)))
+        r_full.append('{} machines'.format(len(filtered_machine_set)))
         r_full.append('')
+    log_info('filter_build_custom_filters() {} filters computed, {} filters unchanged'.format(
+        processed_items - num_skipped, num_skipped))
 
     # --- Save custom filter index ---
     utils_write_JSON_file(cfg.FILTERS_INDEX_PATH.getPath(), Filters_index_dic)
     pDialog.endProgress()
 
+    # --- Delete JSON files of filters no longer defined ---
+    log_info('filter_build_custom_filters() Cleaning dir "{}"'.format(cfg.FILTERS_DB_DIR.getPath()))
+    valid_file_set = set()
+    for f_name in Filters_index_dic:
+        valid_file_set.add(Filters_index_dic[f_name]['rom_DB_noext'] + '_render.json')
+        valid_file_set.add(Filters_index_dic[f_name]['rom_DB_noext'] + '_assets.json')
+    pDialog.startProgress('Listing filter JSON files...')
+    file_list = os.listdir(cfg.FILTERS_DB_DIR.getPath())
+    num_files = len(file_list)
+    log_info('Found {} files'.format(num_files))
+    num_deleted = 0
+    pDialog.resetProgress('Cleaning filter JSON files...', num_files)
+    for file in file_list:
+        pDialog.updateProgressInc()
+        if file.endswith('.json') and file not in valid_file_set:
+            full_path = os.path.join(cfg.FILTERS_DB_DIR.getPath(), file)
+            # log_debug('UNLINK "{}"'.format(full_path))
+            os.unlink(full_path)
+            num_deleted += 1
+    pDialog.endProgress()
+    log_info('Deleted {} stale filter JSON files'.format(num_deleted))
+
+    # --- Report summary ---
+    r_full.extend([
+        '{} filters computed'.format(processed_items - num_skipped),
+        '{} filters unchanged'.format(num_skipped),
+        '{} stale filter files deleted'.format(num_deleted),
+    ])
+
     # --- Update timestamp ---
     db_safe_edit(control_dic, 't_Custom_Filter_build', time.time())
     utils_write_JSON_file(cfg.MAIN_CONTROL_PATH.getPath(), control_dic)
@@ -20,8 +20,17 @@ from .db import *
 
 # --- Python standard library ---
 import collections
+import hashlib
+import json
+import threading
 import time
 import xml.etree.ElementTree as ET
+if ADDON_RUNNING_PYTHON_2:
+    import Queue as queue
+elif ADDON_RUNNING_PYTHON_3:
+    import queue
+else:
+    raise TypeError('Undefined Python runtime version.')
 try:
     from PIL import Image
     from PIL import ImageDraw
@@ -82,6 +91,148 @@ def ETA_update(build_OK_flag, total_processed_items, build_time):
 
     return ETA_str
 
+# ------------------------------------------------------------------------------------------------
+# Build worker threads
+# ------------------------------------------------------------------------------------------------
+# Fanarts and 3D Boxes are built by GRAPHS_BUILD_NUM_THREADS worker threads. Processes cannot
+# be used because multiprocessing does not work inside Kodi.
+# The main thread submits the jobs, collects the results and updates the progress dialog.
+# The build functions set the image path in the assets dictionary of their own machine or
+# SL item, so the workers never write the same dictionary entry. job_key is returned with
+# the result to identify the job.
+#
+# How to use this code:
+#     build_pool = Graphs_Build_Pool()
+#     for m_name in machine_list:
+#         build_pool.submit(m_name, graphs_build_MAME_Fanart, cfg, layout, m_name, assets_dic, Fanart_FN)
+#         while build_pool.is_full():
+#             job_key, build_OK_flag, build_time = build_pool.get_result()
+#     while build_pool.has_jobs():
+#         job_key, build_OK_flag, build_time = build_pool.get_result()
+#     build_pool.close()
+class Threaded_Graphs_Worker(threading.Thread):
+    def __init__(self, job_queue, result_queue):
+        threading.Thread.__init__(self)
+        self.job_queue = job_queue
+        self.result_queue = result_queue
+
+    def run(self):
+        while True:
+            job = self.job_queue.get()
+            if job is None: break
+            job_key, build_function, args = job
+            try:
+                build_OK_flag = build_function(*args)
+            except Exception as ex:
+                log_error('Threaded_Graphs_Worker() Exception in {}()'.format(build_function.__name__))
+                log_error('Threaded_Graphs_Worker() {}'.format(ex))
+                build_OK_flag = False
+            self.result_queue.put((job_key, build_OK_flag))
+
+class Graphs_Build_Pool:
+    def __init__(self, num_threads = GRAPHS_BUILD_NUM_THREADS):
+        self.num_threads = max(1, num_threads)
+        self.job_queue = queue.Queue()
+        self.result_queue = queue.Queue()
+        self.num_jobs = 0
+        self.last_result_time = time.time()
+        self.thread_list = []
+        log_debug('Graphs_Build_Pool() Starting {} worker threads'.format(self.num_threads))
+        for i in range(self.num_threads):
+            worker = Threaded_Graphs_Worker(self.job_queue, self.result_queue)
+            worker.start()
+            self.thread_list.append(worker)
+
+    def submit(self, job_key, build_function, *args):
+        self.job_queue.put((job_key, build_function, args))
+        self.num_jobs += 1
+
+    # Two jobs per worker are queued so workers do not wait while the main thread
+    # updates the progress dialog.
+    def is_full(self):
+        return self.num_jobs >= 2 * self.num_threads
+
+    def has_jobs(self):
+        return self.num_jobs > 0
+
+    # Waits until a job finishes and returns (job_key, build_OK_flag, build_time).
+    # build_time is the time elapsed since the previous result and not the time the worker
+    # spent building the image, so the ETA takes into account that images are built in parallel.
+    def get_result(self):
+        job_key, build_OK_flag = self.result_queue.get()
+        self.num_jobs -= 1
+        time_now = time.time()
+        build_time = time_now - self.last_result_time
+        self.last_result_time = time_now
+
+        return job_key, build_OK_flag, build_time
+
+    # All the results must be collected before calling this.
+    def close(self):
+        for worker in self.thread_list:
+            self.job_queue.put(None)
+        for worker in self.thread_list:
+            worker.join()
+
+# ------------------------------------------------------------------------------------------------
+# Build manifests
+# ------------------------------------------------------------------------------------------------
+# The manifest of a build is a dictionary { m_name : fingerprint } with the fingerprint of
+# the inputs of every generated image. The fingerprint is the MD5 hash of the template hash
+# and the path, size and mtime of every input image.
+# When building missing images, an image is built if the file does not exist or if the
+# fingerprint changed, for example because new snaps were added or the template was edited.
+# Images built before the manifests existed are considered up to date and their fingerprint
+# is added to the manifest.
+# Manifests are modified in place, so they must be loaded with a new default object.
+def graphs_get_template_hash(template):
+    # The order of the layout items is the drawing order.
+    if isinstance(template, collections.OrderedDict): template = list(template.items())
+    template_str = json.dumps(template, sort_keys = True)
+
+    return hashlib.md5(template_str.encode('utf-8')).hexdigest()
+
+def graphs_get_fingerprint(template_hash, path_list):
+    fingerprint_list = [template_hash]
+    for path in path_list:
+        try:
+            st = os.stat(path)
+        except OSError:
+            continue
+        fingerprint_list.append('{}|{}|{}'.format(path, st.st_size, int(st.st_mtime)))
+
+    return hashlib.md5('\n'.join(fingerprint_list).encode('utf-8')).hexdigest()
+
+# layout_assets is MAME_layout_assets or SL_layout_assets.
+def graphs_get_Fanart_fingerprint(template_hash, layout, layout_assets, m_assets):
+    path_list = []
+    for asset_key in layout:
+        if asset_key not in layout_assets: continue
+        if m_assets[layout_assets[asset_key]]:
+            path_list.append(m_assets[layout_assets[asset_key]])
+
+    return graphs_get_fingerprint(template_hash, path_list)
+
+def graphs_get_3DBox_fingerprint(template_hash, SL_name, m_assets):
+    if SL_name == 'MAME':
+        asset_list = ['flyer', 'clearlogo', 'marquee']
+    else:
+        asset_list = ['boxfront']
+    path_list = []
+    for asset_name in asset_list:
+        if m_assets[asset_name]: path_list.append(m_assets[asset_name])
+
+    return graphs_get_fingerprint(template_hash, path_list)
+
+# Returns True if the image must be built when building missing images.
+def graphs_manifest_needs_build(manifest_dic, m_name, image_FN, fingerprint):
+    if not image_FN.exists(): return True
+    if m_name not in manifest_dic:
+        manifest_dic[m_name] = fingerprint
+        return False
+
+    return manifest_dic[m_name] != fingerprint
+
 # ------------------------------------------------------------------------------------------------
 # Math functions
 # ------------------------------------------------------------------------------------------------
@@ -186,6 +337,45 @@ def resize_proportional(img, layout, dic_key, CANVAS_COLOR = (0, 0, 0)):
 
     return canvas_img
 
+#
+# Returns the asset image resized to the layout box with resize_proportional().
+# Resized images are cached with key (path, mtime, box size, canvas color), so an image shared
+# by several machines is decoded and resized only once for every layout box.
+# The returned image must not be modified.
+#
+def graphs_get_asset_tile(asset_path, layout, dic_key, CANVAS_COLOR = (0, 0, 0)):
+    global asset_tile_cache_hits
+    global asset_tile_cache_misses
+
+    tile_key = (asset_path, os.path.getmtime(asset_path),
+        layout[dic_key]['width'], layout[dic_key]['height'], CANVAS_COLOR)
+    with asset_tile_cache_lock:
+        if tile_key in asset_tile_cache:
+            img_tile = asset_tile_cache.pop(tile_key)
+            asset_tile_cache[tile_key] = img_tile
+            asset_tile_cache_hits += 1
+            return img_tile
+        asset_tile_cache_misses += 1
+    img_tile = resize_proportional(Image.open(asset_path), layout, dic_key, CANVAS_COLOR)
+    with asset_tile_cache_lock:
+        asset_tile_cache[tile_key] = img_tile
+        while len(asset_tile_cache) > GRAPHS_TILE_CACHE_SIZE:
+            asset_tile_cache.popitem(last = False)
+
+    return img_tile
+
+# Frees the memory used by the resized images and prints the cache statistics.
+def graphs_clear_asset_tile_cache():
+    global asset_tile_cache_hits
+    global asset_tile_cache_misses
+
+    with asset_tile_cache_lock:
+        log_debug('graphs_clear_asset_tile_cache() Hits {:,} misses {:,}'.format(
+            asset_tile_cache_hits, asset_tile_cache_misses))
+        asset_tile_cache.clear()
+        asset_tile_cache_hits = 0
+        asset_tile_cache_misses = 0
+
 def paste_image(img, img_title, layout, dic_key):
     box = (
         layout[dic_key]['left'],
@@ -222,6 +412,32 @@ def perspective_coeffs(source_coords, target_coords):
 
     return res
 
+# perspective_coeffs() is very slow because math_MatrixInverse() uses cofactor expansion.
+# The coefficients of the unit square are computed once for every set of target coordinates
+# and scaled to the image size: the first row of coefficients scales with the width, the
+# second row with the height and the last two coefficients do not change.
+def perspective_coeffs_cached(width, height, n_coords):
+    coords_key = tuple(n_coords)
+    if coords_key not in perspective_coeffs_cache:
+        perspective_coeffs_cache[coords_key] = perspective_coeffs(
+            [(0, 0), (1, 0), (1, 1), (0, 1)], n_coords)
+    u = perspective_coeffs_cache[coords_key]
+
+    return [u[0] * width, u[1] * width, u[2] * width,
+        u[3] * height, u[4] * height, u[5] * height, u[6], u[7]]
+
+# The alpha mask of the projected polygon only depends on the canvas size and coordinates.
+# putalpha() does not modify the mask so the same mask object is used for all images.
+def perspective_mask_cached(n_coords, CANVAS_SIZE):
+    mask_key = (CANVAS_SIZE, tuple(n_coords))
+    if mask_key not in perspective_mask_cache:
+        mask = Image.new('L', CANVAS_SIZE, color = 0)
+        draw = ImageDraw.Draw(mask)
+        draw.polygon(n_coords, fill = 255)
+        perspective_mask_cache[mask_key] = mask
+
+    return perspective_mask_cache[mask_key]
+
 def project_texture(img_boxfront, coordinates, CANVAS_SIZE, rotate = False):
     # print('project_texture() BEGIN ...')
 
@@ -239,17 +455,14 @@ def project_texture(img_boxfront, coordinates, CANVAS_SIZE, rotate = False):
     # Conver list of lists to list of tuples
     n_coords = [(int(c[0]), int(c[1])) for c in coordinates]
     # top/left, top/right, bottom/right, bottom/left
-    coeffs = perspective_coeffs([(0, 0), (width, 0), (width, height), (0, height)], n_coords)
+    coeffs = perspective_coeffs_cached(width, height, n_coords)
     # print(coeffs)
     img_t = img_boxfront.transform(CANVAS_SIZE, Image.PERSPECTIVE, coeffs, Image.BICUBIC)
 
     # --- Add polygon with alpha channel for blending ---
     # In the alpha channel 0 means transparent and 255 opaque.
-    mask = Image.new('L', CANVAS_SIZE, color = 0)
-    draw = ImageDraw.Draw(mask)
     # print(n_coords)
-    draw.polygon(n_coords, fill = 255)
-    img_t.putalpha(mask)
+    img_t.putalpha(perspective_mask_cached(n_coords, CANVAS_SIZE))
 
     return img_t
 
@@ -263,6 +476,21 @@ font_mono_SL = None
 font_mono_item = None
 font_mono_debug = None
 
+# Cache of perspective_coeffs_cached() and perspective_mask_cached().
+perspective_coeffs_cache = {}
+perspective_mask_cache = {}
+
+# Cache of graphs_get_3DBox_template(). The lock prevents several worker threads from
+# rendering the same template at the same time.
+box3d_template_cache = {}
+box3d_template_lock = threading.Lock()
+
+# LRU cache of graphs_get_asset_tile(). The lock protects the cache and the statistics.
+asset_tile_cache = collections.OrderedDict()
+asset_tile_cache_lock = threading.Lock()
+asset_tile_cache_hits = 0
+asset_tile_cache_misses = 0
+
 # --- Fanart layout ---
 MAME_layout_example = {
     'Title'       : {'width' : 450, 'height' : 450, 'left' : 50,   'top' : 50},
@@ -382,8 +610,7 @@ def graphs_build_MAME_Fanart(cfg, layout, m_name, assets_dic, Fanart_FN,
             # If so, report the machine that produces the fail and do not generate the
             # Fanart.
             try:
-                img_asset = Image.open(Asset_FN.getPath())
-                img_asset = resize_proportional(img_asset, layout, asset_key, CANVAS_COLOR)
+                img_asset = graphs_get_asset_tile(Asset_FN.getPath(), layout, asset_key, CANVAS_COLOR)
             except AttributeError:
                 a = 'graphs_build_MAME_Fanart() Exception AttributeError'
                 b = 'in m_name {}, asset_key {}'.format(m_name, asset_key)
@@ -481,8 +708,7 @@ def graphs_build_SL_Fanart(cfg, layout, SL_name, m_name, assets_dic, Fanart_FN,
                 # log_debug('{0:<10} file not found'.format(asset_db_name))
                 continue
             # log_debug('{0:<10} found'.format(asset_db_name))
-            img_asset = Image.open(Asset_FN.getPath())
-            img_asset = resize_proportional(img_asset, layout, asset_key, CANVAS_COLOR)
+            img_asset = graphs_get_asset_tile(Asset_FN.getPath(), layout, asset_key, CANVAS_COLOR)
             fanart_img = paste_image(fanart_img, img_asset, layout, asset_key)
             # In debug mode print asset name and draw order.
             if test_flag:
@@ -505,6 +731,54 @@ def graphs_build_SL_Fanart(cfg, layout, SL_name, m_name, assets_dic, Fanart_FN,
     # Fanart succesfully built.
     return True
 
+#
+# Returns a dictionary with the 3D Box layers that are the same for every machine and SL item:
+# the canvas with the Frontbox and Spine backgrounds and the projected MAME logo.
+# The layers are rendered the first time and then cached for every set of coordinates.
+#
+def graphs_get_3DBox_template(cfg, coord_dic, CANVAS_SIZE):
+    # CANVAS_BG_COLOR = (50, 50, 75) if test_flag else (0, 0, 0)
+    CANVAS_BG_COLOR = (0, 0, 0)
+    FRONTBOX_BG_COLOR = (200, 100, 100)
+    SPINE_BG_COLOR = (100, 200, 100)
+    MAME_logo_FN = cfg.ADDON_CODE_DIR.pjoin('media/MAME_clearlogo.png')
+
+    template_key = [CANVAS_SIZE]
+    for layer_name in ['Frontbox', 'Spine', 'Clearlogo_MAME']:
+        template_key.append(tuple(tuple(c) for c in coord_dic[layer_name]))
+    template_key = tuple(template_key)
+    with box3d_template_lock:
+        if template_key in box3d_template_cache:
+            return box3d_template_cache[template_key]
+        log_debug('graphs_get_3DBox_template() Rendering 3D Box template')
+
+        # --- Create 3dbox canvas ---
+        # Create RGB image with alpha channel.
+        # Canvas size of destination transformation must have the same size as the final canvas.
+        canvas = Image.new('RGBA', CANVAS_SIZE, CANVAS_BG_COLOR)
+
+        # --- Frontbox ---
+        img_front = Image.new('RGBA', CANVAS_SIZE, FRONTBOX_BG_COLOR)
+        img_t = project_texture(img_front, coord_dic['Frontbox'], CANVAS_SIZE)
+        canvas.paste(img_t, mask = img_t)
+
+        # --- Spine ---
+        img_spine = Image.new('RGBA', CANVAS_SIZE, SPINE_BG_COLOR)
+        img_t = project_texture(img_spine, coord_dic['Spine'], CANVAS_SIZE)
+        canvas.paste(img_t, mask = img_t)
+
+        # --- MAME background ---
+        img_mame = Image.open(MAME_logo_FN.getPath())
+        img_mame_t = project_texture(img_mame, coord_dic['Clearlogo_MAME'], CANVAS_SIZE, rotate = True)
+
+        template = {
+            'canvas' : canvas,
+            'MAME_logo' : img_mame_t,
+        }
+        box3d_template_cache[template_key] = template
+
+    return template
+
 #
 # Builds a MAME or SL 3D Box.
 #
@@ -514,11 +788,6 @@ def graphs_build_MAME_3DBox(cfg, coord_dic, SL_name, m_name, assets_dic, image_F
     global font_mono_debug
     FONT_SIZE = 90
     CANVAS_SIZE = (1000, 1500)
-    # CANVAS_BG_COLOR = (50, 50, 75) if test_flag else (0, 0, 0)
-    CANVAS_BG_COLOR = (0, 0, 0)
-    FRONTBOX_BG_COLOR = (200, 100, 100)
-    SPINE_BG_COLOR = (100, 200, 100)
-    MAME_logo_FN = cfg.ADDON_CODE_DIR.pjoin('media/MAME_clearlogo.png')
 
     # --- If font object does not exists open font an cache it. ---
     if not font_mono:
@@ -561,20 +830,9 @@ def graphs_build_MAME_3DBox(cfg, coord_dic, SL_name, m_name, assets_dic, image_F
         except:
             return False
 
-    # --- Create 3dbox canvas ---
-    # Create RGB image with alpha channel.
-    # Canvas size of destination transformation must have the same size as the final canvas.
-    canvas = Image.new('RGBA', CANVAS_SIZE, CANVAS_BG_COLOR)
-
-    # --- Frontbox ---
-    img_front = Image.new('RGBA', CANVAS_SIZE, FRONTBOX_BG_COLOR)
-    img_t = project_texture(img_front, coord_dic['Frontbox'], CANVAS_SIZE)
-    canvas.paste(img_t, mask = img_t)
-
-    # --- Spine ---
-    img_spine = Image.new('RGBA', CANVAS_SIZE, SPINE_BG_COLOR)
-    img_t = project_texture(img_spine, coord_dic['Spine'], CANVAS_SIZE)
-    canvas.paste(img_t, mask = img_t)
+    # --- Create 3dbox canvas with the Frontbox and Spine backgrounds ---
+    template = graphs_get_3DBox_template(cfg, coord_dic, CANVAS_SIZE)
+    canvas = template['canvas'].copy()
 
     # --- Flyer image ---
     # At this point img_flyer is present and opened.
@@ -596,9 +854,7 @@ def graphs_build_MAME_3DBox(cfg, coord_dic, SL_name, m_name, assets_dic, image_F
             log_error('SL_name = {}, m_name = {}'.format(SL_name, m_name))
 
     # --- MAME background ---
-    img_mame = Image.open(MAME_logo_FN.getPath())
-    img_t = project_texture(img_mame, coord_dic['Clearlogo_MAME'], CANVAS_SIZE, rotate = True)
-    canvas.paste(img_t, mask = img_t)
+    canvas.paste(template['MAME_logo'], mask = template['MAME_logo'])
 
     # --- Machine name ---
     img_name = Image.new('RGBA', (1000, 100), (0, 0, 0))
@@ -707,6 +963,8 @@ def graphs_load_MAME_Fanart_stuff(cfg, st_dic, BUILD_MISSING):
         kodi_set_error_status(st_dic, 'Error loading XML MAME Fanart layout.')
         return
     data_dic['layout'] = layout
+    data_dic['template_hash'] = graphs_get_template_hash(layout)
+    data_dic['manifest'] = utils_load_JSON_file(cfg.MAME_FANART_MANIFEST_PATH.getPath(), {})
 
     # --- Load Assets DB ---
     pDialog = KodiProgressDialog()
@@ -727,35 +985,46 @@ def graphs_build_MAME_Fanart_all(cfg, st_dic, data_dic):
     ETA_str = ETA_reset(total_machines)
     diag_t = 'Building MAME machine Fanarts...'
     pDialog.startProgress(diag_t, total_machines)
+    build_pool = Graphs_Build_Pool()
     for m_name in sorted(data_dic['assetdb']):
-        build_time_start = time.time()
         pDialog.updateProgress(processed_machines, '{}\nETA {} machine {}'.format(diag_t, ETA_str, m_name))
         if pDialog.isCanceled():
             pDialog_canceled = True
             # kodi_dialog_OK('Fanart generation was canceled by the user.')
             break
-        # If build missing Fanarts was chosen only build fanart if file cannot be found.
+        # If build missing Fanarts was chosen only build fanart if file cannot be found
+        # or if the assets or the layout changed.
         Fanart_FN = data_dic['Fanart_path_FN'].pjoin('{}.png'.format(m_name))
-        if data_dic['BUILD_MISSING']:
-            if Fanart_FN.exists():
-                data_dic['assetdb'][m_name]['fanart'] = Fanart_FN.getPath()
-                build_OK_flag = False
-            else:
-                build_OK_flag = graphs_build_MAME_Fanart(cfg,
-                    data_dic['layout'], m_name, data_dic['assetdb'], Fanart_FN)
-        else:
-            build_OK_flag = graphs_build_MAME_Fanart(cfg,
-                data_dic['layout'], m_name, data_dic['assetdb'], Fanart_FN)
+        fingerprint = graphs_get_Fanart_fingerprint(data_dic['template_hash'],
+            data_dic['layout'], MAME_layout_assets, data_dic['assetdb'][m_name])
+        if data_dic['BUILD_MISSING'] and \
+            not graphs_manifest_needs_build(data_dic['manifest'], m_name, Fanart_FN, fingerprint):
+            data_dic['assetdb'][m_name]['fanart'] = Fanart_FN.getPath()
+            processed_machines += 1
+            ETA_str = ETA_update(False, processed_machines, 0.0)
+            continue
+        build_pool.submit((m_name, fingerprint), graphs_build_MAME_Fanart, cfg,
+            data_dic['layout'], m_name, data_dic['assetdb'], Fanart_FN)
+        while build_pool.is_full():
+            (r_name, r_fingerprint), build_OK_flag, build_time = build_pool.get_result()
+            if build_OK_flag: data_dic['manifest'][r_name] = r_fingerprint
+            processed_machines += 1
+            # Only update ETA if Fanart was successfully build.
+            ETA_str = ETA_update(build_OK_flag, processed_machines, build_time)
+    # Wait for the images being built.
+    while build_pool.has_jobs():
+        (r_name, r_fingerprint), build_OK_flag, build_time = build_pool.get_result()
+        if build_OK_flag: data_dic['manifest'][r_name] = r_fingerprint
         processed_machines += 1
-        build_time_end = time.time()
-        build_time = build_time_end - build_time_start
-        # Only update ETA if Fanart was successfully build.
-        ETA_str = ETA_update(build_OK_flag, processed_machines, build_time)
+        pDialog.updateProgress(processed_machines)
+    build_pool.close()
+    graphs_clear_asset_tile_cache()
     pDialog.endProgress()
 
-    # Save MAME assets DB
+    # Save MAME assets DB and Fanart manifest.
     pDialog.startProgress('Saving MAME asset database...')
     utils_write_JSON_file(cfg.ASSET_DB_PATH.getPath(), data_dic['assetdb'])
+    utils_write_JSON_file(cfg.MAME_FANART_MANIFEST_PATH.getPath(), data_dic['manifest'])
     pDialog.endProgress()
 
     # Update MAME Fanart build timestamp
@@ -839,6 +1108,9 @@ def graphs_load_SL_Fanart_stuff(cfg, st_dic, BUILD_MISSING):
         kodi_set_error_status(st_dic, 'Error loading XML Software List Fanart layout.')
         return
     data_dic['layout'] = layout
+    data_dic['template_hash'] = graphs_get_template_hash(layout)
+    # SL manifest is a dictionary { SL_name : { m_name : fingerprint } }
+    data_dic['manifest'] = utils_load_JSON_file(cfg.SL_FANART_MANIFEST_PATH.getPath(), {})
 
     # --- Load SL index ---
     SL_index = utils_load_JSON_file(cfg.SL_INDEX_PATH.getPath())
@@ -858,6 +1130,7 @@ def graphs_build_SL_Fanart_all(cfg, st_dic, data_dic):
     ETA_str = ETA_reset(total_SL_items)
     log_debug('graphs_build_SL_Fanart_all() total_SL_items = {}'.format(total_SL_items))
     pDialog.startProgress('Building Software List Fanarts...')
+    build_pool = Graphs_Build_Pool()
     for SL_name in sorted(data_dic['SL_index']):
         # Update progres dialog
         dtext = 'Processing SL {} ({} of {})...'.format(SL_name, SL_count, SL_number)
@@ -875,43 +1148,55 @@ def graphs_build_SL_Fanart_all(cfg, st_dic, data_dic):
         assets_file_name =  data_dic['SL_index'][SL_name]['rom_DB_noext'] + '_assets.json'
         SL_asset_DB_FN = cfg.SL_DB_DIR.pjoin(assets_file_name)
         SL_assets_dic = utils_load_JSON_file(SL_asset_DB_FN.getPath())
+        SL_manifest = data_dic['manifest'].setdefault(SL_name, {})
 
         # Traverse all SL items and build fanart from other pieces of artwork
         # Last slot of the progress bar is to save the JSON database.
         total_SL_items, processed_SL_items = len(SL_assets_dic) + 1, 0
         pDialog.resetProgress(dtext, total_SL_items)
         for m_name in sorted(SL_assets_dic):
-            build_time_start = time.time()
             pDialog.updateProgress(processed_SL_items, '{}\nETA {} SL item {}'.format(dtext, ETA_str, m_name))
             if pDialog.isCanceled():
                 pDialog_canceled = True
                 # kodi_dialog_OK('SL Fanart generation was cancelled by the user.')
                 break
-            # If build missing Fanarts was chosen only build fanart if file cannot be found.
+            # If build missing Fanarts was chosen only build fanart if file cannot be found
+            # or if the assets or the layout changed.
             Fanart_FN = Fanart_path_FN.pjoin('{}.png'.format(m_name))
-            if data_dic['BUILD_MISSING']:
-                if Fanart_FN.exists():
-                    SL_assets_dic[m_name]['fanart'] = Fanart_FN.getPath()
-                    build_OK_flag = False
-                else:
-                    build_OK_flag = graphs_build_SL_Fanart(cfg,
-                        data_dic['layout'], SL_name, m_name, SL_assets_dic, Fanart_FN)
-            else:
-                build_OK_flag = graphs_build_SL_Fanart(cfg,
-                    data_dic['layout'], SL_name, m_name, SL_assets_dic, Fanart_FN)
+            fingerprint = graphs_get_Fanart_fingerprint(data_dic['template_hash'],
+                data_dic['layout'], SL_layout_assets, SL_assets_dic[m_name])
+            if data_dic['BUILD_MISSING'] and \
+                not graphs_manifest_needs_build(SL_manifest, m_name, Fanart_FN, fingerprint):
+                SL_assets_dic[m_name]['fanart'] = Fanart_FN.getPath()
+                processed_SL_items += 1
+                total_processed_SL_items += 1
+                ETA_str = ETA_update(False, total_processed_SL_items, 0.0)
+                continue
+            build_pool.submit((m_name, fingerprint), graphs_build_SL_Fanart, cfg,
+                data_dic['layout'], SL_name, m_name, SL_assets_dic, Fanart_FN)
+            while build_pool.is_full():
+                (r_name, r_fingerprint), build_OK_flag, build_time = build_pool.get_result()
+                if build_OK_flag: SL_manifest[r_name] = r_fingerprint
+                processed_SL_items += 1
+                total_processed_SL_items += 1 # For total ETA calculation
+                # Only update ETA if Fanart was sucesfully build.
+                ETA_str = ETA_update(build_OK_flag, total_processed_SL_items, build_time)
+        # Wait for the images being built before saving the SL assets DB.
+        while build_pool.has_jobs():
+            (r_name, r_fingerprint), build_OK_flag, build_time = build_pool.get_result()
+            if build_OK_flag: SL_manifest[r_name] = r_fingerprint
             processed_SL_items += 1
-            total_processed_SL_items += 1 # For total ETA calculation
-            build_time_end = time.time()
-            build_time = build_time_end - build_time_start
-            # Only update ETA if 3DBox was sucesfully build.
-            ETA_str = ETA_update(build_OK_flag, total_processed_SL_items, build_time)
+            total_processed_SL_items += 1
         # Save SL assets DB.
         pDialog.updateProgress(processed_SL_items, '{}\nSaving SL {} asset database'.format(dtext, SL_name))
         utils_write_JSON_file(SL_asset_DB_FN.getPath(), SL_assets_dic)
         # Update progress.
         SL_count += 1
         if pDialog_canceled: break
+    build_pool.close()
+    graphs_clear_asset_tile_cache()
     pDialog.endProgress()
+    utils_write_JSON_file(cfg.SL_FANART_MANIFEST_PATH.getPath(), data_dic['manifest'])
 
     # Update SL Fanart build timestamp
     db_safe_edit(control_dic, 't_SL_fanart_build', time.time())
@@ -951,6 +1236,8 @@ def graphs_load_MAME_3DBox_stuff(cfg, st_dic, BUILD_MISSING):
         kodi_set_error_status(st_dic, 'Error loading JSON 3dbox projection data.')
         return
     data_dic['t_projection'] = t_projection
+    data_dic['template_hash'] = graphs_get_template_hash(t_projection)
+    data_dic['manifest'] = utils_load_JSON_file(cfg.MAME_3DBOX_MANIFEST_PATH.getPath(), {})
 
     # --- Load Assets DB ---
     pDialog = KodiProgressDialog()
@@ -971,34 +1258,43 @@ def graphs_build_MAME_3DBox_all(cfg, st_dic, data_dic):
     pDialog = KodiProgressDialog()
     d_text = 'Building MAME machine 3D Boxes...'
     pDialog.startProgress(d_text, total_machines)
+    build_pool = Graphs_Build_Pool()
     for m_name in sorted(data_dic['assetdb']):
-        build_time_start = time.time()
         d_str = '{}\nETA {} machine {}'.format(d_text, ETA_str, m_name)
         pDialog.updateProgress(processed_machines, d_str)
         if pDialog.isCanceled():
             pDialog_canceled = True
             break
         Image_FN = data_dic['Boxes_path_FN'].pjoin('{}.png'.format(m_name))
-        if data_dic['BUILD_MISSING']:
-            if Image_FN.exists():
-                data_dic['assetdb'][m_name]['3dbox'] = Image_FN.getPath()
-                build_OK_flag = False
-            else:
-                build_OK_flag = graphs_build_MAME_3DBox(cfg,
-                    data_dic['t_projection'], SL_name, m_name, data_dic['assetdb'], Image_FN)
-        else:
-            build_OK_flag = graphs_build_MAME_3DBox(cfg,
-                data_dic['t_projection'], SL_name, m_name, data_dic['assetdb'], Image_FN)
+        fingerprint = graphs_get_3DBox_fingerprint(data_dic['template_hash'],
+            SL_name, data_dic['assetdb'][m_name])
+        if data_dic['BUILD_MISSING'] and \
+            not graphs_manifest_needs_build(data_dic['manifest'], m_name, Image_FN, fingerprint):
+            data_dic['assetdb'][m_name]['3dbox'] = Image_FN.getPath()
+            processed_machines += 1
+            ETA_str = ETA_update(False, processed_machines, 0.0)
+            continue
+        build_pool.submit((m_name, fingerprint), graphs_build_MAME_3DBox, cfg,
+            data_dic['t_projection'], SL_name, m_name, data_dic['assetdb'], Image_FN)
+        while build_pool.is_full():
+            (r_name, r_fingerprint), build_OK_flag, build_time = build_pool.get_result()
+            if build_OK_flag: data_dic['manifest'][r_name] = r_fingerprint
+            processed_machines += 1
+            # Only update ETA if 3DBox was successfully build.
+            ETA_str = ETA_update(build_OK_flag, processed_machines, build_time)
+    # Wait for the images being built.
+    while build_pool.has_jobs():
+        (r_name, r_fingerprint), build_OK_flag, build_time = build_pool.get_result()
+        if build_OK_flag: data_dic['manifest'][r_name] = r_fingerprint
         processed_machines += 1
-        build_time_end = time.time()
-        build_time = build_time_end - build_time_start
-        # Only update ETA if 3DBox was successfully build.
-        ETA_str = ETA_update(build_OK_flag, processed_machines, build_time)
+        pDialog.updateProgress(processed_machines)
+    build_pool.close()
     pDialog.endProgress()
 
-    # --- Save assets DB ---
+    # --- Save assets DB and 3D Box manifest ---
     pDialog.startProgress('Saving MAME asset database...')
     utils_write_JSON_file(cfg.ASSET_DB_PATH.getPath(), data_dic['assetdb'])
+    utils_write_JSON_file(cfg.MAME_3DBOX_MANIFEST_PATH.getPath(), data_dic['manifest'])
     pDialog.endProgress()
 
     # --- MAME Fanart build timestamp ---
@@ -1032,6 +1328,9 @@ def graphs_load_SL_3DBox_stuff(cfg, st_dic, BUILD_MISSING):
         kodi_set_error_status(st_dic, 'Error loading JSON SL 3dbox projection data.')
         return
     data_dic['t_projection'] = t_projection
+    data_dic['template_hash'] = graphs_get_template_hash(t_projection)
+    # SL manifest is a dictionary { SL_name : { m_name : fingerprint } }
+    data_dic['manifest'] = utils_load_JSON_file(cfg.SL_3DBOX_MANIFEST_PATH.getPath(), {})
 
     # --- Load SL index ---
     SL_index = utils_load_JSON_file(cfg.SL_INDEX_PATH.getPath())
@@ -1051,6 +1350,7 @@ def graphs_build_SL_3DBox_all(cfg, st_dic, data_dic):
     pDialog_canceled = False
     pDialog = KodiProgressDialog()
     pDialog.startProgress('Advanced MAME Launcher')
+    build_pool = Graphs_Build_Pool()
     for SL_name in sorted(data_dic['SL_index']):
         d_text = 'Processing SL {} ({} of {})...'.format(SL_name, SL_count, SL_number)
 
@@ -1067,42 +1367,52 @@ def graphs_build_SL_3DBox_all(cfg, st_dic, data_dic):
         assets_file_name = data_dic['SL_index'][SL_name]['rom_DB_noext'] + '_assets.json'
         SL_asset_DB_FN = cfg.SL_DB_DIR.pjoin(assets_file_name)
         SL_assets_dic = utils_load_JSON_file(SL_asset_DB_FN.getPath())
+        SL_manifest = data_dic['manifest'].setdefault(SL_name, {})
 
         # Traverse all SL items and build fanart from other pieces of artwork
         # Last slot of the progress bar is to save the JSON database.
         processed_SL_items = 0
         pDialog.resetProgress(d_text, len(SL_assets_dic))
         for m_name in sorted(SL_assets_dic):
-            build_time_start = time.time()
             d_str = d_text + '\n' + 'ETA {} SL item {}'.format(ETA_str, m_name)
             pDialog.updateProgress(processed_SL_items, d_str)
             if pDialog.isCanceled():
                 pDialog_canceled = True
                 break
             Image_FN = Boxes_path_FN.pjoin('{}.png'.format(m_name))
-            if data_dic['BUILD_MISSING']:
-                if Image_FN.exists():
-                    SL_assets_dic[m_name]['3dbox'] = Image_FN.getPath()
-                    build_OK_flag = False
-                else:
-                    build_OK_flag = graphs_build_MAME_3DBox(cfg,
-                        data_dic['t_projection'], SL_name, m_name, SL_assets_dic, Image_FN)
-            else:
-                build_OK_flag = graphs_build_MAME_3DBox(cfg,
-                    data_dic['t_projection'], SL_name, m_name, SL_assets_dic, Image_FN)
-            processed_SL_items += 1 # For current list progress dialog
-            total_processed_SL_items += 1 # For total ETA calculation
-            build_time_end = time.time()
-            build_time = build_time_end - build_time_start
-            # Only update ETA if 3DBox was sucesfully build.
-            ETA_str = ETA_update(build_OK_flag, total_processed_SL_items, build_time)
+            fingerprint = graphs_get_3DBox_fingerprint(data_dic['template_hash'],
+                SL_name, SL_assets_dic[m_name])
+            if data_dic['BUILD_MISSING'] and \
+                not graphs_manifest_needs_build(SL_manifest, m_name, Image_FN, fingerprint):
+                SL_assets_dic[m_name]['3dbox'] = Image_FN.getPath()
+                processed_SL_items += 1
+                total_processed_SL_items += 1
+                ETA_str = ETA_update(False, total_processed_SL_items, 0.0)
+                continue
+            build_pool.submit((m_name, fingerprint), graphs_build_MAME_3DBox, cfg,
+                data_dic['t_projection'], SL_name, m_name, SL_assets_dic, Image_FN)
+            while build_pool.is_full():
+                (r_name, r_fingerprint), build_OK_flag, build_time = build_pool.get_result()
+                if build_OK_flag: SL_manifest[r_name] = r_fingerprint
+                processed_SL_items += 1 # For current list progress dialog
+                total_processed_SL_items += 1 # For total ETA calculation
+                # Only update ETA if 3DBox was sucesfully build.
+                ETA_str = ETA_update(build_OK_flag, total_processed_SL_items, build_time)
+        # Wait for the images being built before saving the SL assets DB.
+        while build_pool.has_jobs():
+            (r_name, r_fingerprint), build_OK_flag, build_time = build_pool.get_result()
+            if build_OK_flag: SL_manifest[r_name] = r_fingerprint
+            processed_SL_items += 1
+            total_processed_SL_items += 1
         # Save SL assets DB.
         pDialog.updateMessage(d_text + '\n' + 'Saving SL {} asset database'.format(SL_name))
         utils_write_JSON_file(SL_asset_DB_FN.getPath(), SL_assets_dic)
         # Update progress.
         SL_count += 1
         if pDialog_canceled: break
+    build_pool.close()
     pDialog.endProgress()
+    utils_write_JSON_file(cfg.SL_3DBOX_MANIFEST_PATH.getPath(), data_dic['manifest'])
 
     # --- SL Fanart build timestamp ---
     db_safe_edit(control_dic, 't_SL_3dbox_build', time.time())
@@ -17,20 +17,25 @@
 # Then include Kodi modules.
 # Finally include standard library modules.
 
+# Startup time measurement. See run_plugin().
+import time
+g_import_ticks_start = time.time()
+
 # --- Modules/packages in this plugin ---
 # Addon module dependencies:
 #   main <-- mame <-- disk_IO <-- assets, misc, utils, constants
 #   mame <-- filters <-- misc, utils, constants
 #   manuals <- misc, utils, constants
 #   graphics <- misc, utils, constants
+# Modules filters, mame, manuals and graphics are big or load PIL and pdfrw and are only
+# used by a few commands. They are imported on demand, see main_load_command_modules().
 from .constants import *
 from .assets import *
 from .utils import *
 from .db import *
-from .filters import *
-from .mame import *
-from .manuals import *
-from .graphics import *
+from .misc import *
+from .mame_misc import *
+from .service import *
 
 # --- Kodi stuff ---
 import xbmc
@@ -41,6 +46,7 @@ import xbmcaddon
 # --- Python standard library ---
 import copy
 import datetime
+import importlib
 import os
 import subprocess
 if ADDON_RUNNING_PYTHON_2:
@@ -108,6 +114,7 @@ class Configuration:
         # Audit and ROM Set databases.
         self.ROM_AUDIT_DB_PATH = self.ADDON_DATA_DIR.pjoin('ROM_Audit_DB.json')
         self.ROM_SET_MACHINE_FILES_DB_PATH = self.ADDON_DATA_DIR.pjoin('ROM_Set_machine_files.json')
+        self.AUDIT_INDEX_PATH = self.ADDON_DATA_DIR.pjoin('ROM_Audit_index.json')
 
         # DAT indices and databases.
         self.HISTORY_IDX_PATH  = self.ADDON_DATA_DIR.pjoin('DAT_History_index.json')
@@ -128,9 +135,16 @@ class Configuration:
         # Disabled. Now there are global properties for this.
         # self.MAIN_PROPERTIES_PATH = self.ADDON_DATA_DIR.pjoin('MAME_properties.json')
 
+        # Fanart and 3D Box build manifests. See graphs_manifest_needs_build().
+        self.MAME_FANART_MANIFEST_PATH = self.ADDON_DATA_DIR.pjoin('Manifest_MAME_Fanart.json')
+        self.MAME_3DBOX_MANIFEST_PATH  = self.ADDON_DATA_DIR.pjoin('Manifest_MAME_3DBox.json')
+        self.SL_FANART_MANIFEST_PATH   = self.ADDON_DATA_DIR.pjoin('Manifest_SL_Fanart.json')
+        self.SL_3DBOX_MANIFEST_PATH    = self.ADDON_DATA_DIR.pjoin('Manifest_SL_3DBox.json')
+
         # ROM cache.
         self.CACHE_DIR = self.ADDON_DATA_DIR.pjoin('cache')
         self.CACHE_INDEX_PATH = self.ADDON_DATA_DIR.pjoin('MAME_cache_index.json')
+        self.MANUALS_CACHE_INDEX_PATH = self.ADDON_DATA_DIR.pjoin('Manuals_cache_index.json')
 
         # Catalogs.
         self.CATALOG_DIR                          = self.ADDON_DATA_DIR.pjoin('catalogs')
@@ -188,8 +202,10 @@ class Configuration:
         self.CATALOG_YEAR_PARENT_PATH             = self.CATALOG_DIR.pjoin('catalog_year_parents.json')
         self.CATALOG_YEAR_ALL_PATH                = self.CATALOG_DIR.pjoin('catalog_year_all.json')
 
-        # Distributed hashed database.
-        self.MAIN_DB_HASH_DIR      = self.ADDON_DATA_DIR.pjoin('hash')
+        # Indexed machine and asset database (SQLite).
+        self.MAIN_DB_INDEX_PATH = self.ADDON_DATA_DIR.pjoin('MAME_DB_index.sqlite')
+
+        # Distributed hashed databases.
         self.ROMS_DB_HASH_DIR      = self.ADDON_DATA_DIR.pjoin('hash_ROM')
         self.ROM_AUDIT_DB_HASH_DIR = self.ADDON_DATA_DIR.pjoin('hash_ROM_Audit')
 
@@ -272,6 +288,7 @@ g_base_url = ''
 
 # Module loading time. This variable is read only (only modified here).
 g_time_str = text_type(datetime.datetime.now())
+g_import_time = time.time() - g_import_ticks_start
 
 # Do not change context menus with listitem.addContextMenuItems() in Kiosk mode.
 # In other words, change the CM if Kiosk mode is disabled.
@@ -296,6 +313,7 @@ def run_plugin(addon_argv):
     # set_log_level(LOG_DEBUG)
 
     # Fill in settings dictionary using cfg.addon.addon_obj.getSetting()
+    settings_ticks_start = time.time()
     get_settings(cfg)
     set_log_level(cfg.settings['log_level'])
 
@@ -324,6 +342,7 @@ def run_plugin(addon_argv):
     get_settings_log_enabled(cfg)
     log_debug('Operation mode "{}"'.format(cfg.settings['op_mode']))
     log_debug('SL global enable is {}'.format(cfg.settings['global_enable_SL']))
+    settings_time = time.time() - settings_ticks_start
 
     # --- Playground and testing code ---
     # kodi_get_screensaver_mode()
@@ -335,7 +354,6 @@ def run_plugin(addon_argv):
     if not cfg.ADDON_DATA_DIR.exists(): cfg.ADDON_DATA_DIR.makedirs()
     if not cfg.CACHE_DIR.exists(): cfg.CACHE_DIR.makedirs()
     if not cfg.CATALOG_DIR.exists(): cfg.CATALOG_DIR.makedirs()
-    if not cfg.MAIN_DB_HASH_DIR.exists(): cfg.MAIN_DB_HASH_DIR.makedirs()
     if not cfg.FILTERS_DB_DIR.exists(): cfg.FILTERS_DB_DIR.makedirs()
     if not cfg.SL_DB_DIR.exists(): cfg.SL_DB_DIR.makedirs()
     if not cfg.REPORTS_DIR.exists(): cfg.REPORTS_DIR.makedirs()
@@ -357,6 +375,17 @@ def run_plugin(addon_argv):
     cfg.content_type = args['content_type'] if 'content_type' in args else None
     log_debug('content_type = {}'.format(cfg.content_type))
 
+    # --- Import the modules needed by the command ---
+    modules_ticks_start = time.time()
+    if 'command' in args: main_load_command_modules(args['command'][0])
+    modules_time = time.time() - modules_ticks_start
+
+    # --- Startup time breakdown ---
+    log_debug('Startup import time   {0:.4f} s'.format(g_import_time))
+    log_debug('Startup settings time {0:.4f} s ({1} settings read)'.format(
+        settings_time, cfg.settings.num_reads))
+    log_debug('Startup modules time  {0:.4f} s'.format(modules_time))
+
     # --- URL routing -------------------------------------------------------------------------
     # Show addon root window.
     args_size = len(args)
@@ -397,10 +426,11 @@ def run_plugin(addon_argv):
         else:
             category_name = args['category'][0] if 'category' in args else ''
             parent_name   = args['parent'][0] if 'parent' in args else ''
+            page          = int(args['page'][0]) if 'page' in args else 0
             if category_name and parent_name:
                 render_catalog_clone_list(cfg, catalog_name, category_name, parent_name)
             elif category_name and not parent_name:
-                render_catalog_parent_list(cfg, catalog_name, category_name)
+                render_catalog_parent_list(cfg, catalog_name, category_name, page)
             else:
                 render_catalog_list(cfg, catalog_name)
 
@@ -550,106 +580,193 @@ def run_plugin(addon_argv):
         xbmcplugin.endOfDirectory(cfg.addon_handle, succeeded = True, cacheToDisc = False)
 
     # --- So Long, and Thanks for All the Fish ---
+    log_debug('Settings read {}'.format(cfg.settings.num_reads))
     log_debug('Advanced MAME Launcher exit')
 
-# Get Addon Settings. log_*() functions cannot be used here during normal operation.
-def get_settings(cfg):
-    settings = cfg.settings
+# ---------------------------------------------------------------------------------------------
+# This is the service entry point. Kodi starts it at login and stops it at exit.
+# ---------------------------------------------------------------------------------------------
+def run_service():
+    cfg = Configuration()
+    get_settings(cfg)
+    set_log_level(cfg.settings['log_level'])
+    log_debug('-------------------- Called AML run_service() --------------------')
+    if not cfg.settings['service_enabled']:
+        log_debug('run_service() AML service disabled. Exiting.')
+        return
+
+    server = service_new_server(cfg, cfg.settings['service_port'])
+    if server is None: return
+    service_thread = Threaded_Service(server)
+    service_thread.start()
+    monitor = xbmc.Monitor()
+    while not monitor.abortRequested():
+        if monitor.waitForAbort(5): break
+    log_debug('run_service() Kodi abort requested. Stopping AML service.')
+    server.shutdown()
+    server.server_close()
+    service_thread.join()
+    log_debug('run_service() AML service stopped')
+
+# Modules imported on demand by each command. Rendering of lists and the commands not in
+# this dictionary only use the modules imported at the top of this file.
+MAIN_COMMAND_MODULES_DIC = {
+    'SETUP_PLUGIN' : ['filters', 'mame', 'graphics'],
+    'VIEW_DAT' : ['mame', 'manuals'],
+    'VIEW' : ['mame'],
+    'SETUP_CUSTOM_FILTERS' : ['filters', 'mame'],
+    'EXECUTE_UTILITY' : ['mame'],
+    'EXECUTE_REPORT' : ['mame'],
+}
+
+# Same as "from .module import *" at the top of this file. Functions in this module look up
+# global names when called, so the imported names can be used by all the functions.
+# Names defined in this module are never overwritten.
+def main_load_command_modules(command):
+    if command not in MAIN_COMMAND_MODULES_DIC: return
+    globals_dic = globals()
+    for module_name in MAIN_COMMAND_MODULES_DIC[command]:
+        log_debug('main_load_command_modules() Importing module "{}"'.format(module_name))
+        module = importlib.import_module('.' + module_name, __package__)
+        for name in dir(module):
+            if name.startswith('_') or name in globals_dic: continue
+            globals_dic[name] = getattr(module, name)
+
+# Type of the addon settings. Settings are read from Kodi the first time they are used,
+# so every plugin call reads only the settings needed by the command.
+# 'slider' settings are floats in Kodi Leia and integers in Kodi Matrix.
+SETTINGS_TYPE_DIC = {
 
     # --- Main operation ---
-    settings['op_mode_raw'] = kodi_get_int_setting(cfg, 'op_mode_raw')
+    'op_mode_raw' : 'int',
     # Vanilla MAME settings.
-    settings['rom_path_vanilla'] = kodi_get_str_setting(cfg, 'rom_path_vanilla')
-    settings['enable_SL'] = kodi_get_bool_setting(cfg, 'enable_SL')
-    settings['mame_prog'] = kodi_get_str_setting(cfg, 'mame_prog')
-    settings['SL_hash_path'] = kodi_get_str_setting(cfg, 'SL_hash_path')
+    'rom_path_vanilla' : 'str',
+    'enable_SL' : 'bool',
+    'mame_prog' : 'str',
+    'SL_hash_path' : 'str',
     # MAME 2003 Plus settings.
-    settings['rom_path_2003_plus'] = kodi_get_str_setting(cfg, 'rom_path_2003_plus')
-    settings['retroarch_prog'] = kodi_get_str_setting(cfg, 'retroarch_prog')
-    settings['libretro_dir'] = kodi_get_str_setting(cfg, 'libretro_dir')
-    settings['xml_2003_path'] = kodi_get_str_setting(cfg, 'xml_2003_path')
+    'rom_path_2003_plus' : 'str',
+    'retroarch_prog' : 'str',
+    'libretro_dir' : 'str',
+    'xml_2003_path' : 'str',
 
     # --- Optional paths ---
-    settings['assets_path'] = kodi_get_str_setting(cfg, 'assets_path')
-    settings['dats_path'] = kodi_get_str_setting(cfg, 'dats_path')
-    settings['chd_path'] = kodi_get_str_setting(cfg, 'chd_path')
-    settings['samples_path'] = kodi_get_str_setting(cfg, 'samples_path')
-    settings['SL_rom_path'] = kodi_get_str_setting(cfg, 'SL_rom_path')
-    settings['SL_chd_path'] = kodi_get_str_setting(cfg, 'SL_chd_path')
+    'assets_path' : 'str',
+    'dats_path' : 'str',
+    'chd_path' : 'str',
+    'samples_path' : 'str',
+    'SL_rom_path' : 'str',
+    'SL_chd_path' : 'str',
 
     # --- ROM sets ---
-    settings['mame_rom_set'] = kodi_get_int_setting(cfg, 'mame_rom_set')
-    settings['mame_chd_set'] = kodi_get_int_setting(cfg, 'mame_chd_set')
-    settings['SL_rom_set'] = kodi_get_int_setting(cfg, 'SL_rom_set')
-    settings['SL_chd_set'] = kodi_get_int_setting(cfg, 'SL_chd_set')
+    'mame_rom_set' : 'int',
+    'mame_chd_set' : 'int',
+    'SL_rom_set' : 'int',
+    'SL_chd_set' : 'int',
 
     # Misc separator
-    settings['filter_XML'] = kodi_get_str_setting(cfg, 'filter_XML')
-    settings['generate_history_infolabel'] = kodi_get_bool_setting(cfg, 'generate_history_infolabel')
+    'filter_XML' : 'str',
+    'generate_history_infolabel' : 'bool',
 
     # --- Display I ---
-    settings['display_launcher_notify'] = kodi_get_bool_setting(cfg, 'display_launcher_notify')
-    settings['mame_view_mode'] = kodi_get_int_setting(cfg, 'mame_view_mode')
-    settings['sl_view_mode'] = kodi_get_int_setting(cfg, 'sl_view_mode')
-    settings['display_hide_Mature'] = kodi_get_bool_setting(cfg, 'display_hide_Mature')
-    settings['display_hide_BIOS'] = kodi_get_bool_setting(cfg, 'display_hide_BIOS')
-    settings['display_hide_imperfect'] = kodi_get_bool_setting(cfg, 'display_hide_imperfect')
-    settings['display_hide_nonworking'] = kodi_get_bool_setting(cfg, 'display_hide_nonworking')
-    settings['display_rom_available'] = kodi_get_bool_setting(cfg, 'display_rom_available')
-    settings['display_chd_available'] = kodi_get_bool_setting(cfg, 'display_chd_available')
-    settings['display_SL_items_available'] = kodi_get_bool_setting(cfg, 'display_SL_items_available')
-    settings['display_MAME_flags'] = kodi_get_bool_setting(cfg, 'display_MAME_flags')
-    settings['display_SL_flags'] = kodi_get_bool_setting(cfg, 'display_SL_flags')
+    'display_launcher_notify' : 'bool',
+    'mame_view_mode' : 'int',
+    'sl_view_mode' : 'int',
+    'display_page_size' : 'slider',
+    'display_hide_Mature' : 'bool',
+    'display_hide_BIOS' : 'bool',
+    'display_hide_imperfect' : 'bool',
+    'display_hide_nonworking' : 'bool',
+    'display_rom_available' : 'bool',
+    'display_chd_available' : 'bool',
+    'display_SL_items_available' : 'bool',
+    'display_MAME_flags' : 'bool',
+    'display_SL_flags' : 'bool',
 
     # --- Display II ---
-    settings['display_main_filters'] = kodi_get_bool_setting(cfg, 'display_main_filters')
-    settings['display_binary_filters'] = kodi_get_bool_setting(cfg, 'display_binary_filters')
-    settings['display_catalog_filters'] = kodi_get_bool_setting(cfg, 'display_catalog_filters')
-    settings['display_DAT_browser'] = kodi_get_bool_setting(cfg, 'display_DAT_browser')
-    settings['display_SL_browser'] = kodi_get_bool_setting(cfg, 'display_SL_browser')
-    settings['display_custom_filters'] = kodi_get_bool_setting(cfg, 'display_custom_filters')
-    settings['display_ROLs'] = kodi_get_bool_setting(cfg, 'display_ROLs')
-    settings['display_MAME_favs'] = kodi_get_bool_setting(cfg, 'display_MAME_favs')
-    settings['display_MAME_most'] = kodi_get_bool_setting(cfg, 'display_MAME_most')
-    settings['display_MAME_recent'] = kodi_get_bool_setting(cfg, 'display_MAME_recent')
-    settings['display_SL_favs'] = kodi_get_bool_setting(cfg, 'display_SL_favs')
-    settings['display_SL_most'] = kodi_get_bool_setting(cfg, 'display_SL_most')
-    settings['display_SL_recent'] = kodi_get_bool_setting(cfg, 'display_SL_recent')
-    settings['display_utilities'] = kodi_get_bool_setting(cfg, 'display_utilities')
-    settings['display_global_reports'] = kodi_get_bool_setting(cfg, 'display_global_reports')
+    'display_main_filters' : 'bool',
+    'display_binary_filters' : 'bool',
+    'display_catalog_filters' : 'bool',
+    'display_DAT_browser' : 'bool',
+    'display_SL_browser' : 'bool',
+    'display_custom_filters' : 'bool',
+    'display_ROLs' : 'bool',
+    'display_MAME_favs' : 'bool',
+    'display_MAME_most' : 'bool',
+    'display_MAME_recent' : 'bool',
+    'display_SL_favs' : 'bool',
+    'display_SL_most' : 'bool',
+    'display_SL_recent' : 'bool',
+    'display_utilities' : 'bool',
+    'display_global_reports' : 'bool',
 
     # --- Artwork / Assets ---
-    settings['display_hide_trailers'] = kodi_get_bool_setting(cfg, 'display_hide_trailers')
-    settings['artwork_mame_icon'] = kodi_get_int_setting(cfg, 'artwork_mame_icon')
-    settings['artwork_mame_fanart'] = kodi_get_int_setting(cfg, 'artwork_mame_fanart')
-    settings['artwork_SL_icon'] = kodi_get_int_setting(cfg, 'artwork_SL_icon')
-    settings['artwork_SL_fanart'] = kodi_get_int_setting(cfg, 'artwork_SL_fanart')
+    'display_hide_trailers' : 'bool',
+    'artwork_mame_icon' : 'int',
+    'artwork_mame_fanart' : 'int',
+    'artwork_SL_icon' : 'int',
+    'artwork_SL_fanart' : 'int',
 
     # --- Advanced ---
-    settings['media_state_action'] = kodi_get_int_setting(cfg, 'media_state_action')
-    if ADDON_RUNNING_PYTHON_2:
-        settings['delay_tempo'] = kodi_get_float_setting_as_int(cfg, 'delay_tempo')
-    elif ADDON_RUNNING_PYTHON_3:
-        settings['delay_tempo'] = kodi_get_int_setting(cfg, 'delay_tempo')
-    else:
-        raise TypeError('Undefined Python runtime version.')
-    settings['suspend_audio_engine'] = kodi_get_bool_setting(cfg, 'suspend_audio_engine')
-    settings['suspend_screensaver'] = kodi_get_bool_setting(cfg, 'suspend_screensaver')
-    settings['toggle_window'] = kodi_get_bool_setting(cfg, 'toggle_window')
-    settings['log_level'] = kodi_get_int_setting(cfg, 'log_level')
-    settings['debug_enable_MAME_render_cache'] = kodi_get_bool_setting(cfg, 'debug_enable_MAME_render_cache')
-    settings['debug_enable_MAME_asset_cache'] = kodi_get_bool_setting(cfg, 'debug_enable_MAME_asset_cache')
-    settings['debug_MAME_machine_data'] = kodi_get_bool_setting(cfg, 'debug_MAME_machine_data')
-    settings['debug_MAME_ROM_DB_data'] = kodi_get_bool_setting(cfg, 'debug_MAME_ROM_DB_data')
-    settings['debug_MAME_Audit_DB_data'] = kodi_get_bool_setting(cfg, 'debug_MAME_Audit_DB_data')
-    settings['debug_SL_item_data'] = kodi_get_bool_setting(cfg, 'debug_SL_item_data')
-    settings['debug_SL_ROM_DB_data'] = kodi_get_bool_setting(cfg, 'debug_SL_ROM_DB_data')
-    settings['debug_SL_Audit_DB_data'] = kodi_get_bool_setting(cfg, 'debug_SL_Audit_DB_data')
+    'media_state_action' : 'int',
+    'delay_tempo' : 'slider',
+    'suspend_audio_engine' : 'bool',
+    'suspend_screensaver' : 'bool',
+    'toggle_window' : 'bool',
+    'log_level' : 'int',
+    'debug_enable_MAME_render_cache' : 'bool',
+    'debug_enable_MAME_asset_cache' : 'bool',
+    'audit_num_workers' : 'slider',
+    'service_enabled' : 'bool',
+    'service_port' : 'int',
+    'debug_MAME_machine_data' : 'bool',
+    'debug_MAME_ROM_DB_data' : 'bool',
+    'debug_MAME_Audit_DB_data' : 'bool',
+    'debug_SL_item_data' : 'bool',
+    'debug_SL_ROM_DB_data' : 'bool',
+    'debug_SL_Audit_DB_data' : 'bool',
+}
+
+class Lazy_Settings(dict):
+    def __init__(self, cfg):
+        dict.__init__(self)
+        self.cfg = cfg
+        self.num_reads = 0
+
+    # Called by dict.__getitem__() if the key is not in the dictionary.
+    def __missing__(self, key):
+        if key not in SETTINGS_TYPE_DIC: raise KeyError(key)
+        setting_type = SETTINGS_TYPE_DIC[key]
+        if setting_type == 'str':
+            value = kodi_get_str_setting(self.cfg, key)
+        elif setting_type == 'bool':
+            value = kodi_get_bool_setting(self.cfg, key)
+        elif setting_type == 'int':
+            value = kodi_get_int_setting(self.cfg, key)
+        elif setting_type == 'slider':
+            if ADDON_RUNNING_PYTHON_2:
+                value = kodi_get_float_setting_as_int(self.cfg, key)
+            elif ADDON_RUNNING_PYTHON_3:
+                value = kodi_get_int_setting(self.cfg, key)
+            else:
+                raise TypeError('Undefined Python runtime version.')
+        else:
+            raise TypeError('Wrong setting type "{}"'.format(setting_type))
+        self[key] = value
+        self.num_reads += 1
+
+        return value
+
+# Get Addon Settings. log_*() functions cannot be used here during normal operation.
+def get_settings(cfg):
+    cfg.settings = Lazy_Settings(cfg)
 
     # --- Dump settings for DEBUG ---
+    # Reads all the settings from Kodi.
     # log_debug('Settings dump BEGIN')
-    # for key in sorted(settings):
-    #     log_debug('{} --> {:10s} {}'.format(key.rjust(21), text_type(settings[key]), type(settings[key])))
+    # for key in sorted(SETTINGS_TYPE_DIC):
+    #     value = cfg.settings[key]
+    #     log_debug('{} --> {:10s} {}'.format(key.rjust(21), text_type(value), type(value)))
     # log_debug('Settings dump END')
 
 #
@@ -2023,6 +2140,30 @@ def render_catalog_list(cfg, catalog_name):
     set_Kodi_all_sorting_methods_and_size(cfg)
     mame_view_mode = cfg.settings['mame_view_mode']
     loading_ticks_start = time.time()
+
+    # --- Use the catalog count file if available ---
+    count_list = db_get_catalog_count_list(cfg, catalog_name)
+    if count_list is not None:
+        if not count_list:
+            kodi_dialog_OK('Catalog is empty. Rebuild the MAME databases.')
+            xbmcplugin.endOfDirectory(handle = cfg.addon_handle, succeeded = True, cacheToDisc = False)
+            return
+        loading_ticks_end = time.time()
+        rendering_ticks_start = time.time()
+        for (catalog_key, num_machines, num_parents) in count_list:
+            if mame_view_mode == VIEW_MODE_FLAT:
+                machine_str = 'machine' if num_machines == 1 else 'machines'
+                render_catalog_list_row(cfg, catalog_name, catalog_key, num_machines, machine_str)
+            elif mame_view_mode == VIEW_MODE_PCLONE:
+                machine_str = 'parent' if num_parents == 1 else 'parents'
+                render_catalog_list_row(cfg, catalog_name, catalog_key, num_parents, machine_str)
+        xbmcplugin.endOfDirectory(cfg.addon_handle, succeeded = True, cacheToDisc = False)
+        rendering_ticks_end = time.time()
+        log_debug('Loading seconds   {}'.format(loading_ticks_end - loading_ticks_start))
+        log_debug('Rendering seconds {}'.format(rendering_ticks_end - rendering_ticks_start))
+        return
+    log_warning('Catalog count file not found. Rebuild the MAME catalogs.')
+
     cache_index_dic = utils_load_JSON_file(cfg.CACHE_INDEX_PATH.getPath())
     if mame_view_mode == VIEW_MODE_FLAT:
         catalog_dic = db_get_cataloged_dic_all(cfg, catalog_name)
@@ -2083,7 +2224,7 @@ def render_catalog_list_row(cfg, catalog_name, catalog_key, num_machines, machin
 # Also renders machine lists in flat mode.
 # Display mode: a) parents only b) all machines (flat)
 #
-def render_catalog_parent_list(cfg, catalog_name, category_name):
+def render_catalog_parent_list(cfg, catalog_name, category_name, page = 0):
     # When using threads the performance gain is small: from 0.76 to 0.71, just 20 ms.
     # It's not worth it.
     log_debug('render_catalog_parent_list() catalog_name  = {}'.format(catalog_name))
@@ -2110,6 +2251,26 @@ def render_catalog_parent_list(cfg, catalog_name, category_name):
         kodi_display_status_message(st_dic)
         return
 
+    # --- Paged rendering ---
+    page_size = cfg.settings['display_page_size']
+    if page_size > 0:
+        if db_catalog_index_exists(cfg):
+            render_catalog_parent_page(cfg, catalog_name, category_name, page, page_size)
+            return
+        log_warning('Catalog page index not found. Rebuild the MAME catalogs to enable paging.')
+
+    # --- Render from the view cache ---
+    if db_view_cache_enabled(cfg):
+        if render_catalog_parent_view(cfg, catalog_name, category_name): return
+        log_warning('View cache not found. Rebuild the MAME render and asset caches.')
+
+    # --- Render from the AML service ---
+    # The payload and view cache files are faster than the service, which only avoids
+    # loading the databases. See dev-core/benchmark_service.py.
+    if cfg.settings['service_enabled']:
+        if render_catalog_parent_service(cfg, catalog_name, category_name): return
+        log_warning('AML service not available. Reading databases from disk.')
+
     # --- Load main MAME info databases and catalog ---
     l_cataloged_dic_start = time.time()
     if view_mode_property == VIEW_MODE_PCLONE:
@@ -2184,6 +2345,184 @@ def render_catalog_parent_list(cfg, catalog_name, category_name):
     log_debug('Commit time      {0:.4f} s'.format(commit_time))
     log_debug('Total time       {0:.4f} s'.format(total_time))
 
+#
+# Renders a list of parent MAME machines (or all machines in flat mode) using the view cache.
+# The static part of the rows is stored in a payload cache file for the current display
+# settings, built from the view cache the first time the category is rendered. Only the
+# display_hide_* filters and the Favourite marker are applied here.
+# Returns False if the view cache file does not exist.
+#
+def render_catalog_parent_view(cfg, catalog_name, category_name):
+    # --- Load payload cache, build it if necessary ---
+    loading_ticks_start = time.time()
+    payload_FN = render_get_payload_cache_FN(cfg, catalog_name, category_name)
+    if payload_FN.exists():
+        payload_dic = utils_load_JSON_file(payload_FN.getPath())
+    else:
+        log_debug('render_catalog_parent_view() Building payload cache "{}"'.format(payload_FN.getPath()))
+        view_dic = db_get_view_cache_row(cfg, catalog_name, category_name)
+        if view_dic is None: return False
+        payload_dic = render_build_payload_cache(cfg, catalog_name, category_name, view_dic)
+        utils_write_JSON_file(payload_FN.getPath(), payload_dic, verbose = False)
+    loading_time = time.time() - loading_ticks_start
+    render_catalog_payload(cfg, catalog_name, category_name, payload_dic, loading_time)
+
+    return True
+
+#
+# Renders a list of parent MAME machines (or all machines in flat mode) using the view
+# dictionary returned by the AML service. Returns False if the service is not available.
+# Used when the view cache is disabled, so the payload is not written to the payload cache,
+# which is only cleaned when the view cache is rebuilt.
+#
+def render_catalog_parent_service(cfg, catalog_name, category_name):
+    loading_ticks_start = time.time()
+    view_dic = service_client_get_view(cfg, catalog_name, category_name)
+    if view_dic is None: return False
+    loading_time = time.time() - loading_ticks_start
+    log_debug('render_catalog_parent_service() View received in {0:.4f} s'.format(loading_time))
+    payload_dic = render_build_payload_cache(cfg, catalog_name, category_name, view_dic)
+    render_catalog_payload(cfg, catalog_name, category_name, payload_dic, loading_time)
+
+    return True
+
+# Filters, processes and commits the rows of a payload dictionary.
+# See render_build_payload_cache().
+def render_catalog_payload(cfg, catalog_name, category_name, payload_dic, loading_time):
+    view_mode_property = cfg.settings['mame_view_mode']
+    loading_ticks_start = time.time()
+    fav_machines = utils_load_JSON_file(cfg.FAV_MACHINES_PATH.getPath())
+    loading_time += time.time() - loading_ticks_start
+
+    # --- Process ROMs for rendering ---
+    processing_ticks_start = time.time()
+    f_settings = render_get_filter_settings(cfg, catalog_name, category_name)
+    if view_mode_property == VIEW_MODE_PCLONE:
+        machine_name_list = payload_dic['parents']
+    else:
+        machine_name_list = payload_dic['all']
+    r_list = []
+    for m_name in machine_name_list:
+        payload = payload_dic['payload'][m_name]
+        if render_is_machine_filtered(f_settings, payload['filter']): continue
+        r_list.append(render_process_machine_dynamic(payload, fav_machines))
+    processing_time = time.time() - processing_ticks_start
+
+    # --- Commit ROMs ---
+    commit_ticks_start = time.time()
+    set_Kodi_all_sorting_methods(cfg)
+    render_commit_machines(cfg, r_list)
+    xbmcplugin.endOfDirectory(cfg.addon_handle, succeeded = True, cacheToDisc = False)
+    commit_time = time.time() - commit_ticks_start
+
+    # DEBUG Data loading/rendering statistics.
+    total_time = loading_time + processing_time + commit_time
+    log_debug('Loading time     {0:.4f} s'.format(loading_time))
+    log_debug('Processing time  {0:.4f} s'.format(processing_time))
+    log_debug('Commit time      {0:.4f} s'.format(commit_time))
+    log_debug('Total time       {0:.4f} s'.format(total_time))
+
+# The static payload depends on the display settings, on the plugin URL and on the addon
+# version. There is one payload cache file for each combination.
+def render_get_payload_cache_FN(cfg, catalog_name, category_name):
+    sig_str = '{} {} {} {} {} {}'.format(cfg.addon.info_version, g_base_url,
+        cfg.settings['display_MAME_flags'], cfg.settings['display_hide_trailers'],
+        cfg.mame_icon, cfg.mame_fanart)
+    sig_hash = hashlib.md5(sig_str.encode('utf-8')).hexdigest()
+    hash_str = db_cache_get_key(catalog_name, category_name)
+
+    return cfg.CACHE_DIR.pjoin('{}_{}_payload.json'.format(hash_str, sig_hash))
+
+#
+# payload_dic = {
+#     'all' : [ machine_name, ... ],     Machines in flat mode.
+#     'parents' : [ machine_name, ... ], Machines in parent/clone mode.
+#     'payload' : { machine_name : render_process_machine_static(), ... },
+# }
+#
+def render_build_payload_cache(cfg, catalog_name, category_name, view_dic):
+    payload_dic = {
+        'all' : list(view_dic['all']),
+        'parents' : view_dic['parents'],
+        'payload' : {},
+    }
+    for m_name in view_dic['all']:
+        num_clones = len(view_dic['pclone'][m_name]) if m_name in view_dic['pclone'] else 0
+        row_dic = view_dic['rows'][m_name]
+        payload_dic['payload'][m_name] = render_process_machine_static(cfg, m_name,
+            view_dic['all'][m_name], row_dic, row_dic, catalog_name, category_name, True, num_clones)
+
+    return payload_dic
+
+#
+# Renders one page of a list of parent MAME machines (or all machines in flat mode).
+# Only the machines of the page are read from the indexed database. If there are more
+# machines in the category a "Next page" item is added at the end of the list.
+#
+def render_catalog_parent_page(cfg, catalog_name, category_name, page, page_size):
+    log_debug('render_catalog_parent_page() page {} (page size {})'.format(page, page_size))
+    view_mode_property = cfg.settings['mame_view_mode']
+
+    # --- Load the machines of the page ---
+    loading_ticks_start = time.time()
+    (page_list, num_items) = db_get_catalog_page(cfg, catalog_name, category_name,
+        view_mode_property, page, page_size)
+    machine_name_list = [page_tuple[0] for page_tuple in page_list]
+    render_db_dic = db_index_get_rows(cfg, 'machines', machine_name_list)
+    assets_db_dic = db_index_get_rows(cfg, 'assets', machine_name_list)
+    fav_machines = utils_load_JSON_file(cfg.FAV_MACHINES_PATH.getPath())
+    loading_time = time.time() - loading_ticks_start
+
+    # --- Check if catalog is empty ---
+    if num_items == 0:
+        kodi_dialog_OK('Catalog is empty. Check out "Setup addon" in the context menu.')
+        xbmcplugin.endOfDirectory(cfg.addon_handle, succeeded = True, cacheToDisc = False)
+        return
+
+    # --- Process ROMs for rendering ---
+    processing_ticks_start = time.time()
+    page_catalog_dic = {category_name : {}}
+    page_pclone_dic = {}
+    for (m_name, render_name, clone_list) in page_list:
+        if m_name not in render_db_dic or m_name not in assets_db_dic:
+            log_warning('Machine "{}" not found in the indexed database. Skipping.'.format(m_name))
+            continue
+        page_catalog_dic[category_name][m_name] = render_name
+        if clone_list: page_pclone_dic[m_name] = clone_list
+    r_list = render_process_machines(cfg, page_catalog_dic, catalog_name, category_name,
+        render_db_dic, assets_db_dic, fav_machines, True, page_pclone_dic, False)
+    processing_time = time.time() - processing_ticks_start
+
+    # --- Commit ROMs ---
+    commit_ticks_start = time.time()
+    set_Kodi_all_sorting_methods(cfg)
+    render_commit_machines(cfg, r_list)
+    num_pages = (num_items + page_size - 1) // page_size
+    if page + 1 < num_pages:
+        render_catalog_next_page_row(cfg, catalog_name, category_name, page, num_pages)
+    xbmcplugin.endOfDirectory(cfg.addon_handle, succeeded = True, cacheToDisc = False)
+    commit_time = time.time() - commit_ticks_start
+
+    # DEBUG Data loading/rendering statistics.
+    total_time = loading_time + processing_time + commit_time
+    log_debug('Page {} of {}, {} machines in category'.format(page + 1, num_pages, num_items))
+    log_debug('Loading time     {0:.4f} s'.format(loading_time))
+    log_debug('Processing time  {0:.4f} s'.format(processing_time))
+    log_debug('Commit time      {0:.4f} s'.format(commit_time))
+    log_debug('Total time       {0:.4f} s'.format(total_time))
+
+# SpecialSort keeps the item at the end of the list whatever the sorting method.
+def render_catalog_next_page_row(cfg, catalog_name, category_name, page, num_pages):
+    ICON_OVERLAY = 6
+    title_str = '[COLOR orange]Next page ({} of {})[/COLOR]'.format(page + 2, num_pages)
+    plot_str = 'Catalog {}\nCategory {}'.format(catalog_name, category_name)
+    listitem = xbmcgui.ListItem(title_str)
+    listitem.setInfo('video', {'title' : title_str, 'plot' : plot_str, 'overlay' : ICON_OVERLAY})
+    listitem.setArt({'icon' : cfg.ICON_FILE_PATH.getPath(), 'fanart' : cfg.FANART_FILE_PATH.getPath()})
+    listitem.setProperty('SpecialSort', 'bottom')
+    URL = misc_url_3_arg('catalog', catalog_name, 'category', category_name, 'page', text_type(page + 1))
+    xbmcplugin.addDirectoryItem(cfg.addon_handle, URL, listitem, isFolder = True)
+
 #
 # Renders a list of MAME Clone machines (including parent).
 # No need to check for DB existance here. If this function is called is because parents and
@@ -2276,14 +2615,7 @@ def render_process_machines(cfg, catalog_dic, catalog_name, category_name,
     render_db_dic, assets_dic, fav_machines,
     flag_parent_list = False, main_pclone_dic = None, flag_ignore_filters = True):
     # Prepare for processing.
-    display_hide_Mature = cfg.settings['display_hide_Mature']
-    display_hide_BIOS = cfg.settings['display_hide_BIOS']
-    if catalog_name == 'None' and category_name == 'BIOS': display_hide_BIOS = False
-    display_hide_nonworking = cfg.settings['display_hide_nonworking']
-    display_hide_imperfect  = cfg.settings['display_hide_imperfect']
-    display_rom_available = cfg.settings['display_rom_available']
-    display_chd_available = cfg.settings['display_chd_available']
-    display_MAME_flags = cfg.settings['display_MAME_flags']
+    f_settings = render_get_filter_settings(cfg, catalog_name, category_name)
 
     # --- Traverse machines ---
     r_list = []
@@ -2293,130 +2625,184 @@ def render_process_machines(cfg, catalog_dic, catalog_name, category_name,
         machine = render_db_dic[machine_name]
         m_assets = assets_dic[machine_name]
         if not flag_ignore_filters:
-            if display_hide_Mature and machine['isMature']: continue
-            if display_hide_BIOS and machine['isBIOS']: continue
-            if display_hide_nonworking and machine['driver_status'] == 'preliminary': continue
-            if display_hide_imperfect and machine['driver_status'] == 'imperfect': continue
-            if display_rom_available and m_assets['flags'][0] == 'r': continue
-            if display_chd_available and m_assets['flags'][1] == 'c': continue
-
-        # Add machine/ROM to list, set default values.
-        r_dict = {}
-        r_dict['m_name'] = machine_name
+            filter_dic = render_get_filter_dic(machine, m_assets)
+            if render_is_machine_filtered(f_settings, filter_dic): continue
+
         # main_pclone_dic and num_clones only used when rendering parents.
         if flag_parent_list:
             num_clones = len(main_pclone_dic[machine_name]) if machine_name in main_pclone_dic else 0
+        else:
+            num_clones = 0
+        payload = render_process_machine_static(cfg, machine_name, render_name, machine, m_assets,
+            catalog_name, category_name, flag_parent_list, num_clones)
+        r_list.append(render_process_machine_dynamic(payload, fav_machines))
 
-        # Render machine name string and compute properties --------------------------------------
-        display_name = render_name
-        AEL_InFav_bool_value = AEL_INFAV_BOOL_VALUE_FALSE
-        AEL_PClone_stat_value = AEL_PCLONE_STAT_VALUE_NONE
-        if display_MAME_flags:
-            # Mark Flags, BIOS, Devices, BIOS, Parent/Clone and Driver status.
-            flags_str = ' [COLOR skyblue]{}[/COLOR]'.format(m_assets['flags'])
-            if machine['isBIOS']: flags_str += ' [COLOR cyan][BIOS][/COLOR]'
-            if machine['isDevice']: flags_str += ' [COLOR violet][Dev][/COLOR]'
-            if machine['driver_status'] == 'imperfect':
-                flags_str += ' [COLOR yellow][Imp][/COLOR]'
-            elif machine['driver_status'] == 'preliminary':
-                flags_str += ' [COLOR red][Pre][/COLOR]'
+    return r_list
+
+# The display_hide_* settings are the dynamic part of the rendering of machine lists,
+# together with the MAME Favourites.
+def render_get_filter_settings(cfg, catalog_name, category_name):
+    f_settings = {
+        'display_hide_Mature' : cfg.settings['display_hide_Mature'],
+        'display_hide_BIOS' : cfg.settings['display_hide_BIOS'],
+        'display_hide_nonworking' : cfg.settings['display_hide_nonworking'],
+        'display_hide_imperfect' : cfg.settings['display_hide_imperfect'],
+        'display_rom_available' : cfg.settings['display_rom_available'],
+        'display_chd_available' : cfg.settings['display_chd_available'],
+    }
+    if catalog_name == 'None' and category_name == 'BIOS': f_settings['display_hide_BIOS'] = False
+
+    return f_settings
+
+def render_get_filter_dic(machine, m_assets):
+    return {
+        'isMature' : machine['isMature'],
+        'isBIOS' : machine['isBIOS'],
+        'driver_status' : machine['driver_status'],
+        'flags' : m_assets['flags'],
+    }
+
+def render_is_machine_filtered(f_settings, filter_dic):
+    if f_settings['display_hide_Mature'] and filter_dic['isMature']: return True
+    if f_settings['display_hide_BIOS'] and filter_dic['isBIOS']: return True
+    if f_settings['display_hide_nonworking'] and filter_dic['driver_status'] == 'preliminary': return True
+    if f_settings['display_hide_imperfect'] and filter_dic['driver_status'] == 'imperfect': return True
+    if f_settings['display_rom_available'] and filter_dic['flags'][0] == 'r': return True
+    if f_settings['display_chd_available'] and filter_dic['flags'][1] == 'c': return True
+
+    return False
+
+# Computes the part of a machine row that only changes when the databases or the display
+# settings change. The Favourite marker is inserted between 'name_pre' and 'name_post'
+# by render_process_machine_dynamic().
+def render_process_machine_static(cfg, machine_name, render_name, machine, m_assets,
+    catalog_name, category_name, flag_parent_list, num_clones):
+    payload = {}
+    payload['m_name'] = machine_name
+    payload['filter'] = render_get_filter_dic(machine, m_assets)
+
+    # Render machine name string and compute properties --------------------------------------
+    if cfg.settings['display_MAME_flags']:
+        # Mark Flags, BIOS, Devices, BIOS, Parent/Clone and Driver status.
+        flags_str = ' [COLOR skyblue]{}[/COLOR]'.format(m_assets['flags'])
+        if machine['isBIOS']: flags_str += ' [COLOR cyan][BIOS][/COLOR]'
+        if machine['isDevice']: flags_str += ' [COLOR violet][Dev][/COLOR]'
+        if machine['driver_status'] == 'imperfect':
+            flags_str += ' [COLOR yellow][Imp][/COLOR]'
+        elif machine['driver_status'] == 'preliminary':
+            flags_str += ' [COLOR red][Pre][/COLOR]'
+    else:
+        flags_str = ''
+    if flag_parent_list and num_clones > 0:
+        # All machines here are parents. Mark number of clones.
+        payload['name_pre'] = render_name + ' [COLOR orange] ({} clones)[/COLOR]'.format(num_clones) + flags_str
+        payload['name_post'] = ''
+        AEL_PClone_stat_value = AEL_PCLONE_STAT_VALUE_PARENT
+    else:
+        payload['name_pre'] = render_name + flags_str
+        if machine['cloneof']:
+            payload['name_post'] = ' [COLOR orange][Clo][/COLOR]'
+            AEL_PClone_stat_value = AEL_PCLONE_STAT_VALUE_CLONE
         else:
-            flags_str = ''
-        if flag_parent_list and num_clones > 0:
-            # All machines here are parents. Mark number of clones.
-            display_name += ' [COLOR orange] ({} clones)[/COLOR]'.format(num_clones)
-            # Machine flags.
-            if flags_str: display_name += flags_str
-            # Skin flags.
-            if machine_name in fav_machines:
-                display_name += ' [COLOR violet][Fav][/COLOR]'
-                AEL_InFav_bool_value = AEL_INFAV_BOOL_VALUE_TRUE
+            payload['name_post'] = ''
             AEL_PClone_stat_value = AEL_PCLONE_STAT_VALUE_PARENT
-        else:
-            if flags_str: display_name += flags_str
-            if machine_name in fav_machines:
-                display_name += ' [COLOR violet][Fav][/COLOR]'
-                AEL_InFav_bool_value = AEL_INFAV_BOOL_VALUE_TRUE
-            if machine['cloneof']:
-                display_name += ' [COLOR orange][Clo][/COLOR]'
-                AEL_PClone_stat_value = AEL_PCLONE_STAT_VALUE_CLONE
-            else:
-                AEL_PClone_stat_value = AEL_PCLONE_STAT_VALUE_PARENT
-
-        # Make all the infolabels compatible with Advanced Emulator Launcher
-        ICON_OVERLAY = 6
-        r_dict['render_name'] = display_name
-        r_dict['info'] = {
-            'title' : display_name,
-            'year' : machine['year'],
-            'genre' : machine['genre'],
-            'studio' : machine['manufacturer'],
-            'plot' : m_assets['plot'],
-            'overlay' : ICON_OVERLAY,
-        }
-        if not cfg.settings['display_hide_trailers']:
-            r_dict['info']['trailer'] = m_assets['trailer']
-
-        # Assets/artwork -------------------------------------------------------------------------
-        icon_path      = m_assets[cfg.mame_icon] if m_assets[cfg.mame_icon] else 'DefaultProgram.png'
-        fanart_path    = m_assets[cfg.mame_fanart]
-        banner_path    = m_assets['marquee']
-        clearlogo_path = m_assets['clearlogo']
-        poster_path    = m_assets['3dbox'] if m_assets['3dbox'] else m_assets['flyer']
-        r_dict['art'] = {
-            'title' : m_assets['title'],
-            'snap' : m_assets['snap'],
-            'boxfront' : m_assets['cabinet'],
-            'boxback' : m_assets['cpanel'],
-            'cartridge' : m_assets['PCB'],
-            'flyer' : m_assets['flyer'],
-            '3dbox' : m_assets['3dbox'],
-            'icon' : icon_path,
-            'fanart' : fanart_path,
-            'banner' : banner_path,
-            'clearlogo' : clearlogo_path,
-            'poster' : poster_path,
-        }
-
-        # Properties -----------------------------------------------------------------------------
-        r_dict['props'] = {
-            'nplayers' : machine['nplayers'],
-            'platform' : 'MAME',
-            'history' : m_assets['history'],
-            AEL_PCLONE_STAT_LABEL : AEL_PClone_stat_value,
-            AEL_INFAV_BOOL_LABEL : AEL_InFav_bool_value,
-        }
-
-        # Context menu ---------------------------------------------------------------------------
-        URL_view_DAT = misc_url_2_arg_RunPlugin('command', 'VIEW_DAT', 'machine', machine_name)
-        URL_view     = misc_url_2_arg_RunPlugin('command', 'VIEW', 'machine', machine_name)
-        URL_fav      = misc_url_2_arg_RunPlugin('command', 'ADD_MAME_FAV', 'machine', machine_name)
-        if flag_parent_list and num_clones > 0:
-            URL_clones = misc_url_4_arg_RunPlugin('command', 'EXEC_SHOW_MAME_CLONES',
-                'catalog', catalog_name, 'category', category_name, 'parent', machine_name)
-            commands = [
-                ('Info / Utils', URL_view_DAT),
-                ('View / Audit', URL_view),
-                ('Show clones', URL_clones),
-                ('Add to MAME Favourites', URL_fav),
-                ('Kodi File Manager', 'ActivateWindow(filemanager)'),
-                ('AML addon settings', 'Addon.OpenSettings({})'.format(cfg.addon.info_id)),
-            ]
-        else:
-            commands = [
-                ('Info / Utils', URL_view_DAT),
-                ('View / Audit', URL_view),
-                ('Add to MAME Favourites', URL_fav),
-                ('Kodi File Manager', 'ActivateWindow(filemanager)'),
-                ('AML addon settings', 'Addon.OpenSettings({})'.format(cfg.addon.info_id)),
-            ]
-        r_dict['context'] = commands
 
-        # Create URL and add row to the list -----------------------------------------------------
-        r_dict['URL'] = misc_url_2_arg('command', 'LAUNCH', 'machine', machine_name)
-        r_list.append(r_dict)
+    # Make all the infolabels compatible with Advanced Emulator Launcher
+    # The title is set in render_process_machine_dynamic().
+    ICON_OVERLAY = 6
+    payload['info'] = {
+        'year' : machine['year'],
+        'genre' : machine['genre'],
+        'studio' : machine['manufacturer'],
+        'plot' : m_assets['plot'],
+        'overlay' : ICON_OVERLAY,
+    }
+    if not cfg.settings['display_hide_trailers']:
+        payload['info']['trailer'] = m_assets['trailer']
 
-    return r_list
+    # Assets/artwork -------------------------------------------------------------------------
+    icon_path      = m_assets[cfg.mame_icon] if m_assets[cfg.mame_icon] else 'DefaultProgram.png'
+    fanart_path    = m_assets[cfg.mame_fanart]
+    banner_path    = m_assets['marquee']
+    clearlogo_path = m_assets['clearlogo']
+    poster_path    = m_assets['3dbox'] if m_assets['3dbox'] else m_assets['flyer']
+    payload['art'] = {
+        'title' : m_assets['title'],
+        'snap' : m_assets['snap'],
+        'boxfront' : m_assets['cabinet'],
+        'boxback' : m_assets['cpanel'],
+        'cartridge' : m_assets['PCB'],
+        'flyer' : m_assets['flyer'],
+        '3dbox' : m_assets['3dbox'],
+        'icon' : icon_path,
+        'fanart' : fanart_path,
+        'banner' : banner_path,
+        'clearlogo' : clearlogo_path,
+        'poster' : poster_path,
+    }
+
+    # Properties -----------------------------------------------------------------------------
+    # AEL_INFAV_BOOL_LABEL is set in render_process_machine_dynamic().
+    payload['props'] = {
+        'nplayers' : machine['nplayers'],
+        'platform' : 'MAME',
+        'history' : m_assets['history'],
+        AEL_PCLONE_STAT_LABEL : AEL_PClone_stat_value,
+    }
+
+    # Context menu ---------------------------------------------------------------------------
+    URL_view_DAT = misc_url_2_arg_RunPlugin('command', 'VIEW_DAT', 'machine', machine_name)
+    URL_view     = misc_url_2_arg_RunPlugin('command', 'VIEW', 'machine', machine_name)
+    URL_fav      = misc_url_2_arg_RunPlugin('command', 'ADD_MAME_FAV', 'machine', machine_name)
+    if flag_parent_list and num_clones > 0:
+        URL_clones = misc_url_4_arg_RunPlugin('command', 'EXEC_SHOW_MAME_CLONES',
+            'catalog', catalog_name, 'category', category_name, 'parent', machine_name)
+        commands = [
+            ('Info / Utils', URL_view_DAT),
+            ('View / Audit', URL_view),
+            ('Show clones', URL_clones),
+            ('Add to MAME Favourites', URL_fav),
+            ('Kodi File Manager', 'ActivateWindow(filemanager)'),
+            ('AML addon settings', 'Addon.OpenSettings({})'.format(cfg.addon.info_id)),
+        ]
+    else:
+        commands = [
+            ('Info / Utils', URL_view_DAT),
+            ('View / Audit', URL_view),
+            ('Add to MAME Favourites', URL_fav),
+            ('Kodi File Manager', 'ActivateWindow(filemanager)'),
+            ('AML addon settings', 'Addon.OpenSettings({})'.format(cfg.addon.info_id)),
+        ]
+    payload['context'] = commands
+
+    # Create URL -----------------------------------------------------------------------------
+    payload['URL'] = misc_url_2_arg('command', 'LAUNCH', 'machine', machine_name)
+
+    return payload
+
+# Applies the MAME Favourites overlay to a static payload and returns the r_dict used by
+# render_commit_machines(). The payload dictionaries are reused, not copied.
+def render_process_machine_dynamic(payload, fav_machines):
+    if payload['m_name'] in fav_machines:
+        display_name = payload['name_pre'] + ' [COLOR violet][Fav][/COLOR]' + payload['name_post']
+        AEL_InFav_bool_value = AEL_INFAV_BOOL_VALUE_TRUE
+    else:
+        display_name = payload['name_pre'] + payload['name_post']
+        AEL_InFav_bool_value = AEL_INFAV_BOOL_VALUE_FALSE
+    payload['info']['title'] = display_name
+    payload['props'][AEL_INFAV_BOOL_LABEL] = AEL_InFav_bool_value
+    # Context menu items are lists and not tuples if the payload was loaded from JSON.
+    r_dict = {
+        'm_name' : payload['m_name'],
+        'render_name' : display_name,
+        'info' : payload['info'],
+        'props' : payload['props'],
+        'art' : payload['art'],
+        'context' : [tuple(c_item) for c_item in payload['context']],
+        'URL' : payload['URL'],
+    }
+
+    return r_dict
 
 # Renders a processed list of machines/ROMs. Basically, this function only calls the
 # Kodi API with all the precomputed values.
@@ -3223,17 +3609,15 @@ def command_context_info_utils(cfg, machine_name, SL_name, SL_ROM, location):
         # }
         # manuals_extract_pages(status_dic, man_file_FN, img_dir_FN)
 
-        # Check if JSON INFO file exists. If so, read it and compare the timestamp of the
-        # extraction of the images with the timestamp of the PDF file. Do not extract
-        # the images if the images are newer than the PDF.
+        # Check if JSON INFO file exists. If so, read it and get the pages already extracted.
+        # All the pages are extracted again if the PDF file changed.
         status_dic = manuals_check_img_extraction_needed(man_file_FN, img_dir_FN)
+        first_page, last_page = 0, status_dic['numPages']
         if status_dic['extraction_needed']:
-            # Disable PDF image extracion in Python 3 until the problems with the pdfrw library
-            # are solved.
-            if ADDON_RUNNING_PYTHON_3:
-                log_error('Image extraction from PDF files is disabled in Python 3. Exiting.')
-                kodi_dialog_OK('Image extraction from PDF files is disabled in Python 3. '
-                    'This feature will be ported to Python 3 as soon as possible.')
+            if not PYTHON_PIL_AVAILABLE:
+                log_error('PIL module not available. Exiting.')
+                kodi_dialog_OK('Image extraction from PDF files needs the PIL module. '
+                    'Install the addon script.module.pil.')
                 return
 
             log_info('Extracting images from PDF file.')
@@ -3242,15 +3626,30 @@ def command_context_info_utils(cfg, machine_name, SL_name, SL_ROM, location):
             if status_dic['abort_extraction']:
                 kodi_dialog_OK('Cannot extract images from file {}'.format(man_file_FN.getPath()))
                 return
-            manuals_get_PDF_filter_list(status_dic, man_file_FN, img_dir_FN)
 
-            # --- Extract page by page ---
+            # --- Big manuals are extracted one page range at a time ---
+            range_list = manuals_get_page_ranges(status_dic)
+            if len(range_list) > 1:
+                d_list = []
+                for r_first, r_last in range_list:
+                    r_status = 'extracted' if manuals_is_range_extracted(status_dic, r_first, r_last) else 'not extracted'
+                    d_list.append('Pages {} to {} ({})'.format(r_first + 1, r_last, r_status))
+                selected_value = xbmcgui.Dialog().select('View manual pages', d_list)
+                if selected_value < 0:
+                    manuals_close_PDF_file()
+                    return
+                first_page, last_page = range_list[selected_value]
+            else:
+                first_page, last_page = 0, status_dic['numPages']
+
+            # --- Extract the pages of the range not extracted yet ---
             pDialog = KodiProgressDialog()
-            pDialog.startProgress('Extracting manual images...', status_dic['numPages'])
-            for page_index in range(status_dic['numPages']):
+            pDialog.startProgress('Extracting manual images...', last_page - first_page)
+            for page_index in range(first_page, last_page):
                 pDialog.updateProgressInc()
+                if pDialog.isCanceled(): break
+                if status_dic['pages'][page_index]['extracted']: continue
                 manuals_extract_PDF_page(status_dic, man_file_FN, img_dir_FN, page_index)
-            manuals_close_PDF_file()
             pDialog.endProgress()
 
             # --- Create JSON INFO file ---
@@ -3259,8 +3658,12 @@ def command_context_info_utils(cfg, machine_name, SL_name, SL_ROM, location):
             log_info('Extraction of PDF images skipped.')
 
         # --- Display page images ---
-        if status_dic['numImages'] < 1:
+        start_img_FN = manuals_get_first_image_FN(status_dic, img_dir_FN, first_page)
+        if start_img_FN is None and first_page > 0:
+            start_img_FN = manuals_get_first_image_FN(status_dic, img_dir_FN, 0)
+        if start_img_FN is None:
             log_info('No images found. Nothing to show.')
+            if status_dic['extraction_needed']: manuals_close_PDF_file()
             str_list = [
                 'Cannot find images inside the {} file. '.format(status_dic['manFormat']),
                 'Check log for more details.'
@@ -3268,7 +3671,31 @@ def command_context_info_utils(cfg, machine_name, SL_name, SL_ROM, location):
             kodi_dialog_OK(''.join(str_list))
             return
         log_info('Rendering images in "{}"'.format(img_dir_FN.getPath()))
-        xbmc.executebuiltin('SlideShow("{}",pause)'.format(img_dir_FN.getPath()))
+        log_info('First image "{}"'.format(start_img_FN.getPath()))
+        xbmc.executebuiltin('SlideShow("{}",pause,beginslide="{}")'.format(
+            img_dir_FN.getPath(), start_img_FN.getPath()))
+
+        # --- Extract the next pages while the user views the manual ---
+        prefetch_list = []
+        if status_dic['extraction_needed']:
+            for page_index in range(last_page, status_dic['numPages']):
+                if len(prefetch_list) >= MANUALS_PREFETCH_PAGES: break
+                if not status_dic['pages'][page_index]['extracted']: prefetch_list.append(page_index)
+        if prefetch_list:
+            log_info('Prefetching {} pages'.format(len(prefetch_list)))
+            prefetch_thread = Threaded_PDF_Prefetch(status_dic, man_file_FN, img_dir_FN, prefetch_list)
+            prefetch_thread.start()
+        else:
+            prefetch_thread = None
+
+        # --- Limit the size of the extracted images of all manuals ---
+        manuals_update_cache(cfg.MANUALS_CACHE_INDEX_PATH, img_dir_FN)
+
+        if prefetch_thread:
+            prefetch_thread.join()
+            manuals_create_INFO_file(status_dic, man_file_FN, img_dir_FN)
+            manuals_update_cache(cfg.MANUALS_CACHE_INDEX_PATH, img_dir_FN)
+        if status_dic['extraction_needed']: manuals_close_PDF_file()
 
     # --- Display brother machines (same driver) ---
     elif action == ACTION_VIEW_BROTHERS:
@@ -5334,7 +5761,7 @@ def render_custom_filter_machines(cfg, filter_name):
     log_debug('render_custom_filter_machines() view_mode_property = {}'.format(view_mode_property))
 
     # Check id main DB exists.
-    if not cfg.RENDER_DB_PATH.exists():
+    if not utils_DB_file_exists(cfg.RENDER_DB_PATH.getPath()):
         kodi_dialog_OK('MAME database not found. Check out "Setup addon" in the context menu.')
         xbmcplugin.endOfDirectory(handle = cfg.addon_handle, succeeded = True, cacheToDisc = False)
         return
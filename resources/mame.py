@@ -27,8 +27,15 @@ import xbmcgui
 # --- Python standard library ---
 import binascii
 import struct
+import threading
 import xml.etree.ElementTree as ET
 import zipfile as z
+if ADDON_RUNNING_PYTHON_2:
+    import Queue as queue
+elif ADDON_RUNNING_PYTHON_3:
+    import queue
+else:
+    raise TypeError('Undefined Python runtime version.')
 
 # -------------------------------------------------------------------------------------------------
 # Data structures
@@ -1805,7 +1812,7 @@ def _mame_stat_chd(chd_path):
         return chd_info
 
     # --- Check CHD magic string to skip fake files ---
-    if chd_data_str[0:8] != 'MComprHD':
+    if chd_data_str[0:8] != b'MComprHD':
         if __debug_this_function: log_debug('_mame_stat_chd() Magic string not found!')
         chd_info['status'] = CHD_BAD_CHD
         return chd_info
@@ -1841,9 +1848,9 @@ def _mame_stat_chd(chd_path):
         logicalbytes = t[6]
         metaoffset   = t[7]
         hunkbytes    = t[8]
-        rawsha1      = binascii.b2a_hex(t[9])
-        sha1         = binascii.b2a_hex(t[10])
-        parentsha1   = binascii.b2a_hex(t[11])
+        rawsha1      = binascii.b2a_hex(t[9]).decode('ascii')
+        sha1         = binascii.b2a_hex(t[10]).decode('ascii')
+        parentsha1   = binascii.b2a_hex(t[11]).decode('ascii')
 
         if __debug_this_function:
             log_debug('V4 header size = {}'.format(header_size))
@@ -1878,9 +1885,9 @@ def _mame_stat_chd(chd_path):
         metaoffset    = t[6]
         hunkbytes     = t[7]
         unitbytes     = t[8]
-        rawsha1       = binascii.b2a_hex(t[9])
-        sha1          = binascii.b2a_hex(t[10])
-        parentsha1    = binascii.b2a_hex(t[11])
+        rawsha1       = binascii.b2a_hex(t[9]).decode('ascii')
+        sha1          = binascii.b2a_hex(t[10]).decode('ascii')
+        parentsha1    = binascii.b2a_hex(t[11]).decode('ascii')
 
         if __debug_this_function:
             log_debug('V5 header size = {}'.format(header_size))
@@ -3077,7 +3084,207 @@ def mame_build_SL_plots(cfg, SL_dic):
 ZIP_NOT_FOUND = 0
 BAD_ZIP_FILE  = 1
 ZIP_FILE_OK   = 2
-def mame_audit_MAME_machine(cfg, rom_list, audit_dic):
+
+# ZIP/CHD audit index shared by all the machines audited in one run. Parent and BIOS
+# ZIP files (neogeo.zip, cps2.zip, ...) are used by many machines. With a global index each
+# ZIP file is opened and its central directory read only once per audit.
+#
+# The index is persistent and is saved to cfg.AUDIT_INDEX_PATH after every MAME and SL audit.
+# Each archive has a stat fingerprint (mtime and size). In the next audit, archives whose
+# fingerprint did not change are not read again, only stat'ed.
+#
+# a_index = {
+#     'zip' : {
+#         'zip_path' : {
+#             'status' : ZIP_NOT_FOUND, BAD_ZIP_FILE, ZIP_FILE_OK,
+#             'mtime' : float,
+#             'size' : int,
+#             'files' : {
+#                 'fname' : {'size' : int, 'crc' : text_type},
+#                 'fname' : {'size' : int, 'crc' : text_type}, ...
+#             }
+#         }, ...
+#     },
+#     'chd' : {
+#         'chd_path' : {
+#             'mtime' : float,
+#             'size' : int,
+#             'chd_info' : chd_info dictionary returned by _mame_stat_chd(),
+#         }, ...
+#     },
+#     'checked' : set(), Archives stat'ed in this audit. Not saved.
+#     'num_read' : int, Archives read in this audit. Not saved.
+#     'lock' : threading.Lock(), Protects num_read when the index is read by several threads.
+# }
+#
+# Missing archives are not saved. They must be stat'ed again in every audit anyway.
+# Archives deleted or renamed since they were indexed are removed when saving the index.
+AUDIT_INDEX_VERSION = 1
+
+def mame_audit_new_index():
+    return {'zip' : {}, 'chd' : {}, 'checked' : set(), 'num_read' : 0, 'lock' : threading.Lock()}
+
+def mame_audit_load_index(cfg):
+    a_index = mame_audit_new_index()
+    if not cfg.AUDIT_INDEX_PATH.exists(): return a_index
+    index_dic = utils_load_JSON_file(cfg.AUDIT_INDEX_PATH.getPath())
+    if 'version' not in index_dic or index_dic['version'] != AUDIT_INDEX_VERSION:
+        log_info('mame_audit_load_index() Audit index version mismatch. Index discarded.')
+        return a_index
+    a_index['zip'] = index_dic['zip']
+    a_index['chd'] = index_dic['chd']
+    log_info('mame_audit_load_index() {:,} ZIP files and {:,} CHD files in the audit index'.format(
+        len(a_index['zip']), len(a_index['chd'])))
+
+    return a_index
+
+# The MAME and SL audits share the index and an audit can be canceled, so archives not
+# checked in this audit are not removed from the index unless they do not exist any more.
+def mame_audit_save_index(cfg, a_index):
+    num_pruned = 0
+    zip_dic = {}
+    for zip_path, z_entry in a_index['zip'].items():
+        if z_entry['status'] == ZIP_NOT_FOUND: continue
+        if zip_path not in a_index['checked'] and not os.path.isfile(zip_path):
+            num_pruned += 1
+            continue
+        zip_dic[zip_path] = z_entry
+    chd_dic = {}
+    for chd_path, c_entry in a_index['chd'].items():
+        if chd_path not in a_index['checked'] and not os.path.isfile(chd_path):
+            num_pruned += 1
+            continue
+        chd_dic[chd_path] = c_entry
+    index_dic = {
+        'version' : AUDIT_INDEX_VERSION,
+        'zip' : zip_dic,
+        'chd' : chd_dic,
+    }
+    utils_write_JSON_file(cfg.AUDIT_INDEX_PATH.getPath(), index_dic)
+    log_info('mame_audit_save_index() {:,} archives checked, {:,} archives read'.format(
+        len(a_index['checked']), a_index['num_read']))
+    log_info('mame_audit_save_index() {:,} deleted archives removed from the index'.format(num_pruned))
+
+def mame_audit_get_ZIP_index(a_index, zip_path):
+    if zip_path in a_index['checked']: return a_index['zip'][zip_path]
+    a_index['checked'].add(zip_path)
+    try:
+        z_stat = os.stat(zip_path)
+    except OSError:
+        a_index['zip'][zip_path] = {'status' : ZIP_NOT_FOUND, 'mtime' : 0.0, 'size' : 0, 'files' : {}}
+        return a_index['zip'][zip_path]
+    if zip_path in a_index['zip']:
+        z_entry = a_index['zip'][zip_path]
+        if z_entry['status'] != ZIP_NOT_FOUND and \
+            z_entry['mtime'] == z_stat.st_mtime and z_entry['size'] == z_stat.st_size:
+            return z_entry
+
+    # Read the ZIP central directory.
+    # NOTE CRC32 in Python is a decimal number: CRC32 4225815809
+    # However, MAME encodes it as an hexadecimal number: CRC32 0123abcd
+    # log_debug('Indexing ZIP file {}'.format(zip_path))
+    with a_index['lock']: a_index['num_read'] += 1
+    z_entry = {'status' : ZIP_FILE_OK, 'mtime' : z_stat.st_mtime, 'size' : z_stat.st_size, 'files' : {}}
+    a_index['zip'][zip_path] = z_entry
+    try:
+        zip_f = z.ZipFile(zip_path, 'r')
+    except (z.BadZipfile, IOError, OSError) as e:
+        z_entry['status'] = BAD_ZIP_FILE
+        return z_entry
+    zip_file_dic = z_entry['files']
+    for z_info in zip_f.infolist():
+        zip_file_dic[z_info.filename] = {'size' : z_info.file_size, 'crc' : '{0:08x}'.format(z_info.CRC)}
+    zip_f.close()
+
+    return z_entry
+
+# Returns None if the CHD file does not exist or the chd_info dictionary.
+def mame_audit_get_CHD_index(a_index, chd_path):
+    if chd_path in a_index['checked']:
+        return a_index['chd'][chd_path]['chd_info'] if chd_path in a_index['chd'] else None
+    a_index['checked'].add(chd_path)
+    try:
+        c_stat = os.stat(chd_path)
+    except OSError:
+        if chd_path in a_index['chd']: del a_index['chd'][chd_path]
+        return None
+    if chd_path in a_index['chd']:
+        c_entry = a_index['chd'][chd_path]
+        if c_entry['mtime'] == c_stat.st_mtime and c_entry['size'] == c_stat.st_size:
+            return c_entry['chd_info']
+    with a_index['lock']: a_index['num_read'] += 1
+    chd_info = _mame_stat_chd(chd_path)
+    a_index['chd'][chd_path] = {'mtime' : c_stat.st_mtime, 'size' : c_stat.st_size, 'chd_info' : chd_info}
+
+    return chd_info
+
+# Reading ZIP central directories and CHD headers is I/O bound, specially if the ROMs are in
+# a NAS, so the archives can be read into the audit index with several threads before
+# auditing. Each archive path is read by one thread only. The machine audit is done later
+# in the main thread with the index already filled, so results do not depend on the
+# thread scheduling.
+#
+# archive_list = [ (ROM_TYPE_ROM, zip_path), (ROM_TYPE_DISK, chd_path), ... ]
+class Threaded_Audit_Index_Reader(threading.Thread):
+    def __init__(self, a_index, job_queue, done_queue):
+        threading.Thread.__init__(self)
+        self.a_index = a_index
+        self.job_queue = job_queue
+        self.done_queue = done_queue
+        self.stop_reading = False
+
+    def run(self):
+        while not self.stop_reading:
+            try:
+                archive_type, archive_path = self.job_queue.get_nowait()
+            except queue.Empty:
+                break
+            if archive_type == ROM_TYPE_DISK:
+                mame_audit_get_CHD_index(self.a_index, archive_path)
+            else:
+                mame_audit_get_ZIP_index(self.a_index, archive_path)
+            self.done_queue.put(archive_path)
+
+# Returns True if the user canceled the dialog, False otherwise.
+def mame_audit_read_index_parallel(a_index, archive_list, num_workers, pDialog, d_text):
+    job_queue = queue.Queue()
+    done_queue = queue.Queue()
+    for archive_tuple in archive_list: job_queue.put(archive_tuple)
+    num_archives = len(archive_list)
+    log_info('mame_audit_read_index_parallel() Reading {:,} archives with {} threads'.format(
+        num_archives, num_workers))
+    start_time = time.time()
+    thread_list = []
+    for i in range(num_workers):
+        thread_list.append(Threaded_Audit_Index_Reader(a_index, job_queue, done_queue))
+    for t in thread_list: t.start()
+
+    # Update the progress dialog in the main thread while the workers read the archives.
+    audit_canceled = False
+    processed = 0
+    pDialog.startProgress(d_text, num_archives)
+    while processed < num_archives:
+        try:
+            done_queue.get(timeout = 0.1)
+            processed += 1
+            if processed % 100 == 0:
+                pDialog.updateProgress(processed, '{}\n{:,} of {:,} archives'.format(
+                    d_text, processed, num_archives))
+        except queue.Empty:
+            # A worker thread died because of an exception.
+            if not any([t.is_alive() for t in thread_list]) and done_queue.empty(): break
+        if pDialog.isCanceled():
+            audit_canceled = True
+            break
+    for t in thread_list: t.stop_reading = True
+    for t in thread_list: t.join()
+    pDialog.endProgress()
+    log_info('mame_audit_read_index_parallel() Read {:,} archives in {:.2f} s'.format(
+        processed, time.time() - start_time))
+
+    return audit_canceled
+
+def mame_audit_MAME_get_ROM_path(cfg):
     if cfg.settings['op_mode'] == OP_MODE_VANILLA:
         rom_path = cfg.settings['rom_path_vanilla']
     elif cfg.settings['op_mode'] == OP_MODE_RETRO_MAME2003PLUS:
@@ -3085,24 +3292,38 @@ def mame_audit_MAME_machine(cfg, rom_list, audit_dic):
     else:
         raise TypeError('Unknown op_mode "{}"'.format(cfg.settings['op_mode']))
 
-    # --- Cache the ROM set ZIP files and detect wrong named files by CRC ---
-    # 1) Traverse ROMs, determine the set ZIP files, open ZIP files and put ZIPs in the cache.
-    # 2) If a ZIP file is not in the cache is because the ZIP file was not found
-    # 3) z_cache_exists is used to check if the ZIP file has been found the first time or not.
-    #
-    # z_cache = {
-    #     'zip_filename' : {
-    #         'fname' : {'size' : int, 'crc' : text_type},
-    #         'fname' : {'size' : int, 'crc' : text_type}, ...
-    #     }
-    # }
-    #
-    # z_cache_status = {
-    #      'zip_filename' : ZIP_NOT_FOUND, BAD_ZIP_FILE, ZIP_FILE_OK
-    # }
-    #
+    return rom_path
+
+# Returns the archive_list of a machine. See Threaded_Audit_Index_Reader.
+def mame_audit_MAME_archive_list(cfg, rom_path, rom_list):
+    archive_list = []
+    for m_rom in rom_list:
+        split_list = m_rom['location'].split('/')
+        set_name = split_list[0]
+        if m_rom['type'] == ROM_TYPE_DISK:
+            if not m_rom['sha1']: continue
+            chd_FN = FileName(cfg.settings['chd_path']).pjoin(set_name).pjoin(split_list[1] + '.chd')
+            archive_list.append((ROM_TYPE_DISK, chd_FN.getPath()))
+        elif m_rom['type'] == ROM_TYPE_SAMPLE:
+            zip_FN = FileName(cfg.settings['samples_path']).pjoin(set_name + '.zip')
+            archive_list.append((ROM_TYPE_SAMPLE, zip_FN.getPath()))
+        else:
+            zip_FN = FileName(rom_path).pjoin(set_name + '.zip')
+            archive_list.append((ROM_TYPE_ROM, zip_FN.getPath()))
+
+    return archive_list
+
+def mame_audit_MAME_machine(cfg, rom_list, audit_dic, a_index = None):
+    rom_path = mame_audit_MAME_get_ROM_path(cfg)
+
+    # --- Resolve the ROM set ZIP files against the audit index ---
+    # 1) Traverse ROMs, determine the set ZIP files and put them in the index. The index is
+    #    shared between machines when auditing all machines, so ZIP files already indexed
+    #    are not opened again.
+    # 2) The index status tells if the ZIP file was not found or is a bad ZIP file.
+    # 3) z_cache maps the ZIP paths used by this machine to their index entries.
+    if a_index is None: a_index = mame_audit_new_index()
     z_cache = {}
-    z_cache_status = {}
     for m_rom in rom_list:
         # Skip CHDs.
         if m_rom['type'] == ROM_TYPE_DISK: continue
@@ -3115,33 +3336,9 @@ def mame_audit_MAME_machine(cfg, rom_list, audit_dic):
             zip_FN = FileName(rom_path).pjoin(set_name + '.zip')
         zip_path = zip_FN.getPath()
 
-        # ZIP file encountered for the first time. Skip ZIP files already in the cache.
-        if zip_path not in z_cache_status:
-            if zip_FN.exists():
-                # >> Scan files in ZIP file and put them in the cache
-                # log_debug('Caching ZIP file {}'.format(zip_path))
-                try:
-                    zip_f = z.ZipFile(zip_path, 'r')
-                except z.BadZipfile as e:
-                    z_cache_status[zip_path] = BAD_ZIP_FILE
-                    continue
-                # log_debug('ZIP {} files {}'.format(m_rom['location'], z_file_list))
-                zip_file_dic = {}
-                for zfile in zip_f.namelist():
-                    # >> NOTE CRC32 in Python is a decimal number: CRC32 4225815809
-                    # >> However, MAME encodes it as an hexadecimal number: CRC32 0123abcd
-                    z_info = zip_f.getinfo(zfile)
-                    z_info_file_size = z_info.file_size
-                    z_info_crc_hex_str = '{0:08x}'.format(z_info.CRC)
-                    zip_file_dic[zfile] = {'size' : z_info_file_size, 'crc' : z_info_crc_hex_str}
-                    # log_debug('ZIP CRC32 {} | CRC hex {} | size {}'.format(z_info.CRC, z_crc_hex, z_info.file_size))
-                    # log_debug('ROM CRC hex {} | size {}'.format(m_rom['crc'], 0))
-                zip_f.close()
-                z_cache[zip_path] = zip_file_dic
-                z_cache_status[zip_path] = ZIP_FILE_OK
-            else:
-                # >> Mark ZIP file as not found
-                z_cache_status[zip_path] = ZIP_NOT_FOUND
+        # ZIP file encountered for the first time in this machine.
+        if zip_path not in z_cache:
+            z_cache[zip_path] = mame_audit_get_ZIP_index(a_index, zip_path)
 
     # --- Audit ROM by ROM ---
     for m_rom in rom_list:
@@ -3160,16 +3357,14 @@ def mame_audit_MAME_machine(cfg, rom_list, audit_dic):
                 m_rom['status_colour'] = '[COLOR green]{}[/COLOR]'.format(m_rom['status'])
                 continue
 
-            # >> Test if DISK file exists
+            # >> Test if DISK file exists and check SHA1 hash (use the audit index).
             chd_FN = FileName(cfg.settings['chd_path']).pjoin(set_name).pjoin(disk_name + '.chd')
             # log_debug('chd_FN P {}'.format(chd_FN.getPath()))
-            if not chd_FN.exists():
+            chd_info = mame_audit_get_CHD_index(a_index, chd_FN.getPath())
+            if chd_info is None:
                 m_rom['status'] = AUDIT_STATUS_CHD_NO_FOUND
                 m_rom['status_colour'] = '[COLOR red]{}[/COLOR]'.format(m_rom['status'])
                 continue
-
-            # >> Open CHD file and check SHA1 hash.
-            chd_info = _mame_stat_chd(chd_FN.getPath())
             if chd_info['status'] == CHD_BAD_CHD:
                 m_rom['status'] = AUDIT_STATUS_BAD_CHD_FILE
                 m_rom['status_colour'] = '[COLOR red]{}[/COLOR]'.format(m_rom['status'])
@@ -3200,16 +3395,16 @@ def mame_audit_MAME_machine(cfg, rom_list, audit_dic):
             zip_FN = FileName(cfg.settings['samples_path']).pjoin(set_name + '.zip')
             zip_path = zip_FN.getPath()
             # log_debug('ZIP {}'.format(zip_FN.getPath()))
-            if z_cache_status[zip_path] == ZIP_NOT_FOUND:
+            if z_cache[zip_path]['status'] == ZIP_NOT_FOUND:
                 m_rom['status'] = AUDIT_STATUS_ZIP_NO_FOUND
                 m_rom['status_colour'] = '[COLOR red]{}[/COLOR]'.format(m_rom['status'])
                 continue
-            elif z_cache_status[zip_path] == BAD_ZIP_FILE:
+            elif z_cache[zip_path]['status'] == BAD_ZIP_FILE:
                 m_rom['status'] = AUDIT_STATUS_BAD_ZIP_FILE
                 m_rom['status_colour'] = '[COLOR red]{}[/COLOR]'.format(m_rom['status'])
                 continue
             # >> ZIP file is good and data was cached.
-            zip_file_dic = z_cache[zip_path]
+            zip_file_dic = z_cache[zip_path]['files']
 
             # >> At this point the ZIP file is in the cache (if it was open)
             if sample_name not in zip_file_dic:
@@ -3243,16 +3438,16 @@ def mame_audit_MAME_machine(cfg, rom_list, audit_dic):
             zip_FN = FileName(rom_path).pjoin(set_name + '.zip')
             zip_path = zip_FN.getPath()
             # log_debug('ZIP {}'.format(zip_FN.getPath()))
-            if z_cache_status[zip_path] == ZIP_NOT_FOUND:
+            if z_cache[zip_path]['status'] == ZIP_NOT_FOUND:
                 m_rom['status'] = AUDIT_STATUS_ZIP_NO_FOUND
                 m_rom['status_colour'] = '[COLOR red]{}[/COLOR]'.format(m_rom['status'])
                 continue
-            elif z_cache_status[zip_path] == BAD_ZIP_FILE:
+            elif z_cache[zip_path]['status'] == BAD_ZIP_FILE:
                 m_rom['status'] = AUDIT_STATUS_BAD_ZIP_FILE
                 m_rom['status_colour'] = '[COLOR red]{}[/COLOR]'.format(m_rom['status'])
                 continue
             # >> ZIP file is good and data was cached.
-            zip_file_dic = z_cache[zip_path]
+            zip_file_dic = z_cache[zip_path]['files']
 
             # >> At this point the ZIP file is in the cache (if it was open)
             if rom_name in zip_file_dic:
@@ -3327,11 +3522,12 @@ def mame_audit_MAME_machine(cfg, rom_list, audit_dic):
 # -------------------------------------------------------------------------------------------------
 # SL ROM/CHD audit code
 # -------------------------------------------------------------------------------------------------
-def mame_audit_SL_machine(SL_ROM_path_FN, SL_CHD_path_FN, SL_name, item_name, rom_list, audit_dic):
-    # --- Cache the ROM set ZIP files and detect wrong named files by CRC ---
+def mame_audit_SL_machine(SL_ROM_path_FN, SL_CHD_path_FN, SL_name, item_name, rom_list, audit_dic,
+    a_index = None):
+    # --- Resolve the ROM set ZIP files against the audit index ---
     # >> Look at mame_audit_MAME_machine() for comments.
+    if a_index is None: a_index = mame_audit_new_index()
     z_cache = {}
-    z_cache_status = {}
     for m_rom in rom_list:
         # >> Skip CHDs
         if m_rom['type'] == ROM_TYPE_DISK: continue
@@ -3343,54 +3539,9 @@ def mame_audit_SL_machine(SL_ROM_path_FN, SL_CHD_path_FN, SL_name, item_name, ro
         zip_FN = SL_ROM_path_FN.pjoin(SL_name).pjoin(zip_name)
         zip_path = zip_FN.getPath()
 
-        # >> ZIP file encountered for the first time. Skip ZIP files already in the cache.
-        if zip_path not in z_cache_status:
-            if zip_FN.exists():
-                # >> Scan files in ZIP file and put them in the cache
-                # log_debug('Caching ZIP file {}'.format(zip_path))
-                try:
-                    zip_f = z.ZipFile(zip_path, 'r')
-                except z.BadZipfile as e:
-                    z_cache_status[zip_path] = BAD_ZIP_FILE
-                    continue
-                # log_debug('ZIP {} files {}'.format(m_rom['location'], z_file_list))
-                zip_file_dic = {}
-                for zfile in zip_f.namelist():
-                    # >> NOTE CRC32 in Python is a decimal number: CRC32 4225815809
-                    # >> However, MAME encodes it as an hexadecimal number: CRC32 0123abcd
-                    z_info = zip_f.getinfo(zfile)
-                    z_info_file_size = z_info.file_size
-                    z_info_crc_hex_str = '{0:08x}'.format(z_info.CRC)
-                    # Unicode filenames in ZIP files cause problems later in this function.
-                    # zfile has type Unicode and it's not encoded in utf-8.
-                    # How to know encoding of ZIP files?
-                    # https://stackoverflow.com/questions/15918314/how-to-detect-string-byte-encoding/15918519
-                    try:
-                        # zfile sometimes has type Unicode, sometimes str. If type is str then
-                        # try to decode it as UTF-8.
-                        if type(zfile) == text_type:
-                            zfile_unicode = zfile
-                        else:
-                            zfile_unicode = zfile.decode('utf-8')
-                    except UnicodeDecodeError:
-                        log_error('mame_audit_SL_machine() Exception UnicodeDecodeError')
-                        log_error('type(zfile) = {}'.format(type(zfile)))
-                        log_error('SL_name "{}", item_name "{}", rom name "{}"'.format(SL_name, item_name, m_rom['name']))
-                    except UnicodeEncodeError:
-                        log_error('mame_audit_SL_machine() Exception UnicodeEncodeError')
-                        log_error('type(zfile) = {}'.format(type(zfile)))
-                        log_error('SL_name "{}", item_name "{}", rom name "{}"'.format(SL_name, item_name, m_rom['name']))
-                    else:
-                        # For now, do not add non-ASCII ROMs so the audit will fail for this ROM.
-                        zip_file_dic[zfile_unicode] = {'size' : z_info_file_size, 'crc' : z_info_crc_hex_str}
-                    # log_debug('ZIP CRC32 {} | CRC hex {} | size {}'.format(z_info.CRC, z_crc_hex, z_info.file_size))
-                    # log_debug('ROM CRC hex {} | size {}'.format(m_rom['crc'], 0))
-                zip_f.close()
-                z_cache[zip_path] = zip_file_dic
-                z_cache_status[zip_path] = ZIP_FILE_OK
-            else:
-                # >> Mark ZIP file as not found
-                z_cache_status[zip_path] = ZIP_NOT_FOUND
+        # >> ZIP file encountered for the first time in this item.
+        if zip_path not in z_cache:
+            z_cache[zip_path] = mame_audit_get_ZIP_index(a_index, zip_path)
 
     # --- Audit ROM by ROM ---
     for m_rom in rom_list:
@@ -3412,16 +3563,14 @@ def mame_audit_SL_machine(SL_ROM_path_FN, SL_CHD_path_FN, SL_name, item_name, ro
                 m_rom['status_colour'] = '[COLOR green]{}[/COLOR]'.format(m_rom['status'])
                 continue
 
-            # >> Test if DISK file exists
+            # >> Test if DISK file exists and check SHA1 hash (use the audit index).
             chd_FN = SL_CHD_path_FN.pjoin(SL_name).pjoin(item_name).pjoin(disk_name + '.chd')
             # log_debug('chd_FN P {}'.format(chd_FN.getPath()))
-            if not chd_FN.exists():
+            chd_info = mame_audit_get_CHD_index(a_index, chd_FN.getPath())
+            if chd_info is None:
                 m_rom['status'] = AUDIT_STATUS_CHD_NO_FOUND
                 m_rom['status_colour'] = '[COLOR red]{}[/COLOR]'.format(m_rom['status'])
                 continue
-
-            # >> Open CHD file and check SHA1 hash.
-            chd_info = _mame_stat_chd(chd_FN.getPath())
             if chd_info['status'] == CHD_BAD_CHD:
                 m_rom['status'] = AUDIT_STATUS_BAD_CHD_FILE
                 m_rom['status_colour'] = '[COLOR red]{}[/COLOR]'.format(m_rom['status'])
@@ -3460,16 +3609,16 @@ def mame_audit_SL_machine(SL_ROM_path_FN, SL_CHD_path_FN, SL_name, item_name, ro
             zip_FN = SL_ROM_path_FN.pjoin(SL_name).pjoin(item_name + '.zip')
             zip_path = zip_FN.getPath()
             # log_debug('zip_FN P {}'.format(zip_FN.getPath()))
-            if z_cache_status[zip_path] == ZIP_NOT_FOUND:
+            if z_cache[zip_path]['status'] == ZIP_NOT_FOUND:
                 m_rom['status'] = AUDIT_STATUS_ZIP_NO_FOUND
                 m_rom['status_colour'] = '[COLOR red]{}[/COLOR]'.format(m_rom['status'])
                 continue
-            elif z_cache_status[zip_path] == BAD_ZIP_FILE:
+            elif z_cache[zip_path]['status'] == BAD_ZIP_FILE:
                 m_rom['status'] = AUDIT_STATUS_BAD_ZIP_FILE
                 m_rom['status_colour'] = '[COLOR red]{}[/COLOR]'.format(m_rom['status'])
                 continue
             # >> ZIP file is good and data was cached.
-            zip_file_dic = z_cache[zip_path]
+            zip_file_dic = z_cache[zip_path]['files']
 
             # >> At this point the ZIP file is in the cache (if it was open)
             if rom_name in zip_file_dic:
@@ -3541,20 +3690,46 @@ def mame_audit_MAME_all(cfg, db_dic_in):
     renderdb_dic = db_dic_in['renderdb']
     audit_roms_dic = db_dic_in['audit_roms']
 
-    # Go machine by machine and audit ZIPs and CHDs. Adds new column 'status' to each ROM.
+    # Read the ZIP and CHD files into the audit index with a pool of threads. Archives
+    # already in the persistent index and not modified are not read again.
     pDialog = KodiProgressDialog()
+    a_index = mame_audit_load_index(cfg)
+    audit_canceled = False
+    num_workers = cfg.settings['audit_num_workers']
+    if num_workers > 1:
+        rom_path = mame_audit_MAME_get_ROM_path(cfg)
+        archive_set = set()
+        archive_list = []
+        for m_name in sorted(audit_roms_dic):
+            for archive_tuple in mame_audit_MAME_archive_list(cfg, rom_path, audit_roms_dic[m_name]):
+                if archive_tuple[1] in archive_set: continue
+                archive_set.add(archive_tuple[1])
+                archive_list.append(archive_tuple)
+        audit_canceled = mame_audit_read_index_parallel(a_index, archive_list, num_workers,
+            pDialog, 'Reading MAME ZIP and CHD files...')
+
+    # Go machine by machine and audit ZIPs and CHDs. Adds new column 'status' to each ROM.
     pDialog.startProgress('Auditing MAME ROMs and CHDs...', len(renderdb_dic))
     machine_audit_dic = {}
     for m_name in sorted(renderdb_dic):
         pDialog.updateProgressInc()
-        if pDialog.isCanceled(): break
+        if audit_canceled or pDialog.isCanceled():
+            audit_canceled = True
+            break
         # Only audit machine if it has ROMs. However, add all machines to machine_audit_dic.
         # audit_roms_dic[m_name] is mutable and edited inside mame_audit_MAME_machine()
         audit_dic = db_new_audit_dic()
         if m_name in audit_roms_dic:
-            mame_audit_MAME_machine(cfg, audit_roms_dic[m_name], audit_dic)
+            mame_audit_MAME_machine(cfg, audit_roms_dic[m_name], audit_dic, a_index)
         machine_audit_dic[m_name] = audit_dic
     pDialog.endProgress()
+    mame_audit_save_index(cfg, a_index)
+
+    # The statistics and reports need all the machines audited. Keep the old ones.
+    if audit_canceled:
+        log_info('mame_audit_MAME_all() Audit canceled. Statistics and reports not updated.')
+        kodi_notify_warn('MAME audit canceled')
+        return
 
     # Audit statistics.
     audit_MAME_machines_with_arch        = 0
@@ -3712,7 +3887,7 @@ def mame_audit_MAME_all(cfg, db_dic_in):
         # >> Check if audit was canceled.
         # log_debug(text_type(rom_list))
         if 'status' not in rom_list[0]:
-            report_list.append('Audit was canceled at machine {}'.format(m_name))
+            report_full_list.append('Audit was canceled at machine {}'.format(m_name))
             break
 
         # >> Machine header (in all reports).
@@ -3823,6 +3998,173 @@ def mame_audit_MAME_all(cfg, db_dic_in):
     db_safe_edit(control_dic, 't_MAME_audit', time.time())
     utils_write_JSON_file(cfg.MAIN_CONTROL_PATH.getPath(), control_dic)
 
+# Audits all the items of a Software List. Returns a SL_result dictionary with the statistics
+# and the report lines of the Software List.
+def mame_audit_SL_list(cfg, SL_name, SL_dic, SL_ROM_path_FN, SL_CHD_path_FN, a_index):
+    SL_DB_FN = cfg.SL_DB_DIR.pjoin(SL_dic['rom_DB_noext'] + '_items.json')
+    SL_AUDIT_ROMs_DB_FN = cfg.SL_DB_DIR.pjoin(SL_dic['rom_DB_noext'] + '_ROM_audit.json')
+    roms = utils_load_JSON_file(SL_DB_FN.getPath(), verbose = False)
+    audit_roms = utils_load_JSON_file(SL_AUDIT_ROMs_DB_FN.getPath(), verbose = False)
+    audit_stats = db_new_SL_audit_stats_dic()
+    report_full_list = []
+    report_good_list = []
+    report_error_list = []
+    ROM_report_good_list = []
+    ROM_report_error_list = []
+    CHD_report_good_list = []
+    CHD_report_error_list = []
+
+    # Iterate SL ROMs
+    for rom_key in sorted(roms):
+        # audit_roms_list and audit_dic are mutable and edited inside the function()
+        audit_rom_list = audit_roms[rom_key]
+        audit_dic = db_new_audit_dic()
+        mame_audit_SL_machine(SL_ROM_path_FN, SL_CHD_path_FN, SL_name, rom_key,
+            audit_rom_list, audit_dic, a_index)
+
+        # Audit statistics
+        audit_stats['audit_SL_items_runnable'] += 1
+        if audit_dic['machine_has_ROMs_or_CHDs']:
+            audit_stats['audit_SL_items_with_arch'] += 1
+            if audit_dic['machine_is_OK']: audit_stats['audit_SL_items_with_arch_OK'] += 1
+            else:                          audit_stats['audit_SL_items_with_arch_BAD'] += 1
+        else:
+            audit_stats['audit_SL_items_without_arch'] += 1
+
+        if audit_dic['machine_has_ROMs']:
+            audit_stats['audit_SL_items_with_arch_ROM'] += 1
+            if audit_dic['machine_ROMs_are_OK']: audit_stats['audit_SL_items_with_arch_ROM_OK'] += 1
+            else:                                audit_stats['audit_SL_items_with_arch_ROM_BAD'] += 1
+        else:
+            audit_stats['audit_SL_items_without_arch_ROM'] += 1
+
+        if audit_dic['machine_has_CHDs']:
+            audit_stats['audit_SL_items_with_CHD'] += 1
+            if audit_dic['machine_CHDs_are_OK']: audit_stats['audit_SL_items_with_CHD_OK'] += 1
+            else:                                audit_stats['audit_SL_items_with_CHD_BAD'] += 1
+        else:
+            audit_stats['audit_SL_items_without_CHD'] += 1
+
+        # Software/machine header.
+        # WARNING: Kodi crashes with a 22 MB text file with colours. No problem if TXT file has not colours.
+        rom = roms[rom_key]
+        cloneof = rom['cloneof']
+        head_list = []
+        if cloneof:
+            head_list.append('SL {} ROM {} (cloneof {})'.format(SL_name, rom_key, cloneof))
+        else:
+            head_list.append('SL {} ROM {}'.format(SL_name, rom_key))
+
+        # ROM/CHD report.
+        table_str = [ ['right', 'left', 'left', 'left', 'left'] ]
+        for m_rom in audit_rom_list:
+            if m_rom['type'] == ROM_TYPE_DISK:
+                table_row = [m_rom['type'], '',
+                             m_rom['sha1'][0:8], m_rom['location'], m_rom['status']]
+            else:
+                table_row = [m_rom['type'], text_type(m_rom['size']),
+                             m_rom['crc'], m_rom['location'], m_rom['status']]
+            table_str.append(table_row)
+        local_str_list = text_render_table_NO_HEADER(table_str)
+        local_str_list.append('')
+
+        # Full, ROMs and CHDs report.
+        report_full_list.extend(head_list + local_str_list)
+        if audit_dic['machine_is_OK']:
+            report_good_list.extend(head_list + local_str_list)
+        else:
+            report_error_list.extend(head_list + local_str_list)
+
+        # ROM report
+        if audit_dic['machine_has_ROMs']:
+            if audit_dic['machine_ROMs_are_OK']:
+                ROM_report_good_list.extend(head_list + local_str_list)
+            else:
+                ROM_report_error_list.extend(head_list + local_str_list)
+
+        # CHD report.
+        if audit_dic['machine_has_CHDs']:
+            if audit_dic['machine_CHDs_are_OK']:
+                CHD_report_good_list.extend(head_list + local_str_list)
+            else:
+                CHD_report_error_list.extend(head_list + local_str_list)
+
+    return {
+        'stats' : audit_stats,
+        'report_full_list' : report_full_list,
+        'report_good_list' : report_good_list,
+        'report_error_list' : report_error_list,
+        'ROM_report_good_list' : ROM_report_good_list,
+        'ROM_report_error_list' : ROM_report_error_list,
+        'CHD_report_good_list' : CHD_report_good_list,
+        'CHD_report_error_list' : CHD_report_error_list,
+    }
+
+# Audits the Software Lists in the job queue. Software Lists do not share ZIP or CHD files
+# so the threads never read the same archive.
+class Threaded_Audit_SL(threading.Thread):
+    def __init__(self, cfg, SL_index_dic, a_index, job_queue, done_queue, SL_result_dic):
+        threading.Thread.__init__(self)
+        self.cfg = cfg
+        self.SL_index_dic = SL_index_dic
+        self.a_index = a_index
+        self.job_queue = job_queue
+        self.done_queue = done_queue
+        self.SL_result_dic = SL_result_dic
+        self.SL_ROM_path_FN = FileName(cfg.settings['SL_rom_path'])
+        self.SL_CHD_path_FN = FileName(cfg.settings['SL_chd_path'])
+
+    def run(self):
+        while True:
+            try:
+                SL_name = self.job_queue.get_nowait()
+            except queue.Empty:
+                break
+            self.SL_result_dic[SL_name] = mame_audit_SL_list(self.cfg, SL_name,
+                self.SL_index_dic[SL_name], self.SL_ROM_path_FN, self.SL_CHD_path_FN, self.a_index)
+            self.done_queue.put(SL_name)
+
+# Returns SL_result_dic = { 'SL_name' : SL_result, ... }
+def mame_audit_SL_all_lists(cfg, SL_index_dic, a_index, pDialog, d_text):
+    SL_result_dic = {}
+    num_workers = min(cfg.settings['audit_num_workers'], max(len(SL_index_dic), 1))
+    log_info('mame_audit_SL_all_lists() Auditing {:,} Software Lists with {} threads'.format(
+        len(SL_index_dic), num_workers))
+    start_time = time.time()
+    pDialog.startProgress(d_text, len(SL_index_dic))
+    if num_workers <= 1:
+        SL_ROM_path_FN = FileName(cfg.settings['SL_rom_path'])
+        SL_CHD_path_FN = FileName(cfg.settings['SL_chd_path'])
+        for SL_name in sorted(SL_index_dic):
+            pDialog.updateProgressInc('{}\nSoftware List {}'.format(d_text, SL_name))
+            SL_result_dic[SL_name] = mame_audit_SL_list(cfg, SL_name, SL_index_dic[SL_name],
+                SL_ROM_path_FN, SL_CHD_path_FN, a_index)
+    else:
+        job_queue = queue.Queue()
+        done_queue = queue.Queue()
+        for SL_name in sorted(SL_index_dic): job_queue.put(SL_name)
+        thread_list = []
+        for i in range(num_workers):
+            thread_list.append(Threaded_Audit_SL(cfg, SL_index_dic, a_index,
+                job_queue, done_queue, SL_result_dic))
+        for t in thread_list: t.start()
+        processed = 0
+        while processed < len(SL_index_dic):
+            try:
+                SL_name = done_queue.get(timeout = 0.1)
+            except queue.Empty:
+                # A worker thread died because of an exception.
+                if not any([t.is_alive() for t in thread_list]) and done_queue.empty():
+                    raise TypeError('Software List audit thread failed')
+                continue
+            processed += 1
+            pDialog.updateProgress(processed, '{}\nSoftware List {}'.format(d_text, SL_name))
+        for t in thread_list: t.join()
+    pDialog.endProgress()
+    log_info('mame_audit_SL_all_lists() Audit done in {:.2f} s'.format(time.time() - start_time))
+
+    return SL_result_dic
+
 def mame_audit_SL_all(cfg, db_dic_in):
     log_debug('mame_audit_SL_all() Initialising ...')
     control_dic = db_dic_in['control_dic']
@@ -3879,109 +4221,23 @@ def mame_audit_SL_all(cfg, db_dic_in):
     #     }
     # }
 
-    # SL audit statistics.
-    audit_SL_items_runnable          = 0
-    audit_SL_items_with_arch         = 0
-    audit_SL_items_with_arch_OK      = 0
-    audit_SL_items_with_arch_BAD     = 0
-    audit_SL_items_without_arch      = 0
-    audit_SL_items_with_arch_ROM     = 0
-    audit_SL_items_with_arch_ROM_OK  = 0
-    audit_SL_items_with_arch_ROM_BAD = 0
-    audit_SL_items_without_arch_ROM  = 0
-    audit_SL_items_with_CHD          = 0
-    audit_SL_items_with_CHD_OK       = 0
-    audit_SL_items_with_CHD_BAD      = 0
-    audit_SL_items_without_CHD       = 0
-
-    # Iterate all SL databases and audit ROMs.
+    # Iterate all SL databases and audit ROMs. Software Lists are audited in parallel by a
+    # pool of threads. Results are merged in SL name order so reports are always the same.
     d_text = 'Auditing Sofware Lists ROMs and CHDs...'
     pDialog = KodiProgressDialog()
-    pDialog.startProgress(d_text, len(SL_index_dic))
-    SL_ROM_path_FN = FileName(cfg.settings['SL_rom_path'])
-    SL_CHD_path_FN = FileName(cfg.settings['SL_chd_path'])
+    a_index = mame_audit_load_index(cfg)
+    SL_result_dic = mame_audit_SL_all_lists(cfg, SL_index_dic, a_index, pDialog, d_text)
+    audit_stats = db_new_SL_audit_stats_dic()
     for SL_name in sorted(SL_index_dic):
-        pDialog.updateProgressInc('{}\nSoftware List {}'.format(d_text, SL_name))
-
-        SL_dic = SL_index_dic[SL_name]
-        SL_DB_FN = cfg.SL_DB_DIR.pjoin(SL_dic['rom_DB_noext'] + '_items.json')
-        SL_AUDIT_ROMs_DB_FN = cfg.SL_DB_DIR.pjoin(SL_dic['rom_DB_noext'] + '_ROM_audit.json')
-        roms = utils_load_JSON_file(SL_DB_FN.getPath(), verbose = False)
-        audit_roms = utils_load_JSON_file(SL_AUDIT_ROMs_DB_FN.getPath(), verbose = False)
-
-        # Iterate SL ROMs
-        for rom_key in sorted(roms):
-            # audit_roms_list and audit_dic are mutable and edited inside the function()
-            audit_rom_list = audit_roms[rom_key]
-            audit_dic = db_new_audit_dic()
-            mame_audit_SL_machine(SL_ROM_path_FN, SL_CHD_path_FN, SL_name, rom_key, audit_rom_list, audit_dic)
-
-            # Audit statistics
-            audit_SL_items_runnable += 1
-            if audit_dic['machine_has_ROMs_or_CHDs']:
-                audit_SL_items_with_arch += 1
-                if audit_dic['machine_is_OK']: audit_SL_items_with_arch_OK += 1
-                else:                          audit_SL_items_with_arch_BAD += 1
-            else:
-                audit_SL_items_without_arch += 1
-
-            if audit_dic['machine_has_ROMs']:
-                audit_SL_items_with_arch_ROM += 1
-                if audit_dic['machine_ROMs_are_OK']: audit_SL_items_with_arch_ROM_OK += 1
-                else:                                audit_SL_items_with_arch_ROM_BAD += 1
-            else:
-                audit_SL_items_without_arch_ROM += 1
-
-            if audit_dic['machine_has_CHDs']:
-                audit_SL_items_with_CHD += 1
-                if audit_dic['machine_CHDs_are_OK']: audit_SL_items_with_CHD_OK += 1
-                else:                                audit_SL_items_with_CHD_BAD += 1
-            else:
-                audit_SL_items_without_CHD += 1
-
-            # Software/machine header.
-            # WARNING: Kodi crashes with a 22 MB text file with colours. No problem if TXT file has not colours.
-            rom = roms[rom_key]
-            cloneof = rom['cloneof']
-            head_list = []
-            if cloneof:
-                head_list.append('SL {} ROM {} (cloneof {})'.format(SL_name, rom_key, cloneof))
-            else:
-                head_list.append('SL {} ROM {}'.format(SL_name, rom_key))
-
-            # ROM/CHD report.
-            table_str = [ ['right', 'left', 'left', 'left', 'left'] ]
-            for m_rom in audit_rom_list:
-                if m_rom['type'] == ROM_TYPE_DISK:
-                    table_row = [m_rom['type'], '',
-                                 m_rom['sha1'][0:8], m_rom['location'], m_rom['status']]
-                else:
-                    table_row = [m_rom['type'], text_type(m_rom['size']),
-                                 m_rom['crc'], m_rom['location'], m_rom['status']]
-                table_str.append(table_row)
-            local_str_list = text_render_table_NO_HEADER(table_str)
-            local_str_list.append('')
-
-            # Full, ROMs and CHDs report.
-            report_full_list.extend(head_list + local_str_list)
-            if audit_dic['machine_is_OK']:
-                report_good_list.extend(head_list + local_str_list)
-            else:
-                report_error_list.extend(head_list + local_str_list)
-
-            # ROM report
-            if audit_dic['machine_has_ROMs']:
-                if audit_dic['machine_ROMs_are_OK']:
-                    ROM_report_good_list.extend(head_list + local_str_list)
-                else:
-                    ROM_report_error_list.extend(head_list + local_str_list)
-
-            # CHD report.
-            if audit_dic['machine_has_CHDs']:
-                if audit_dic['machine_CHDs_are_OK']:
-                    CHD_report_good_list.extend(head_list + local_str_list)
-                else:
-                    CHD_report_error_list.extend(head_list + local_str_list)
+        SL_result = SL_result_dic[SL_name]
+        for stat_key in audit_stats: audit_stats[stat_key] += SL_result['stats'][stat_key]
+        report_full_list.extend(SL_result['report_full_list'])
+        report_good_list.extend(SL_result['report_good_list'])
+        report_error_list.extend(SL_result['report_error_list'])
+        ROM_report_good_list.extend(SL_result['ROM_report_good_list'])
+        ROM_report_error_list.extend(SL_result['ROM_report_error_list'])
+        CHD_report_good_list.extend(SL_result['CHD_report_good_list'])
+        CHD_report_error_list.extend(SL_result['CHD_report_error_list'])
     a = '*** Software Lists audit finished ***'
     report_full_list.append(a)
     report_good_list.append(a)
@@ -3990,7 +4246,7 @@ def mame_audit_SL_all(cfg, db_dic_in):
     ROM_report_error_list.append(a)
     CHD_report_good_list.append(a)
     CHD_report_error_list.append(a)
-    pDialog.endProgress()
+    mame_audit_save_index(cfg, a_index)
 
     # Write reports.
     num_items = 7
@@ -4011,19 +4267,7 @@ def mame_audit_SL_all(cfg, db_dic_in):
     pDialog.endProgress()
 
     # Update SL audit statistics.
-    db_safe_edit(control_dic, 'audit_SL_items_runnable', audit_SL_items_runnable)
-    db_safe_edit(control_dic, 'audit_SL_items_with_arch', audit_SL_items_with_arch)
-    db_safe_edit(control_dic, 'audit_SL_items_with_arch_OK', audit_SL_items_with_arch_OK)
-    db_safe_edit(control_dic, 'audit_SL_items_with_arch_BAD', audit_SL_items_with_arch_BAD)
-    db_safe_edit(control_dic, 'audit_SL_items_without_arch', audit_SL_items_without_arch)
-    db_safe_edit(control_dic, 'audit_SL_items_with_arch_ROM', audit_SL_items_with_arch_ROM)
-    db_safe_edit(control_dic, 'audit_SL_items_with_arch_ROM_OK', audit_SL_items_with_arch_ROM_OK)
-    db_safe_edit(control_dic, 'audit_SL_items_with_arch_ROM_BAD', audit_SL_items_with_arch_ROM_BAD)
-    db_safe_edit(control_dic, 'audit_SL_items_without_arch_ROM', audit_SL_items_without_arch_ROM)
-    db_safe_edit(control_dic, 'audit_SL_items_with_CHD', audit_SL_items_with_CHD)
-    db_safe_edit(control_dic, 'audit_SL_items_with_CHD_OK', audit_SL_items_with_CHD_OK)
-    db_safe_edit(control_dic, 'audit_SL_items_with_CHD_BAD', audit_SL_items_with_CHD_BAD)
-    db_safe_edit(control_dic, 'audit_SL_items_without_CHD', audit_SL_items_without_CHD)
+    for stat_key in sorted(audit_stats): db_safe_edit(control_dic, stat_key, audit_stats[stat_key])
 
     # Update timestamp and save control_dic.
     db_safe_edit(control_dic, 't_SL_audit', time.time())
@@ -4208,6 +4452,18 @@ def _update_stats(stats, machine, m_render, runnable):
             else:
                 stats['dead_parents'] += 1
 
+# String fields shared between machines in mame_build_MAME_main_database().
+# See misc_intern_str(). Fields taken from the INI files are not included because the INI
+# loaders already use one string object per category.
+MAME_INTERN_RENDER_KEYS = ['cloneof', 'year', 'manufacturer', 'driver_status']
+MAME_INTERN_MACHINE_KEYS = ['romof', 'sampleof', 'sourcefile']
+MAME_INTERN_MACHINE_LIST_KEYS = [
+    'chip_cpu_name', 'display_height', 'display_refresh', 'display_rotate', 'display_type',
+    'display_width', 'softwarelists',
+]
+MAME_INTERN_DEVICE_KEYS = ['att_type', 'att_tag', 'att_interface']
+MAME_INTERN_ROM_KEYS = ['name', 'merge', 'bios', 'crc']
+
 def mame_build_MAME_main_database(cfg, st_dic):
     # Use for debug purposes. This number must be much bigger than the actual number of machines
     # when releasing.
@@ -4372,6 +4628,7 @@ def mame_build_MAME_main_database(cfg, st_dic):
     log_info('mame_build_MAME_main_database() total_machines {:,}'.format(total_machines))
     machines, renderdb_dic, machines_roms, machines_devices = {}, {}, {}, {}
     roms_sha1_dic = {}
+    str_pool = {}
     log_info('mame_build_MAME_main_database() Parsing MAME XML file ...')
     num_iteration = 0
     for event, elem in xml_iter:
@@ -4500,7 +4757,7 @@ def mame_build_MAME_main_database(cfg, st_dic):
             # Only add valid ROMs, ignore invalid.
             if sha1:
                 rom_nonmerged_location = m_name + '/' + rom['name']
-                roms_sha1_dic[rom_nonmerged_location] = sha1
+                roms_sha1_dic[rom_nonmerged_location] = misc_intern_str(str_pool, sha1)
 
         # Check in machine has CHDs
         # A) CHD is considered valid if and only if SHA1 hash exists.
@@ -4727,6 +4984,23 @@ def mame_build_MAME_main_database(cfg, st_dic):
             if m_render['driver_status'] == 'preliminary' and not machine['input']['control_list']:
                 machine['isDead'] = True
 
+            # --- Share equal strings between machines to conserve memory ---
+            misc_intern_dic_values(str_pool, m_render, MAME_INTERN_RENDER_KEYS)
+            misc_intern_dic_values(str_pool, machine, MAME_INTERN_MACHINE_KEYS)
+            for key in MAME_INTERN_MACHINE_LIST_KEYS: misc_intern_list(str_pool, machine[key])
+            # machine['input'] is empty if the machine has no <input> tag.
+            if machine['input']:
+                for control in machine['input']['control_list']:
+                    control['type'] = misc_intern_str(str_pool, control['type'])
+                    misc_intern_list(str_pool, control['ways'])
+            for device in machine['devices']:
+                misc_intern_dic_values(str_pool, device, MAME_INTERN_DEVICE_KEYS)
+                misc_intern_dic_values(str_pool, device['instance'], ['name', 'briefname'])
+                misc_intern_list(str_pool, device['ext_names'])
+            for rom in m_roms['roms']:
+                misc_intern_dic_values(str_pool, rom, MAME_INTERN_ROM_KEYS)
+            misc_intern_list(str_pool, device_list)
+
             # --- Delete XML element once it has been processed to conserve memory ---
             elem.clear()
 
@@ -4751,6 +5025,8 @@ def mame_build_MAME_main_database(cfg, st_dic):
         if processed_machines >= STOP_AFTER_MACHINES: break
     pDialog.endProgress()
     log_info('Processed {:,} MAME XML events'.format(num_iteration))
+    log_info('Shared strings {:,}'.format(len(str_pool)))
+    del str_pool
     log_info('Processed machines {:,} ({:,} parents, {:,} clones)'.format(
         processed_machines, stats['parents'], stats['clones']))
     log_info('Dead machines      {:,} ({:,} parents, {:,} clones)'.format(
@@ -4942,10 +5218,10 @@ def mame_build_MAME_main_database(cfg, st_dic):
     db_safe_edit(control_dic, 't_MAME_DB_build', time.time())
 
     # ---------------------------------------------------------------------------------------------
-    # Build main distributed hashed database
+    # Build main indexed database
     # ---------------------------------------------------------------------------------------------
-    # This saves the hash files in the database directory.
-    # At this point the main hashed database is complete but the asset hashed DB is empty.
+    # This saves the SQLite indexed database in the addon data directory.
+    # At this point the main indexed database is complete but the asset indexed DB is empty.
     db_build_main_hashed_db(cfg, control_dic, machines, renderdb_dic)
     db_build_asset_hashed_db(cfg, control_dic, assetdb_dic)
 
@@ -5587,6 +5863,12 @@ def mame_check_before_build_MAME_catalogs(cfg, st_dic, control_dic):
 #        }, ...
 #    }
 #
+# C) Catalog count files:
+#    CATALOG_DIR/catalog_'catalog_name'_count.json. See mame_cache_index_count_list()
+#
+# D) Catalog page index:
+#    MAIN_DB_INDEX_PATH, table catalog. See db_build_catalog_index()
+#
 def mame_build_MAME_catalogs(cfg, st_dic, db_dic_in):
     control_dic = db_dic_in['control_dic']
     machines = db_dic_in['machines']
@@ -6344,6 +6626,14 @@ def mame_build_MAME_catalogs(cfg, st_dic, db_dic_in):
     db_safe_edit(control_dic, 'stats_MF_Dead_Imperfect_parents', stats_MF_Dead_Imperfect_parents)
     db_safe_edit(control_dic, 'stats_MF_Dead_Nonworking_parents', stats_MF_Dead_Nonworking_parents)
 
+    # --- Save catalog count files ---
+    for catalog_name in cache_index_dic:
+        count_list = mame_cache_index_count_list(catalog_name, cache_index_dic)
+        utils_write_JSON_file(db_get_catalog_count_FN(cfg, catalog_name).getPath(), count_list, verbose = False)
+
+    # --- Build catalog page index ---
+    db_build_catalog_index(cfg, cache_index_dic, main_pclone_dic)
+
     # --- Update timestamp ---
     db_safe_edit(control_dic, 't_MAME_Catalog_build', time.time())
 
@@ -6889,7 +7179,7 @@ def mame_check_before_build_SL_databases(cfg, st_dic, control_dic):
         kodi_set_error_status(st_dic, t)
         return
 
-    if not cfg.MAIN_DB_PATH.exists():
+    if not utils_DB_file_exists(cfg.MAIN_DB_PATH.getPath()):
         t = ('MAME Main database not found. '
             'Open AML addon settings and configure the location of the MAME executable in the '
             '"Paths" tab.')
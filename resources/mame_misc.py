@@ -259,6 +259,20 @@ def mame_cache_index_builder(cat_name, cache_index_dic, catalog_all, catalog_par
             'hash'         : hashlib.md5(key_str.encode('utf-8')).hexdigest(),
         }
 
+# Compact list of the categories of a catalog sorted by category name. Used to render the
+# catalog categories without loading the catalog JSON files.
+# count_list = [ [cat_key, num_machines, num_parents], ... ]
+def mame_cache_index_count_list(cat_name, cache_index_dic):
+    count_list = []
+    for cat_key in sorted(cache_index_dic[cat_name]):
+        count_list.append([
+            cat_key,
+            cache_index_dic[cat_name][cat_key]['num_machines'],
+            cache_index_dic[cat_name][cat_key]['num_parents'],
+        ])
+
+    return count_list
+
 # Helper functions to get the catalog key.
 def mame_catalog_key_Catver(parent_name, machines, machines_render):
     return [ machines[parent_name]['catver'] ]
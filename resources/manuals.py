@@ -35,11 +35,10 @@ from pdfrw.objects.pdfname import BasePdfName
 import io
 import pprint
 import struct
+import threading
 import time
 import types
 import zlib
-if ADDON_RUNNING_PYTHON_2:
-    import StringIO
 try:
     from PIL import Image
     PYTHON_PIL_AVAILABLE = True
@@ -64,7 +63,7 @@ def _tiff_header_for_CCITT(width, height, img_size, CCITT_group = 4):
 
     return struct.pack(
        tiff_header_struct,
-       'II',  # Byte order indication: Little endian
+       b'II',  # Byte order indication: Little endian
        42,  # Version number (always 42)
        8,  # Offset to first IFD
        8,  # Number of tags in IFD
@@ -79,6 +78,16 @@ def _tiff_header_for_CCITT(width, height, img_size, CCITT_group = 4):
        0  # last IFD
    )
 
+# pdfrw reads the PDF file as a string. In Python 3 the file is decoded with latin-1, so the
+# stream must be encoded back with latin-1 to get the original bytes.
+def _get_XObject_stream_bytes(xobj_dic):
+    if ADDON_RUNNING_PYTHON_2:
+        return xobj_dic.stream
+    elif ADDON_RUNNING_PYTHON_3:
+        return xobj_dic.stream.encode('latin-1')
+    else:
+        raise TypeError('Undefined Python runtime version.')
+
 # Extracs an image from an xobj_dic object.
 # Returns a PIL image object or None
 def _extract_image_from_XObject(xobj_dic):
@@ -119,30 +128,31 @@ def _extract_image_from_XObject(xobj_dic):
     log_debug('/Width             {}'.format(width))
 
     # NOTE /Filter = /FlateDecode may be PNG images. Check for magic number.
-    jpg_magic_number     = '\xff\xd8'
-    jp2_magic_number     = '\x00\x00\x00\x0C\x6A\x50\x20\x20\x0D\x0A\x87\x0A'
-    png_magic_number     = '\x89\x50\x4E\x47'
-    gif87_magic_number   = '\x47\x49\x46\x38\x37\x61'
-    gif89_magic_number   = '\x47\x49\x46\x38\x39\x61'
-    tiff_LE_magic_number = '\x49\x49\x2A\x00'
-    tiff_BE_magic_number = '\x4D\x4D\x00\x2A'
+    jpg_magic_number     = b'\xff\xd8'
+    jp2_magic_number     = b'\x00\x00\x00\x0C\x6A\x50\x20\x20\x0D\x0A\x87\x0A'
+    png_magic_number     = b'\x89\x50\x4E\x47'
+    gif87_magic_number   = b'\x47\x49\x46\x38\x37\x61'
+    gif89_magic_number   = b'\x47\x49\x46\x38\x39\x61'
+    tiff_LE_magic_number = b'\x49\x49\x2A\x00'
+    tiff_BE_magic_number = b'\x4D\x4D\x00\x2A'
+    stream_bytes = _get_XObject_stream_bytes(xobj_dic)
 
     # --- Check for magic numbers ---
     # See https://en.wikipedia.org/wiki/Magic_number_(programming)
     #
-    if xobj_dic.stream[0:2] == jpg_magic_number:
+    if stream_bytes[0:2] == jpg_magic_number:
         log_debug('JPEG magic number detected!')
-    elif xobj_dic.stream[0:12] == jp2_magic_number:
+    elif stream_bytes[0:12] == jp2_magic_number:
         log_debug('JPEG 2000 magic number detected!')
-    elif xobj_dic.stream[0:4] == png_magic_number:
+    elif stream_bytes[0:4] == png_magic_number:
         log_debug('PNG magic number detected!')
-    elif xobj_dic.stream[0:6] == gif87_magic_number:
+    elif stream_bytes[0:6] == gif87_magic_number:
         log_debug('GIF87a magic number detected!')
-    elif xobj_dic.stream[0:6] == gif89_magic_number:
+    elif stream_bytes[0:6] == gif89_magic_number:
         log_debug('GIF89a magic number detected!')
-    elif xobj_dic.stream[0:4] == tiff_LE_magic_number:
+    elif stream_bytes[0:4] == tiff_LE_magic_number:
         log_debug('TIFF little endian magic number detected!')
-    elif xobj_dic.stream[0:4] == tiff_BE_magic_number:
+    elif stream_bytes[0:4] == tiff_BE_magic_number:
         log_debug('TIFF big endian magic number detected!')
     else:
         log_debug('Not known image magic number')
@@ -151,31 +161,31 @@ def _extract_image_from_XObject(xobj_dic):
     img = None
     if num_filters == 1 and filter_list[0] == '/DCTDecode':
         log_debug('extract_image_from_XObject() Converting JPG into PIL IMG (/DCTDecode)')
-        memory_f = StringIO.StringIO(xobj_dic.stream)
+        memory_f = io.BytesIO(stream_bytes)
         img = Image.open(memory_f)
 
     elif num_filters == 2 and filter_list[0] == '/FlateDecode' and filter_list[1] == '/DCTDecode':
         log_debug('extract_image_from_XObject() Converting JPG into PIL IMG (/DCTDecode)')
         # First decompress /FlateDecode
-        contents_plain = zlib.decompress(xobj_dic.stream)
-        memory_f = StringIO.StringIO(contents_plain)
+        contents_plain = zlib.decompress(stream_bytes)
+        memory_f = io.BytesIO(contents_plain)
         img = Image.open(memory_f)
 
     elif num_filters == 1 and filter_list[0] == '/JPXDecode':
         log_debug('extract_image_from_XObject() Converting JPEG 2000 into PIL IMG (/JPXDecode)')
-        memory_f = StringIO.StringIO(xobj_dic.stream)
+        memory_f = io.BytesIO(stream_bytes)
         img = Image.open(memory_f)
 
     # --- RGB images with FlateDecode ---
     elif num_filters == 1 and color_space == '/DeviceRGB' and filter_list[0] == '/FlateDecode':
         log_debug('extract_image_from_XObject() Saving /DeviceRGB /FlateDecode image')
-        contents_plain = zlib.decompress(xobj_dic.stream)
+        contents_plain = zlib.decompress(stream_bytes)
         img = Image.frombytes('RGB', (width, height), contents_plain)
 
     # --- Monochrome images, 1 bit per pixel, /Filter /FlateDecode ---
     elif num_filters == 1 and color_space == '/DeviceGray' and filter_list[0] == '/FlateDecode':
         log_debug('extract_image_from_XObject() Saving monochrome /FlateDecode')
-        contents_plain = zlib.decompress(xobj_dic.stream)
+        contents_plain = zlib.decompress(stream_bytes)
         img = Image.frombytes('1', (width, height), contents_plain)
 
     # --- Monochrome images, 1 bit per pixel, /Filter /CCITTFaxDecode (TIFF) ---
@@ -199,19 +209,19 @@ def _extract_image_from_XObject(xobj_dic):
         K = int(xobj_dic['/DecodeParms']['/K'])
         if K == -1: CCITT_group = 4
         else:       CCITT_group = 3
-        img_size = len(xobj_dic.stream)
+        img_size = len(stream_bytes)
         tiff_header = _tiff_header_for_CCITT(width, height, img_size, CCITT_group)
         log_debug('img_size = {0:d}'.format(img_size))
         log_debug('CCITT_group = {0:d}'.format(CCITT_group))
         log_debug('type(tiff_header) = {}'.format(type(tiff_header)))
-        log_debug('type(xobj_dic.stream) = {}'.format(type(xobj_dic.stream)))
+        log_debug('type(stream_bytes) = {}'.format(type(stream_bytes)))
 
         # DEBUG file write
         # with io.open('test.tiff', 'wb') as img_file:
-        #     img_file.write(tiff_header + xobj_dic.stream)
+        #     img_file.write(tiff_header + stream_bytes)
 
         # Open memory file with PIL
-        # img = Image.open(StringIO.StringIO(tiff_header + xobj_dic.stream))
+        # img = Image.open(io.BytesIO(tiff_header + stream_bytes))
 
     else:
         log_debug('Unrecognised image type/filter. It cannot be extracted. Skipping.')
@@ -292,11 +302,14 @@ def manuals_extract_pages_pdfrw(status_dic, PDF_file_FN, img_dir_FN):
 # -------------------------------------------------------------------------------------------------
 # Main function to extract images
 # -------------------------------------------------------------------------------------------------
+# Pages are extracted on demand. The JSON INFO file keeps the state of every page in the
+# 'pages' list, so the pages already extracted are not extracted again. The images of
+# page page_index are named Image_page{:04d}_img{:02d}.png, see manuals_get_page_image_FN().
 #
 # Creates status_dic.
-# If JSON INFO files does not exists then rendering is needed.
-# If JSON INFO file exists, then compare manual mtime with image extraction time.
-# Returns True if extraction is needed, False otherwise.
+# If JSON INFO files does not exists, the PDF file changed or the INFO file was created by an
+# old version of AML then all the pages must be extracted and the old images are deleted.
+# status_dic['extraction_needed'] is True if some page has not been extracted yet.
 def manuals_check_img_extraction_needed(PDF_file_FN, img_dir_FN):
     log_debug('manuals_check_img_extraction_needed() Starting ...')
     status_dic = {
@@ -306,6 +319,8 @@ def manuals_check_img_extraction_needed(PDF_file_FN, img_dir_FN):
         'numImages' : 0,
         # This is a list of lists because each image can have more than 1 filter.
         'imgFilterList' : [],
+        # One dictionary per page. See manuals_new_page_dic().
+        'pages' : [],
     }
 
     # Does the JSON INFO file exists?
@@ -319,17 +334,58 @@ def manuals_check_img_extraction_needed(PDF_file_FN, img_dir_FN):
     # JSON INFO file exists. Open JSON file and check timestamps.
     info_dic = utils_load_JSON_file(info_FN.getPath())
     man_file_mtime = PDF_file_FN.getmtime()
-    if man_file_mtime > info_dic['IMG_timestamp']:
+    if 'pages' not in info_dic or man_file_mtime != info_dic['PDF_timestamp']:
+        log_info('manuals_check_img_extraction_needed() INFO file outdated')
         status_dic['extraction_needed'] = True
-        status_dic['manFormat'] = info_dic['manFormat']
-        status_dic['numPages'] = info_dic['numPages']
-        status_dic['numImages'] = info_dic['numImages']
-        status_dic['imgFilterList'] = info_dic['imgFilterList']
-    else:
-        status_dic['extraction_needed'] = False
+        return status_dic
+    status_dic['manFormat'] = info_dic['manFormat']
+    status_dic['numPages'] = info_dic['numPages']
+    status_dic['numImages'] = info_dic['numImages']
+    status_dic['imgFilterList'] = info_dic['imgFilterList']
+    status_dic['pages'] = info_dic['pages']
+    status_dic['extraction_needed'] = False
+    for page_dic in status_dic['pages']:
+        if not page_dic['extracted']:
+            status_dic['extraction_needed'] = True
+            break
 
     return status_dic
 
+def manuals_new_page_dic():
+    return {
+        'extracted' : False,
+        'numImages' : 0,
+        'imgFilterList' : [],
+    }
+
+def manuals_get_page_image_FN(img_dir_FN, page_index, img_index):
+    return img_dir_FN.pjoin('Image_page{:04d}_img{:02d}.png'.format(page_index, img_index))
+
+# Returns the path of the first image of the first page with images starting at page_index
+# or None if there are no images.
+def manuals_get_first_image_FN(status_dic, img_dir_FN, page_index):
+    for i in range(page_index, len(status_dic['pages'])):
+        if status_dic['pages'][i]['numImages'] > 0:
+            return manuals_get_page_image_FN(img_dir_FN, i, 0)
+
+    return None
+
+# Returns a list of tuples (first_page_index, last_page_index + 1) with the page ranges of
+# the manual. Big manuals are extracted one range at a time.
+def manuals_get_page_ranges(status_dic):
+    range_list = []
+    for first_page in range(0, status_dic['numPages'], MANUALS_PAGES_PER_RANGE):
+        range_list.append((first_page, min(first_page + MANUALS_PAGES_PER_RANGE, status_dic['numPages'])))
+
+    return range_list
+
+# Returns True if all the pages in the range have been extracted.
+def manuals_is_range_extracted(status_dic, first_page, last_page):
+    for page_index in range(first_page, last_page):
+        if not status_dic['pages'][page_index]['extracted']: return False
+
+    return True
+
 # Global variables for the PDF manual reader.
 PDF_reader = None
 
@@ -341,6 +397,7 @@ PDF_reader = None
 #   status_dic['manFormat'] = string  ['PDF', 'CBZ', 'CBR']
 #   status_dic['numPages'] = int
 #   status_dic['numImages'] = int
+#   status_dic['pages'] = list  Reset if the PDF file changed.
 #
 # Creates a JSON file with the timestamp of the extraction and timestamp of the manual file.
 def manuals_open_PDF_file(status_dic, PDF_file_FN, img_dir_FN):
@@ -348,6 +405,8 @@ def manuals_open_PDF_file(status_dic, PDF_file_FN, img_dir_FN):
     log_debug('manuals_open_PDF_file() Starting ...')
 
     # --- Load and parse PDF ---
+    # PdfReader() only parses the cross-reference table. PDF objects are read when used, so
+    # only the pages extracted are read.
     log_info('PDF file "{}"'.format(PDF_file_FN.getPath()))
     PDF_reader = PdfReader(PDF_file_FN.getPath())
     log_info('PDF has {} pages'.format(PDF_reader.numPages))
@@ -356,7 +415,16 @@ def manuals_open_PDF_file(status_dic, PDF_file_FN, img_dir_FN):
     status_dic['abort_extraction'] = False
     status_dic['manFormat'] = 'PDF'
     status_dic['numPages'] = PDF_reader.numPages
-    status_dic['numImages'] = 0
+
+    # --- New extraction. Delete images extracted from an old version of the PDF ---
+    if len(status_dic['pages']) != PDF_reader.numPages:
+        for img_path in img_dir_FN.scanFilesInPath('Image_page*.png'):
+            os.remove(img_path)
+        status_dic['numImages'] = 0
+        status_dic['imgFilterList'] = []
+        status_dic['pages'] = []
+        for page_index in range(PDF_reader.numPages):
+            status_dic['pages'].append(manuals_new_page_dic())
 
 def manuals_close_PDF_file():
     global PDF_reader
@@ -377,6 +445,7 @@ def manuals_create_INFO_file(status_dic, PDF_file_FN, img_dir_FN):
         'numPages' : status_dic['numPages'],
         'numImages' : status_dic['numImages'],
         'imgFilterList' : status_dic['imgFilterList'],
+        'pages' : status_dic['pages'],
         # Fields only in JSON INFO file
         'PDF_path' : PDF_file_FN.getPath(),
         'IMG_path' : img_dir_FN.getPath(),
@@ -385,7 +454,7 @@ def manuals_create_INFO_file(status_dic, PDF_file_FN, img_dir_FN):
         'IMG_timestamp' : IMG_timestamp,
         'IMG_time' : time.strftime('%a %d %b %Y %H:%M:%S', time.localtime(IMG_timestamp)),
     }
-    utils_write_JSON_file_pprint(info_FN.getPath(), info_dic)
+    utils_write_JSON_file(info_FN.getPath(), info_dic, pprint = True)
 
 # Gets a list of filters (codecs) used in the PDF file.
 # manuals_extract_PDF_page() is based on this function. In other words, this function has
@@ -459,10 +528,13 @@ def manuals_get_PDF_filter_list(status_dic, man_file_FN, img_dir_FN):
                 img_index += 1
     status_dic['imgFilterList'] = img_filter_list_list
 
-# Extracts images in a PDF page.
+# Extracts images in a PDF page and updates the page state in status_dic.
+# The filters of the images are stored in the page state, so manuals_get_PDF_filter_list()
+# is not needed.
 def manuals_extract_PDF_page(status_dic, man_file_FN, img_dir_FN, page_index):
     # --- Get page object ---
     page = PDF_reader.pages[page_index]
+    page_dic = status_dic['pages'][page_index]
 
     # --- Iterate /Resources in page ---
     image_counter = 0
@@ -500,14 +572,65 @@ def manuals_extract_PDF_page(status_dic, man_file_FN, img_dir_FN, page_index):
 
             # --- Save image ---
             if img:
-                img_basename_str = 'Image_page{0:02d}_img{1:02d}.png'.format(page_index, img_index)
-                img_path_str = img_dir_FN.pjoin(img_basename_str).getPath()
+                img_path_str = manuals_get_page_image_FN(img_dir_FN, page_index, img_index).getPath()
                 log_debug('Saving IMG "{}"'.format(img_path_str))
                 img.save(img_path_str, 'PNG')
+                page_dic['imgFilterList'].append(text_type(xobj_dic['/Filter']))
                 image_counter += 1
                 img_index += 1
             else:
                 log_warning('Error extracting image from /XObject')
     # --- Update info ---
+    page_dic['extracted'] = True
+    page_dic['numImages'] = image_counter
     status_dic['numImages'] += image_counter
+    status_dic['imgFilterList'].extend(page_dic['imgFilterList'])
     log_info('PDF page {} extracted {} images'.format(page_index, image_counter))
+
+# Extracts the pages in page_list that have not been extracted yet in a background thread,
+# while the user is viewing the manual.
+class Threaded_PDF_Prefetch(threading.Thread):
+    def __init__(self, status_dic, man_file_FN, img_dir_FN, page_list):
+        threading.Thread.__init__(self)
+        self.status_dic = status_dic
+        self.man_file_FN = man_file_FN
+        self.img_dir_FN = img_dir_FN
+        self.page_list = page_list
+
+    def run(self):
+        for page_index in self.page_list:
+            if self.status_dic['pages'][page_index]['extracted']: continue
+            manuals_extract_PDF_page(self.status_dic, self.man_file_FN, self.img_dir_FN, page_index)
+
+# -------------------------------------------------------------------------------------------------
+# Extracted images cache
+# -------------------------------------------------------------------------------------------------
+# The cache index is a dictionary { img_dir_path : { 'size' : int, 'access' : float } } with
+# the size of the images extracted from each manual and the last time the manual was viewed.
+# When the total size is bigger than MANUALS_CACHE_MAX_SIZE the images of the least recently
+# viewed manuals are deleted. The manual being viewed is never deleted.
+def manuals_update_cache(cache_index_FN, img_dir_FN):
+    cache_index = utils_load_JSON_file(cache_index_FN.getPath(), {})
+    img_dir_size = 0
+    for img_path in img_dir_FN.scanFilesInPath('Image_page*.png'):
+        img_dir_size += os.path.getsize(img_path)
+    cache_index[img_dir_FN.getPath()] = {'size' : img_dir_size, 'access' : time.time()}
+
+    cache_size = 0
+    for img_dir_path in cache_index:
+        cache_size += cache_index[img_dir_path]['size']
+    log_debug('manuals_update_cache() Cache size {:,} bytes'.format(cache_size))
+    for img_dir_path in sorted(cache_index, key = lambda x: cache_index[x]['access']):
+        if cache_size <= MANUALS_CACHE_MAX_SIZE: break
+        if img_dir_path == img_dir_FN.getPath(): continue
+        log_info('manuals_update_cache() Deleting "{}"'.format(img_dir_path))
+        old_dir_FN = FileName(img_dir_path)
+        if old_dir_FN.isdir():
+            for file_path in old_dir_FN.scanFilesInPath('Image_page*.png'):
+                os.remove(file_path)
+            # The INFO file must be deleted so the pages are extracted again.
+            for file_path in old_dir_FN.scanFilesInPath('*.json'):
+                os.remove(file_path)
+        cache_size -= cache_index[img_dir_path]['size']
+        del cache_index[img_dir_path]
+    utils_write_JSON_file(cache_index_FN.getPath(), cache_index)
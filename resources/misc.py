@@ -795,3 +795,27 @@ def misc_addon_version_str_to_int(AML_version_str):
     # log_debug('misc_addon_version_str_to_int() version_int = {}'.format(version_int))
 
     return version_int
+
+# -------------------------------------------------------------------------------------------------
+# String interning
+# -------------------------------------------------------------------------------------------------
+# Strings read from XML or INI files are new objects even if the value is the same. For example,
+# there are a few hundred different manufacturers, years or driver status strings for 40k MAME
+# machines. Replacing equal strings with the same object saves a lot of memory when building the
+# databases. str_pool is a dictionary { string : string }, Python 2 intern() does not support
+# Unicode strings. Strings shared this way are also shared when the databases are loaded from
+# pickle files, see OPTION_DB_FORMAT.
+def misc_intern_str(str_pool, s):
+    return str_pool.setdefault(s, s)
+
+# Interns the values of the dictionary keys in key_list. Values must be strings.
+def misc_intern_dic_values(str_pool, dic, key_list):
+    for key in key_list:
+        value = dic[key]
+        dic[key] = str_pool.setdefault(value, value)
+
+# Interns the strings in a list in place.
+def misc_intern_list(str_pool, str_list):
+    for i in range(len(str_list)):
+        value = str_list[i]
+        str_list[i] = str_pool.setdefault(value, value)
@@ -0,0 +1,250 @@
+# -*- coding: utf-8 -*-
+
+# Copyright (c) 2016-2020 Wintermute0110 <wintermute0110@gmail.com>
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; version 2 of the License.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.
+# See the GNU General Public License for more details.
+
+# Advanced MAME Launcher database service.
+#
+# Kodi starts a new Python interpreter for every plugin call, so the databases must be
+# loaded from disk again every time a directory is rendered. The optional AML service is
+# started by Kodi at login, keeps the MAME render and asset databases, the parent/clone
+# dictionary and the most recently used catalogs in memory and answers the plugin requests
+# over a TCP socket bound to localhost.
+#
+# Protocol: the client connects, sends one JSON object terminated by a new line and reads
+# the JSON response until the server closes the connection.
+#
+#   { 'command' : 'PING' }
+#   { 'command' : 'GET_VIEW', 'catalog' : text_type, 'category' : text_type }
+#
+# The response always has a 'status' field, 'OK' or 'ERROR'. GET_VIEW returns the
+# view dictionary of the category in the 'view' field, with the same format as the
+# view cache files. See db_build_view_cache_row().
+#
+# Reading the payload cache or the view cache files is as fast as a GET_VIEW request, so the
+# plugin only uses the service when the view cache is disabled. Then the service avoids
+# loading the render and asset databases. See dev-core/benchmark_service.py.
+#
+# The client functions do not depend on Kodi and can be used from any Python interpreter.
+
+# --- AEL packages ---
+from .constants import *
+from .utils import *
+from .db import *
+
+# --- Python standard library ---
+import collections
+import json
+import os
+import socket
+import threading
+import time
+if ADDON_RUNNING_PYTHON_2:
+    import SocketServer as socketserver
+elif ADDON_RUNNING_PYTHON_3:
+    import socketserver
+else:
+    raise TypeError('Undefined Python runtime version.')
+
+SERVICE_PROTOCOL_VERSION = 1
+SERVICE_HOST = '127.0.0.1'
+# Seconds the plugin waits for the service before reading the databases from disk.
+SERVICE_CLIENT_TIMEOUT = 5.0
+# Number of catalogs (in any view mode) kept in memory.
+SERVICE_MAX_CATALOGS = 4
+# Number of encoded GET_VIEW responses kept in memory.
+SERVICE_MAX_VIEWS = 16
+
+# -------------------------------------------------------------------------------------------------
+# Server
+# -------------------------------------------------------------------------------------------------
+# Databases are reloaded if the control dictionary changes, because every database build or
+# scan saves it.
+class Service_Database:
+    def __init__(self, cfg):
+        self.cfg = cfg
+        self.lock = threading.Lock()
+        self.control_mtime = None
+        self.renderdb_dic = {}
+        self.assetdb_dic = {}
+        self.main_pclone_dic = {}
+        self.catalog_cache = collections.OrderedDict()
+        self.view_cache = collections.OrderedDict()
+
+    # Must be called with the lock acquired.
+    def check_databases(self):
+        if not self.cfg.MAIN_CONTROL_PATH.exists(): return False
+        control_mtime = os.stat(self.cfg.MAIN_CONTROL_PATH.getPath()).st_mtime
+        if control_mtime == self.control_mtime: return True
+        log_info('Service_Database() Loading databases...')
+        t_start = time.time()
+        self.renderdb_dic = utils_load_JSON_file(self.cfg.RENDER_DB_PATH.getPath())
+        self.assetdb_dic = utils_load_JSON_file(self.cfg.ASSET_DB_PATH.getPath())
+        self.main_pclone_dic = utils_load_JSON_file(self.cfg.MAIN_PCLONE_DB_PATH.getPath())
+        self.catalog_cache = collections.OrderedDict()
+        self.view_cache = collections.OrderedDict()
+        self.control_mtime = control_mtime
+        log_info('Service_Database() Databases loaded in {:.2f} s'.format(time.time() - t_start))
+
+        return True
+
+    # Must be called with the lock acquired.
+    def get_catalog(self, catalog_name, view_mode):
+        catalog_key = (catalog_name, view_mode)
+        if catalog_key in self.catalog_cache:
+            catalog_dic = self.catalog_cache.pop(catalog_key)
+        elif view_mode == VIEW_MODE_FLAT:
+            catalog_dic = db_get_cataloged_dic_all(self.cfg, catalog_name)
+        else:
+            catalog_dic = db_get_cataloged_dic_parents(self.cfg, catalog_name)
+        self.catalog_cache[catalog_key] = catalog_dic
+        while len(self.catalog_cache) > SERVICE_MAX_CATALOGS:
+            self.catalog_cache.popitem(last = False)
+
+        return catalog_dic
+
+    # Must be called with the lock acquired.
+    def get_view(self, catalog_name, category_name):
+        catalog_all = self.get_catalog(catalog_name, VIEW_MODE_FLAT)
+        catalog_parents = self.get_catalog(catalog_name, VIEW_MODE_PCLONE)
+        if category_name not in catalog_all: return None
+        view_dic = {
+            'all' : catalog_all[category_name],
+            'parents' : list(catalog_parents[category_name]),
+            'pclone' : {},
+            'rows' : {},
+        }
+        for machine_name in view_dic['all']:
+            if machine_name in self.main_pclone_dic and self.main_pclone_dic[machine_name]:
+                view_dic['pclone'][machine_name] = self.main_pclone_dic[machine_name]
+            row_dic = self.renderdb_dic[machine_name].copy()
+            row_dic.update(self.assetdb_dic[machine_name])
+            view_dic['rows'][machine_name] = row_dic
+
+        return view_dic
+
+    # Returns the encoded GET_VIEW response. Views are built and encoded once and the most
+    # recently used are kept in memory until the databases are reloaded.
+    def get_view_response(self, catalog_name, category_name):
+        with self.lock:
+            if not self.check_databases():
+                return service_encode_response({'status' : 'ERROR', 'msg' : 'Databases not found'})
+            view_key = (catalog_name, category_name)
+            if view_key in self.view_cache:
+                response_bytes = self.view_cache.pop(view_key)
+            else:
+                view_dic = self.get_view(catalog_name, category_name)
+                if view_dic is None:
+                    return service_encode_response({'status' : 'ERROR', 'msg' : 'Category not found'})
+                response_bytes = service_encode_response({'status' : 'OK', 'view' : view_dic})
+            self.view_cache[view_key] = response_bytes
+            while len(self.view_cache) > SERVICE_MAX_VIEWS:
+                self.view_cache.popitem(last = False)
+
+        return response_bytes
+
+def service_encode_response(response_dic):
+    return json.dumps(response_dic, ensure_ascii = False).encode('utf-8')
+
+class Service_Request_Handler(socketserver.StreamRequestHandler):
+    def handle(self):
+        try:
+            request_dic = json.loads(self.rfile.readline().decode('utf-8'))
+            response_bytes = self.server.process_request_dic(request_dic)
+        except Exception as ex:
+            log_error('Service_Request_Handler() Exception {}'.format(ex))
+            response_bytes = service_encode_response({'status' : 'ERROR', 'msg' : text_type(ex)})
+        self.wfile.write(response_bytes)
+
+class Service_TCP_Server(socketserver.ThreadingMixIn, socketserver.TCPServer):
+    allow_reuse_address = True
+    daemon_threads = True
+
+    def __init__(self, cfg, port):
+        socketserver.TCPServer.__init__(self, (SERVICE_HOST, port), Service_Request_Handler)
+        self.service_db = Service_Database(cfg)
+
+    # Returns the encoded response.
+    def process_request_dic(self, request_dic):
+        command = request_dic['command']
+        if command == 'PING':
+            return service_encode_response({'status' : 'OK', 'version' : SERVICE_PROTOCOL_VERSION})
+        elif command == 'GET_VIEW':
+            return self.service_db.get_view_response(request_dic['catalog'], request_dic['category'])
+        else:
+            return service_encode_response({'status' : 'ERROR', 'msg' : 'Unknown command "{}"'.format(command)})
+
+# Loads the databases and then serves requests until shutdown() is called.
+class Threaded_Service(threading.Thread):
+    def __init__(self, server):
+        threading.Thread.__init__(self)
+        self.server = server
+
+    # If the databases cannot be read the requests are answered with an error and the plugin
+    # reads the databases from disk.
+    def run(self):
+        with self.server.service_db.lock:
+            try:
+                self.server.service_db.check_databases()
+            except KodiAddonError as ex:
+                log_error('Threaded_Service() {}'.format(ex))
+        self.server.serve_forever()
+
+# Returns None if the server socket cannot be created, for example if the port is in use.
+def service_new_server(cfg, port):
+    try:
+        server = Service_TCP_Server(cfg, port)
+    except (socket.error, OSError) as ex:
+        log_error('service_new_server() Cannot bind port {}: {}'.format(port, ex))
+        return None
+    log_info('service_new_server() Listening on {}:{}'.format(SERVICE_HOST, port))
+
+    return server
+
+# -------------------------------------------------------------------------------------------------
+# Client
+# -------------------------------------------------------------------------------------------------
+# Returns the response dictionary or None if the service is not running or fails.
+def service_client_request(port, request_dic, timeout = SERVICE_CLIENT_TIMEOUT):
+    try:
+        sock = socket.create_connection((SERVICE_HOST, port), timeout)
+    except (socket.error, OSError) as ex:
+        log_debug('service_client_request() Service not running: {}'.format(ex))
+        return None
+    try:
+        sock.sendall((json.dumps(request_dic) + '\n').encode('utf-8'))
+        chunk_list = []
+        while True:
+            chunk = sock.recv(65536)
+            if not chunk: break
+            chunk_list.append(chunk)
+        response_dic = json.loads(b''.join(chunk_list).decode('utf-8'))
+    except (socket.error, OSError, ValueError) as ex:
+        log_warning('service_client_request() Service error: {}'.format(ex))
+        return None
+    finally:
+        sock.close()
+
+    return response_dic
+
+# Returns the view dictionary of a category or None if the service is not available.
+def service_client_get_view(cfg, catalog_name, category_name):
+    response_dic = service_client_request(cfg.settings['service_port'], {
+        'command' : 'GET_VIEW',
+        'catalog' : catalog_name,
+        'category' : category_name,
+    })
+    if response_dic is None: return None
+    if response_dic['status'] != 'OK':
+        log_warning('service_client_get_view() {}'.format(response_dic['msg']))
+        return None
+
+    return response_dic['view']
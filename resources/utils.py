@@ -58,11 +58,20 @@ import os
 import re
 import shutil
 import string
+import struct
 import sys
 import threading
 import time
 import xml.etree.ElementTree
 import zlib
+if ADDON_RUNNING_PYTHON_2:
+    import cPickle as pickle
+    import marshal
+elif ADDON_RUNNING_PYTHON_3:
+    import marshal
+    import pickle
+else:
+    raise TypeError('Undefined Python runtime version.')
 
 # --- Determine interpreter running platform ---
 # Cache all possible platform values in global variables for maximum speed.
@@ -341,6 +350,25 @@ def utils_load_XML_to_ET(filename):
 # -------------------------------------------------------------------------------------------------
 # Replace fs_load_JSON_file with this.
 def utils_load_JSON_file(json_filename, default_obj = {}, verbose = True):
+    # Big databases are loaded from the binary file. If not available load the JSON file.
+    # A database that exists but cannot be read must be rebuilt. Never return an empty
+    # database in that case.
+    if utils_is_binary_DB(json_filename):
+        binary_filename = utils_get_binary_DB_filename(json_filename)
+        if OPTION_DB_FORMAT != DB_FORMAT_JSON:
+            json_data = utils_load_binary_DB(binary_filename, verbose)
+            if json_data is not None: return json_data
+        if not os.path.isfile(json_filename) and os.path.isfile(binary_filename):
+            log_error('utils_load_JSON_file() Cannot read "{}"'.format(binary_filename))
+            raise KodiAddonError('Database {} cannot be read. It was written by another '
+                'version of AML or it is damaged. Rebuild the databases with "Setup addon" '
+                'in the context menu.'.format(os.path.basename(binary_filename)))
+    elif not os.path.isfile(json_filename):
+        # Old versions of AML stored Favourite_SL_ROMs.json in binary format. Read it, the
+        # JSON file is written next time the file is saved.
+        json_data = utils_load_binary_DB(utils_get_binary_DB_filename(json_filename), verbose)
+        if json_data is not None: return json_data
+
     # If file does not exist return default object (usually empty object)
     json_data = default_obj
     if not os.path.isfile(json_filename):
@@ -356,57 +384,248 @@ def utils_load_JSON_file(json_filename, default_obj = {}, verbose = True):
 
     return json_data
 
-# This consumes a lot of memory but it is fast.
+# Encodes JSON in chunks. The items of the top level dictionary or list are encoded in groups of
+# JSON_WRITE_CHUNK_ITEMS with json.dumps(), which uses the fast C encoder, so memory usage is
+# bounded by the size of a chunk and not by the whole file. The output is identical to
+# json.dumps(). Each chunk is encoded as a dictionary or list and the brackets are removed.
+def utils_iterencode_JSON(json_data, indent, separators):
+    if isinstance(json_data, dict) and len(json_data) > JSON_WRITE_CHUNK_ITEMS:
+        item_list = sorted(json_data)
+        open_str, close_str = '{', '}'
+    elif isinstance(json_data, list) and len(json_data) > JSON_WRITE_CHUNK_ITEMS:
+        item_list = json_data
+        open_str, close_str = '[', ']'
+    else:
+        yield json.dumps(json_data, ensure_ascii = False, sort_keys = True,
+            indent = indent, separators = separators)
+        return
+    if indent is not None: close_str = '\n' + close_str
+
+    yield open_str
+    for i in range(0, len(item_list), JSON_WRITE_CHUNK_ITEMS):
+        if open_str == '{':
+            chunk_data = {}
+            for key in item_list[i:i + JSON_WRITE_CHUNK_ITEMS]:
+                chunk_data[key] = json_data[key]
+        else:
+            chunk_data = item_list[i:i + JSON_WRITE_CHUNK_ITEMS]
+        chunk_str = json.dumps(chunk_data, ensure_ascii = False, sort_keys = True,
+            indent = indent, separators = separators)
+        if i > 0: yield separators[0]
+        yield chunk_str[1:-len(close_str)]
+    yield close_str
+
+# The non low memory writer consumes a lot of memory but it is fast.
 # See https://stackoverflow.com/questions/24239613/memoryerror-using-json-dumps
 #
+# The file is written to a temporary file that replaces the old file when writing is finished,
+# so a crash or an error never leaves a truncated database.
+#
 # Note that there is a bug in the json module where the ensure_ascii=False flag can produce
 # a mix of unicode and str objects.
 # See http://stackoverflow.com/questions/18337407/saving-utf-8-texts-in-json-dumps-as-utf8-not-as-u-escape-sequence
 def utils_write_JSON_file(json_filename, json_data, verbose = True, pprint = False):
+    # Big databases are written in binary format. The JSON file is written only if exported.
+    # Delete the file in the other format so an old file is never loaded.
+    if utils_is_binary_DB(json_filename):
+        binary_filename = utils_get_binary_DB_filename(json_filename)
+        if OPTION_DB_FORMAT != DB_FORMAT_JSON:
+            utils_write_binary_DB(binary_filename, json_data, verbose)
+            if not OPTION_DB_EXPORT_JSON:
+                utils_remove_file(json_filename)
+                return
+        else:
+            utils_remove_file(binary_filename)
+
     l_start = time.time()
     if verbose: log_debug('utils_write_JSON_file() "{}"'.format(json_filename))
 
-    # Choose JSON iterative encoder or normal encoder.
-    if OPTION_LOWMEM_WRITE_JSON:
-        if verbose: log_debug('utils_write_JSON_file() Using OPTION_LOWMEM_WRITE_JSON option')
-        if pprint:
-            jobj = json.JSONEncoder(ensure_ascii = False, sort_keys = True,
-                indent = JSON_INDENT, separators = JSON_SEP)
-        else:
-            if OPTION_COMPACT_JSON:
-                jobj = json.JSONEncoder(ensure_ascii = False, sort_keys = True)
-            else:
-                jobj = json.JSONEncoder(ensure_ascii = False, sort_keys = True,
-                    indent = JSON_INDENT, separators = JSON_SEP)
+    # Parameter pprint == True overrides option OPTION_COMPACT_JSON.
+    if pprint or not OPTION_COMPACT_JSON:
+        indent = JSON_INDENT
+        separators = JSON_SEP
     else:
-        # Parameter pprint == True overrides option OPTION_COMPACT_JSON.
-        if pprint:
-            f_data = json.dumps(json_data, ensure_ascii = False, sort_keys = True,
-                indent = JSON_INDENT, separators = JSON_SEP)
-        else:
-            if OPTION_COMPACT_JSON:
-                f_data = json.dumps(json_data, ensure_ascii = False, sort_keys = True)
-            else:
-                f_data = json.dumps(json_data, ensure_ascii = False, sort_keys = True,
-                    indent = JSON_INDENT, separators = JSON_SEP)
+        indent = None
+        separators = (', ', ': ')
 
-    # Write JSON to disk
+    # Write JSON to a temporary file.
+    temp_filename = json_filename + '.tmp'
     try:
-        with io.open(json_filename, 'wt', encoding = 'utf-8') as file:
+        with io.open(temp_filename, 'wt', encoding = 'utf-8') as file:
             if OPTION_LOWMEM_WRITE_JSON:
-                # Chunk by chunk JSON writer, uses less memory but takes longer.
-                for chunk in jobj.iterencode(json_data):
+                # Chunk by chunk JSON writer, uses less memory.
+                for chunk in utils_iterencode_JSON(json_data, indent, separators):
                     file.write(chunk)
             else:
-                file.write(f_data)
+                file.write(json.dumps(json_data, ensure_ascii = False, sort_keys = True,
+                    indent = indent, separators = separators))
+        file_size = os.path.getsize(temp_filename)
+        utils_replace_file(temp_filename, json_filename)
+        # Delete the binary file written by old versions of AML, see utils_load_JSON_file().
+        if not utils_is_binary_DB(json_filename):
+            utils_remove_file(utils_get_binary_DB_filename(json_filename))
     except OSError:
         kodi_notify(ADDON_LONG_NAME, 'Cannot write {} file (OSError)'.format(json_filename))
+        utils_remove_file(temp_filename)
+        return
     except IOError:
         kodi_notify(ADDON_LONG_NAME, 'Cannot write {} file (IOError)'.format(json_filename))
+        utils_remove_file(temp_filename)
+        return
+    except Exception:
+        # For example, data that cannot be encoded as JSON. Never leave the temporary file.
+        utils_remove_file(temp_filename)
+        raise
     l_end = time.time()
     if verbose:
         write_time_s = l_end - l_start
+        speed_MBps = float(file_size) / (1024 * 1024) / write_time_s if write_time_s > 0 else 0.0
         log_debug('utils_write_JSON_file() Writing time {:f} s'.format(write_time_s))
+        log_debug('utils_write_JSON_file() Written {:,} bytes ({:.2f} MB/s)'.format(
+            file_size, speed_MBps))
+
+def utils_remove_file(filename):
+    try:
+        if os.path.isfile(filename): os.remove(filename)
+    except OSError:
+        log_error('utils_remove_file() Cannot remove "{}"'.format(filename))
+
+# Same as os.replace(). os.rename() fails in Windows if the destination exists.
+def utils_replace_file(source_filename, dest_filename):
+    if ADDON_RUNNING_PYTHON_2:
+        if os.path.isfile(dest_filename): os.remove(dest_filename)
+        os.rename(source_filename, dest_filename)
+    elif ADDON_RUNNING_PYTHON_3:
+        os.replace(source_filename, dest_filename)
+    else:
+        raise TypeError('Undefined Python runtime version.')
+
+# -------------------------------------------------------------------------------------------------
+# Binary databases
+# -------------------------------------------------------------------------------------------------
+# The big databases matching DB_BINARY_FILE_PATTERNS are stored in a binary file if
+# OPTION_DB_FORMAT is not DB_FORMAT_JSON. Callers always use the name of the JSON file.
+# The binary file has the same name with extension .bin and starts with a header:
+#   DB_BINARY_MAGIC, DB_BINARY_VERSION, format, compression, Python major and minor version.
+# marshal files cannot be read by other Python versions, so the Python version is checked.
+# Pickle files use protocol 2, which all Python versions can read. The Python version is
+# 0.0 in the header of pickle files and it is not checked.
+DB_BINARY_HEADER_STRUCT = struct.Struct('<5sBBBBB')
+
+# Patterns with a directory match the file name and the name of the directory of the file.
+def utils_is_binary_DB(json_filename):
+    dirname, basename = os.path.split(json_filename)
+    dir_basename = os.path.basename(dirname) + '/' + basename
+    for pattern in DB_BINARY_FILE_PATTERNS:
+        if '/' in pattern:
+            if fnmatch.fnmatch(dir_basename, pattern): return True
+        elif fnmatch.fnmatch(basename, pattern): return True
+    return False
+
+def utils_get_binary_DB_filename(json_filename):
+    return os.path.splitext(json_filename)[0] + '.bin'
+
+# Use this instead of FileName.exists() for the big databases.
+# A binary file that cannot be read is a missing database.
+def utils_DB_file_exists(json_filename):
+    if os.path.isfile(json_filename): return True
+    if OPTION_DB_FORMAT == DB_FORMAT_JSON or not utils_is_binary_DB(json_filename): return False
+    return utils_is_binary_DB_readable(utils_get_binary_DB_filename(json_filename))
+
+def utils_get_binary_DB_header(db_format, compression):
+    if db_format == DB_FORMAT_MARSHAL:
+        py_major, py_minor = sys.version_info[0], sys.version_info[1]
+    else:
+        py_major, py_minor = 0, 0
+    return DB_BINARY_HEADER_STRUCT.pack(DB_BINARY_MAGIC, DB_BINARY_VERSION, db_format,
+        1 if compression else 0, py_major, py_minor)
+
+# Returns True if the header was written with the current format and options.
+# Pickle files written with the Python version in the header are also accepted.
+def utils_check_binary_DB_header(header):
+    try:
+        magic, version, db_format, compression, py_major, py_minor = \
+            DB_BINARY_HEADER_STRUCT.unpack(header)
+    except struct.error:
+        return False
+    if magic != DB_BINARY_MAGIC or version != DB_BINARY_VERSION: return False
+    if db_format != OPTION_DB_FORMAT: return False
+    if compression != (1 if OPTION_DB_COMPRESSION else 0): return False
+    if db_format == DB_FORMAT_MARSHAL:
+        return (py_major, py_minor) == (sys.version_info[0], sys.version_info[1])
+
+    return True
+
+def utils_is_binary_DB_readable(binary_filename):
+    if not os.path.isfile(binary_filename): return False
+    try:
+        with io.open(binary_filename, 'rb') as file:
+            header = file.read(DB_BINARY_HEADER_STRUCT.size)
+    except (IOError, OSError):
+        return False
+
+    return utils_check_binary_DB_header(header)
+
+# Returns None if the file does not exist or was written with other format, version or options.
+def utils_load_binary_DB(binary_filename, verbose = True):
+    if not os.path.isfile(binary_filename): return None
+    l_start = time.time()
+    if verbose: log_debug('utils_load_binary_DB() "{}"'.format(binary_filename))
+    try:
+        with io.open(binary_filename, 'rb') as file:
+            header = file.read(DB_BINARY_HEADER_STRUCT.size)
+            if not utils_check_binary_DB_header(header):
+                log_warning('utils_load_binary_DB() Wrong header in "{}"'.format(binary_filename))
+                return None
+            if OPTION_DB_COMPRESSION:
+                data_bytes = zlib.decompress(file.read())
+                if OPTION_DB_FORMAT == DB_FORMAT_MARSHAL:
+                    db_data = marshal.loads(data_bytes)
+                else:
+                    db_data = pickle.loads(data_bytes)
+            else:
+                if OPTION_DB_FORMAT == DB_FORMAT_MARSHAL:
+                    db_data = marshal.loads(file.read())
+                else:
+                    db_data = pickle.load(file)
+    except (IOError, OSError, EOFError, ValueError, TypeError, zlib.error, pickle.UnpicklingError) as ex:
+        log_error('utils_load_binary_DB() Exception loading "{}"'.format(binary_filename))
+        log_error('utils_load_binary_DB() {}'.format(text_type(ex)))
+        return None
+    if verbose:
+        log_debug('utils_load_binary_DB() Loading time {:f} s'.format(time.time() - l_start))
+
+    return db_data
+
+# Written to a temporary file that replaces the old file, like utils_write_JSON_file().
+def utils_write_binary_DB(binary_filename, db_data, verbose = True):
+    l_start = time.time()
+    if verbose: log_debug('utils_write_binary_DB() "{}"'.format(binary_filename))
+    temp_filename = binary_filename + '.tmp'
+    try:
+        with io.open(temp_filename, 'wb') as file:
+            file.write(utils_get_binary_DB_header(OPTION_DB_FORMAT, OPTION_DB_COMPRESSION))
+            if OPTION_DB_COMPRESSION:
+                if OPTION_DB_FORMAT == DB_FORMAT_MARSHAL:
+                    data_bytes = marshal.dumps(db_data)
+                else:
+                    data_bytes = pickle.dumps(db_data, 2)
+                file.write(zlib.compress(data_bytes, 1))
+            else:
+                if OPTION_DB_FORMAT == DB_FORMAT_MARSHAL:
+                    file.write(marshal.dumps(db_data))
+                else:
+                    pickle.dump(db_data, file, 2)
+        file_size = os.path.getsize(temp_filename)
+        utils_replace_file(temp_filename, binary_filename)
+    except (IOError, OSError) as ex:
+        kodi_notify(ADDON_LONG_NAME, 'Cannot write {} file ({})'.format(binary_filename, ex))
+        utils_remove_file(temp_filename)
+        return
+    if verbose:
+        write_time_s = time.time() - l_start
+        log_debug('utils_write_binary_DB() Writing time {:f} s'.format(write_time_s))
+        log_debug('utils_write_binary_DB() Written {:,} bytes'.format(file_size))
 
 # -------------------------------------------------------------------------------------------------
 # Threaded JSON loader
@@ -420,13 +639,24 @@ def utils_write_JSON_file(json_filename, json_data, verbose = True, pprint = Fal
 #     assets_thread.join()
 #     MAME_db_dic = render_thread.output_dic
 #     MAME_assets_dic = assets_thread.output_dic
+#
+# load_time is the time in seconds spent loading the file.
 class Threaded_Load_JSON(threading.Thread):
     def __init__(self, json_filename):
         threading.Thread.__init__(self)
         self.json_filename = json_filename
+        self.output_dic = {}
+        self.load_time = 0.0
+        # Exceptions cannot cross threads. The caller must re-raise it after join().
+        self.exception = None
 
     def run(self):
-        self.output_dic = utils_load_JSON_file(self.json_filename)
+        t_start = time.time()
+        try:
+            self.output_dic = utils_load_JSON_file(self.json_filename)
+        except Exception as ex:
+            self.exception = ex
+        self.load_time = time.time() - t_start
 
 # -------------------------------------------------------------------------------------------------
 # File cache functions.
@@ -0,0 +1,25 @@
+# -*- coding: utf-8 -*-
+
+# Copyright (c) 2016-2020 Wintermute0110 <wintermute0110@gmail.com>
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; version 2 of the License.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.
+# See the GNU General Public License for more details.
+
+# Advanced MAME Launcher service script file.
+
+# --- Modules/packages in this plugin ---
+import resources.main
+
+# -------------------------------------------------------------------------------------------------
+# main()
+# -------------------------------------------------------------------------------------------------
+# The service is optional and does nothing if disabled in the addon settings.
+# See resources/service.py for details.
+#
+resources.main.run_service()